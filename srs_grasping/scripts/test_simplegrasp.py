@@ -141,7 +141,7 @@ class GraspScript(script):
 
 		print "Calling get_feasible_grasps service..."
 		get_grasps_from_position = rospy.ServiceProxy('get_feasible_grasps', GetFeasibleGrasps)
-		req = GetFeasibleGraspsRequest(object_id, obj.pose, [0.0, 0.0])	
+		req = GetFeasibleGraspsRequest(object_id=object_id, object_pose=obj.pose, pregrasp_offsets=[0.0, 0.0], max_grasps=0)	
 		grasp_configuration = (get_grasps_from_position(req)).grasp_configuration
 		print "get_feasible_grasps service has finished."
 
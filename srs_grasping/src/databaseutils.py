@@ -4,8 +4,11 @@ import roslib
 roslib.load_manifest('srs_grasping')
 import rospy
 import os
+import threading
 import grasping_functions
 
+from cStringIO import StringIO
+
 from srs_object_database_msgs.srv import *
 from srs_grasping.srv import *
 from srs_msgs.msg import GraspingErrorCodes
@@ -23,6 +26,12 @@ class databaseutils():
 		if self.graspingutils is None:
 			self.graspingutils = grasping_functions.graspingutils();
 
+		#grasps of the objects already read from the DB, by object_id. insert_grasps removes the object.
+		#the versions count the inserts of every object, a grasp file read while new grasps were inserted is not cached.
+		self.grasp_cache = {};
+		self.grasp_versions = {};
+		self.grasp_cache_lock = threading.Lock();
+
 	def get_mesh(self, object_id):
 		try:
 			resp = self.get_mesh_service(model_ids=[object_id])
@@ -42,6 +51,7 @@ class databaseutils():
 		return mesh_file
 
 	def insert_grasps(self, object_id, grasp_file):
+		self.invalidate_grasps(object_id);
 		try:
 			resp = self.insert_obj_service(model_id=object_id, data_grasp=grasp_file)
 		except rospy.ServiceException, e:
@@ -50,10 +60,27 @@ class databaseutils():
 
 		return GraspingErrorCodes.SUCCESS;
 
-	def get_grasps(self, object_id):
+	def invalidate_grasps(self, object_id):
+		self.grasp_cache_lock.acquire();
+		try:
+			self.grasp_cache.pop(object_id, None);
+			self.grasp_versions[object_id] = self.grasp_versions.get(object_id, 0) + 1;
+		finally:
+			self.grasp_cache_lock.release();
+
+
+	#the grasps of the object as a graspset. the grasp file of the DB is only read the first time, the next calls are served from the cache.
+	def get_grasp_set(self, object_id):
+
+		self.grasp_cache_lock.acquire();
+		try:
+			grasp_set = self.grasp_cache.get(object_id);
+			version = self.grasp_versions.get(object_id, 0);
+		finally:
+			self.grasp_cache_lock.release();
+		if grasp_set is not None:
+			return grasp_set;
 
-		server_result = GetDBGraspsResponse();
-		
 		try:
 			resp = self.get_grasps_service(model_ids=[object_id]);
 		except rospy.ServiceException, e:
@@ -65,28 +92,33 @@ class databaseutils():
 			rospy.loginfo("No grasping data for this object.");	
 			return GraspingErrorCodes.NON_GENERATED_INFO;
 
+		#the grasp file is read from the service data, it is not written to the disk
+		grasp_set = self.graspingutils.get_grasps(StringIO(resp.msg[0].bs));
+		if grasp_set == GraspingErrorCodes.CORRUPTED_GRASP_FILE:
+			rospy.logerr("ERROR reading the grasp file");
+			return GraspingErrorCodes.CORRUPTED_GRASP_FILE;
+
+		self.grasp_cache_lock.acquire();
 		try:
-			grasp_file = "/tmp/grasp.xml";
-			f = open(grasp_file, 'w');
-			f.write(resp.msg[0].bs);
-			f.close();
+			if self.grasp_versions.get(object_id, 0) == version:
+				self.grasp_cache[object_id] = grasp_set;
+		finally:
+			self.grasp_cache_lock.release();
+		return grasp_set;
 
-			GRASPS = self.graspingutils.get_grasps(grasp_file);
-			if GRASPS == GraspingErrorCodes.CORRUPTED_GRASP_FILE:
-				rospy.logerr("ERROR reading the grasp file");
-				return GraspingErrorCodes.CORRUPTED_GRASP_FILE;
 
-			os.remove(grasp_file);
+	def get_grasps(self, object_id):
 
-			rospy.loginfo(str(len(GRASPS))+" grasping configuration for this object.");	
+		server_result = GetDBGraspsResponse();
 
-			server_result.grasp_configuration = GRASPS;
-			return server_result;
+		grasp_set = self.get_grasp_set(object_id);
+		if isinstance(grasp_set, int):
+			return grasp_set;
 
-		except rospy.ServiceException, e:
-			rospy.logerr("Service did not process request: %s", str(e));
-			rospy.logerr("No grasping data for this object.");
-			return GraspingErrorCodes.SERVICE_DID_NOT_PROCESS_REQUEST;
+		rospy.loginfo(str(len(grasp_set))+" grasping configuration for this object.");	
+
+		server_result.grasp_configuration = grasp_set.to_grasps();
+		return server_result;
 
 	def get_object_id(self, object_name):
 		try:
@@ -83,21 +83,27 @@ class get_db_grasps():
 		server_result.error_code.val = 0;
 		server_result.grasp_configuration = [];
 
-		resp = grasping_functions.databaseutils.get_grasps(server_goal.object_id);
-		if resp < 0:
-			resp2 = grasping_functions.openraveutils.generator(server_goal.object_id);
-			if resp2 is GraspingErrorCodes.SUCCESS:
-				resp_aux = grasping_functions.databaseutils.get_grasps(server_goal.object_id);
-				if resp_aux < 0:
-					server_result.error_code.val = resp_aux;
-				else:
-					server_result.error_code.val = GraspingErrorCodes.SUCCESS;
-					server_result.grasp_configuration = resp_aux.grasp_configuration;
+		#without grasps in the DB, or with the grasps of a generation which has not finished, the generator runs in the background
+		#(an interrupted generation goes on from its checkpoint). the grasps which are already in the DB are returned.
+		grasp_set = grasping_functions.databaseutils.get_grasp_set(server_goal.object_id);
+		resp2 = GraspingErrorCodes.SUCCESS;
+		if isinstance(grasp_set, int) or not grasp_set.complete:
+			generation = grasping_functions.openraveutils.start_generator(server_goal.object_id);
+			if isinstance(grasp_set, int):
+				rospy.loginfo("Waiting for the first grasps of the generation...");
+				resp2 = grasping_functions.openraveutils.wait_generator(generation);
 			else:
-				server_result.error_code.val = resp2;
+				rospy.loginfo("The grasps of this object are still being generated.");
+
+		if resp2 is not GraspingErrorCodes.SUCCESS:
+			server_result.error_code.val = resp2;
 		else:
-			server_result.error_code.val = GraspingErrorCodes.SUCCESS;
-			server_result.grasp_configuration = resp.grasp_configuration;
+			resp = grasping_functions.databaseutils.get_grasps(server_goal.object_id);
+			if resp < 0:
+				server_result.error_code.val = resp;
+			else:
+				server_result.error_code.val = GraspingErrorCodes.SUCCESS;
+				server_result.grasp_configuration = resp.grasp_configuration;
 
 		print "Time employed: " + str(time.time() - x);
 		print "---------------------------------------";
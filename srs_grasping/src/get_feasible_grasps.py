@@ -61,6 +61,9 @@ import tf
 import rospy
 import time
 import grasping_functions 
+import graspset
+import ikpool
+import numpy
 
 from srs_grasping.srv import *
 from srs_msgs.msg import *
@@ -77,6 +80,8 @@ class get_feasible_grasps():
 		self.finger_correction = -1;
 		self.cjc = []
 		self.cylopen_position = [[[0.09121056454806604, 0.03300469295835018, 0.1386980387655565],[0.01977019790965633, 6.428768666637955e-07, 0.9998045500082638, -3.251111695101345e-05]], [[0.01905, 0.033, 0.091],[0.47359137769338583, 1.5399994595997778e-05, 0.880744688270724, -2.863959117221133e-05]], [[-0.11021758805551472, 0.0, 0.13877808854293133],[0.0, -0.019200739055054376, 0.0, 0.9998156488171905]]]
+		#the positions of the fingers in the palm frame for every preshape, read from tf the first time they are needed
+		self.finger_offsets = {}
 		self.spheropen_position = [[[0.04967501468386526, 0.08596897096059274, 0.15214447310255375],[-0.11284765597435997, -0.06510645561927879, 0.8587963331213594, -0.49547493800907255]], [[0.01905, 0.033, 0.091],[0.3316048124188912, 0.19131645949114948, 0.8001899672091825, -0.4616625142744111]], [[-0.0992496375660626, 0.0, 0.1521898252840332],[0.0, 0.13060867295881992, 0.0, 0.9914339990881572]]]
 
 		self.listener = tf.TransformListener(True, rospy.Duration(10.0))
@@ -89,6 +94,9 @@ class get_feasible_grasps():
 		rospy.loginfo("Waiting /get_db_grasps service...");
 		rospy.wait_for_service('/get_db_grasps')
 		self.client = rospy.ServiceProxy('/get_db_grasps', GetDBGrasps)
+
+		#persistent connections to the IK solver, the grasps of a request are checked by ~ik_connections threads
+		self.ik_pool = ikpool.ikpool(grasping_functions.graspingutils, rospy.get_param('~ik_connections', 4));
 		rospy.loginfo("/get_feasible_grasps service is ready.");
 
 
@@ -121,37 +129,58 @@ class get_feasible_grasps():
 
 		if error_code == GraspingErrorCodes.SUCCESS:
 
-			for grasp_configuration in grasp_configuration:
+			grasp_set = graspset.from_grasps(grasp_configuration);
+
+			#prefilter with the categories of all the grasps, computed from their positions in the object pose.
+			#the valid categories are the approach directions which the arm can reach (not from the back nor from below).
+			R = numpy.asarray(rotacion);
+			pre_positions = numpy.dot(grasp_set.pregrasp_poses[:,0:3], R[0:3,0:3].T) + R[0:3,3];
+			grasp_positions = numpy.dot(grasp_set.grasp_poses[:,0:3], R[0:3,0:3].T) + R[0:3,3];
+			categories = grasping_functions.graspingutils.get_grasp_categories(pre_positions, grasp_positions);
+			valid = (categories == "TOP") | (categories == "SIDE") | (categories == "-SIDE") | (categories == "FRONT");
+
+			#the highest grasps are checked first, the feasible grasps are returned in this order
+			indices = numpy.nonzero(valid)[0];
+			indices = indices[numpy.argsort(-grasp_positions[indices,2], kind='mergesort')];
+
+			#prefilter with the finger positions, only the grasps whose fingers do not touch the surface are sent to the IK solver
+			candidates = [];
+			for i in indices:
+				grasp_configuration = client_response.grasp_configuration[i];
 				pre_trans = rotacion * grasping_functions.graspingutils.matrix_from_pose(grasp_configuration.pre_grasp.pose);
 				grasp_trans = rotacion *  grasping_functions.graspingutils.matrix_from_pose(grasp_configuration.grasp.pose);
 
 				pre = grasping_functions.graspingutils.pose_from_matrix(pre_trans);
 				g = grasping_functions.graspingutils.pose_from_matrix(grasp_trans);
 				surface_distance = g.pose.position.z - request.object_pose.position.z
-				category = grasping_functions.graspingutils.get_grasp_category(pre.pose.position, g.pose.position);
+				category = str(categories[i]);
 				
 				nvg = FeasibleGrasp(grasp_configuration.sdh_joint_values, "/sdh_palm_link", g, pre, surface_distance, category);
-				fpos = self.get_finger_positions(category)
+				fpos = self.get_finger_offsets(category)
 				pre.pose = grasping_functions.graspingutils.set_pregrasp_offsets(category, pre.pose, pregrasp_offsets);
 			
-				if (grasping_functions.graspingutils.valid_grasp(category)) and (not self.checkCollisions(fpos, nvg, request.object_pose)):
-					class FeasibleGraspFound(Exception): pass
-					try:
-						for w in range(0, self.ik_loop_reply):
-							(pgc, error) = grasping_functions.graspingutils.callIKSolver(self.cjc, pre);			
+				if not self.checkCollisions(fpos, nvg, request.object_pose):
+					candidates.append(nvg);
+
+			#IK of the pregrasp and then of the grasp, for several grasps at the same time
+			cjc = list(self.cjc);
+			def check_ik(nvg, ik_service):
+				for w in range(0, self.ik_loop_reply):
+					(pgc, error) = grasping_functions.graspingutils.callIKSolver(cjc, nvg.pre_grasp, ik_service);
+					if(error.val == error.SUCCESS):
+						for k in range(0,self.ik_loop_reply):
+							(gc, error) = grasping_functions.graspingutils.callIKSolver(pgc, nvg.grasp, ik_service);
 							if(error.val == error.SUCCESS):
-								for k in range(0,self.ik_loop_reply):
-									(gc, error) = grasping_functions.graspingutils.callIKSolver(pgc, g);
-									if(error.val == error.SUCCESS):
-										raise FeasibleGraspFound();
-					except FeasibleGraspFound:
-						resp.feasible_grasp_available = True;
-						resp.grasp_configuration.append(nvg);
-						resp.error_code.val = GraspingErrorCodes.SUCCESS
-
-			#order grasps
+								return True;
+				return False;
+
+			feasible = self.ik_pool.solve(candidates, check_ik, request.max_grasps);
+			rospy.loginfo("%d grasps, %d with a valid category, %d without finger collisions, IK checked until %d feasible grasps.", len(grasp_set), len(indices), len(candidates), len(feasible));
+
+			resp.grasp_configuration = [candidates[i] for i in feasible];
 			if len(resp.grasp_configuration) > 0:
-				(resp.grasp_configuration).sort();
+				resp.feasible_grasp_available = True;
+				resp.error_code.val = GraspingErrorCodes.SUCCESS
 			else:
 				resp.error_code.val = GraspingErrorCodes.GOAL_UNREACHABLE
 		else:
@@ -207,31 +236,32 @@ class get_feasible_grasps():
 		return fing_pos;
 
 
-	def transform_finger_positions(self, fpositions, g):
-		response = [];
+	#the finger positions of the preshape of the category in the palm frame, as (3,4,4) matrices. they do not depend on the grasp,
+	#so tf is only asked once for every preshape.
+	def get_finger_offsets(self, category):
+		preshape = ("cylopen", "spheropen")[category == "TOP"]
+		if preshape not in self.finger_offsets:
+			offsets = [];
+			for finger_pos in self.get_finger_positions(category):
+				self.listener.getLatestCommonTime("/sdh_palm_link", finger_pos.header.frame_id);
+				ps = self.listener.transformPose("/sdh_palm_link", finger_pos);
+				offsets.append(numpy.asarray(grasping_functions.graspingutils.matrix_from_pose(ps.pose)));
+			self.finger_offsets[preshape] = numpy.array(offsets);
+		return self.finger_offsets[preshape];
 
-		for finger_pos in fpositions:
-			ps = PoseStamped();
-			ps.header.stamp = self.listener.getLatestCommonTime("/sdh_palm_link", finger_pos.header.frame_id);
-			ps = self.listener.transformPose("/sdh_palm_link", finger_pos);
 
-			#transform to object position
-			matrix = grasping_functions.graspingutils.matrix_from_pose(g) * grasping_functions.graspingutils.matrix_from_pose(ps.pose);
-			response.append(grasping_functions.graspingutils.pose_from_matrix(matrix));
+	#the (3,3) positions of the fingers for the grasp pose g, the palm frame offsets moved to the grasp
+	def transform_finger_positions(self, offsets, g):
+		matrix = graspset.matrices_from_poses(graspset.array_from_pose(g))[0];
+		return numpy.dot(offsets[:,0:3,3], matrix[0:3,0:3].T) + matrix[0:3,3];
 
-		return response;
 
-
-	def checkCollisions(self, fpositions, nvg, obj_pose):
+	def checkCollisions(self, offsets, nvg, obj_pose):
 
 		self.finger_correction = (0, -0.0685)[nvg.category == "TOP"];
-		finger_pos = self.transform_finger_positions(fpositions, nvg.grasp.pose);
-
-		for fp in finger_pos:
-			if (obj_pose.position.z + 0.05)> (fp.pose.position.z + self.finger_correction):
-				return True;
+		finger_pos = self.transform_finger_positions(offsets, nvg.grasp.pose);
 
-		return False;
+		return bool(((obj_pose.position.z + 0.05) > (finger_pos[:,2] + self.finger_correction)).any());
 
 
 	def get_feasible_grasps_server(self):
@@ -60,6 +60,8 @@ roslib.load_manifest('srs_grasping')
 import rospy
 import time
 import grasping_functions 
+import graspset
+import numpy
 
 from srs_grasping.srv import *
 from srs_msgs.msg import *
@@ -101,63 +103,22 @@ class get_pregrasps():
 		resp.top = []
 		resp.front = []
 
-		for i in range(0,len(grasp_configuration)):
-			pre_trans = rotacion * grasping_functions.graspingutils.matrix_from_pose(grasp_configuration[i].pre_grasp.pose);
-			grasp_trans = rotacion *  grasping_functions.graspingutils.matrix_from_pose(grasp_configuration[i].grasp.pose);
-
-			t = translation_from_matrix(pre_trans);
-			q = quaternion_from_matrix(pre_trans);
-			tg = translation_from_matrix(grasp_trans);
-			qg = quaternion_from_matrix(grasp_trans);
-
-			pre = Pose();
-			pre.position.x = t[0];
-			pre.position.y = t[1];
-			pre.position.z = t[2];
-			pre.orientation.x = q[0];
-			pre.orientation.y = q[1];
-			pre.orientation.z = q[2];
-			pre.orientation.w = q[3];
-
-			g = Pose();
-			g.position.x = tg[0];
-			g.position.y = tg[1];
-			g.position.z = tg[2];
-			g.orientation.x = qg[0];
-			g.orientation.y = qg[1];
-			g.orientation.z = qg[2];
-			g.orientation.w = qg[3];
-
-
-			category = grasping_functions.graspingutils.get_grasp_category(pre.position, g.position);
-			pre = grasping_functions.graspingutils.set_pregrasp_offsets(category, pre, pregrasp_offsets);
-
-
-			aux = DBGrasp();
-			aux.object_id = obj_id;
-			aux.hand_type = "SDH";
-			aux.sdh_joint_values = grasp_configuration[i].sdh_joint_values;
-			aux.pre_grasp.pose = pre;
-			aux.grasp.pose = g;
-			aux.category = grasping_functions.graspingutils.get_grasp_category(pre.position, g.position);
-
-			if aux.category == "TOP":
-				if len(resp.top) < num_configurations:
-					resp.top.append(aux);
-			elif aux.category == "FRONT":
-				if len(resp.front) < num_configurations:
-					resp.front.append(aux);
-			elif aux.category == "SIDE":
-				if len(resp.side) < num_configurations:
-					resp.side.append(aux);
-			elif aux.category == "-SIDE":
-				if len(resp.mside) < num_configurations:
-					resp.mside.append(aux);
-			else:
-				continue
-
-			if len(resp.top)==num_configurations and len(resp.side)==num_configurations and len(resp.mside)==num_configurations and len(resp.front)==num_configurations:
-				break;
+		#all the grasps are moved to the object pose at once, as (N,4,4) matrices
+		grasp_set = graspset.from_grasps(grasp_configuration, obj_id);
+		pre = graspset.poses_from_matrices(graspset.transform_matrices(rotacion, graspset.matrices_from_poses(grasp_set.pregrasp_poses)));
+		g = graspset.poses_from_matrices(graspset.transform_matrices(rotacion, graspset.matrices_from_poses(grasp_set.grasp_poses)));
+
+		#the offsets depend on the category of the grasp, the category of the answer is the one of the pregrasp with the offsets
+		category = grasping_functions.graspingutils.get_grasp_categories(pre[:,0:3], g[:,0:3]);
+		pre[:,0:3] = grasping_functions.graspingutils.set_pregrasps_offsets(category, pre[:,0:3], pregrasp_offsets);
+		category = grasping_functions.graspingutils.get_grasp_categories(pre[:,0:3], g[:,0:3]);
+
+		#the first num_configurations grasps of every category
+		moved_set = graspset.graspset(obj_id, grasp_set.joint_values, g, pre, category);
+		for (name, configurations) in [("TOP", resp.top), ("FRONT", resp.front), ("SIDE", resp.side), ("-SIDE", resp.mside)]:
+			indices = numpy.nonzero(category == name)[0][0:num_configurations];
+			for aux in moved_set.to_grasps(indices, frame_id=""):
+				configurations.append(aux);
 
 		rospy.loginfo("/get_pregrasps call has finished.");
 		print "Time employed: " + str(time.time() - x);
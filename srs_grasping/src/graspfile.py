@@ -0,0 +1,77 @@
+#!/usr/bin/python
+
+import roslib
+roslib.load_manifest('srs_grasping')
+
+#The grasp file of an object built from the chunks of valid grasps of the generation, in the order of the chunks.
+#The text of every grasp is written once, when its chunk is added, so the file of the grasps generated so far
+#can be sent to the DB after every batch without building an XML document. A file which is sent before the
+#generation has finished has <complete>False</complete>, the files without the element are complete.
+
+JOINT_NAMES = "[sdh_knuckle_joint, sdh_thumb_2_joint, sdh_thumb_3_joint, sdh_finger_12_joint, sdh_finger_13_joint, sdh_finger_22_joint, sdh_finger_23_joint]";
+
+class graspfile():
+
+	def __init__(self, object_id, hand_type="SDH", tip_link="sdh_palm_link"):
+		self.object_id = object_id;
+		self.hand_type = hand_type;
+		self.tip_link = tip_link;
+		self.chunks = {};
+		self.number_of_grasps = 0;
+
+
+	def __len__(self):
+		return self.number_of_grasps;
+
+
+	#adds the valid grasps of a chunk of the generation (the arrays of openraveutils.generate_works)
+	def add_chunk(self, chunk_id, result):
+		grasps = [];
+		for i in range(0, len(result['joint_values'])):
+			values = result['joint_values'][i].tolist();
+			(t, e) = (result['grasp_pose'][i][0:3], result['grasp_pose'][i][3:6]);
+			tp = result['pregrasp_pose'][i][0:3];
+			grasps.append(grasp_text(values, t, e, tp, str(result['category'][i])));
+
+		if chunk_id in self.chunks:
+			self.number_of_grasps -= len(self.chunks[chunk_id]);
+		self.chunks[chunk_id] = grasps;
+		self.number_of_grasps += len(grasps);
+
+
+	#the XML text of the grasp file with the grasps of all the chunks
+	def to_xml(self, complete=True):
+		text = ["<?xml version=\"1.0\" ?>\n",
+			"<GraspList>\n",
+			"  <object_id>"+str(self.object_id)+"</object_id>\n",
+			"  <hand_type>"+self.hand_type+"</hand_type>\n",
+			"  <joint_names>"+JOINT_NAMES+"</joint_names>\n",
+			"  <tip_link>"+self.tip_link+"</tip_link>\n"];
+
+		counter = 0;
+		for chunk_id in sorted(self.chunks.keys()):
+			for grasp in self.chunks[chunk_id]:
+				text.append("  <Grasp Index=\""+str(counter)+"\">\n");
+				text.append(grasp);
+				counter += 1;
+
+		text.append("  <NumberOfGrasps>"+str(counter)+"</NumberOfGrasps>\n");
+		if not complete:
+			text.append("  <complete>False</complete>\n");
+		text.append("</GraspList>\n");
+		return "".join(text);
+
+
+#the elements of a grasp, without the <Grasp> tag which has the index of the grasp in the file
+def grasp_text(values, t, e, tp, category):
+	return "".join(["    <joint_values>"+str(values)+"</joint_values>\n",
+		"    <GraspPose>\n",
+		"      <Translation>["+str(t[0])+", "+str(t[1])+", "+str(t[2])+"]</Translation>\n",
+		"      <Rotation>["+str(e[0])+", "+str(e[1])+", "+str(e[2])+"]</Rotation>\n",
+		"    </GraspPose>\n",
+		"    <PreGraspPose>\n",
+		"      <Translation>["+str(tp[0])+", "+str(tp[1])+", "+str(tp[2])+"]</Translation>\n",
+		"      <Rotation>["+str(e[0])+", "+str(e[1])+", "+str(e[2])+"]</Rotation>\n",
+		"    </PreGraspPose>\n",
+		"    <category>"+category+"</category>\n",
+		"  </Grasp>\n"]);
@@ -6,7 +6,10 @@ import rospy
 import tf
 import numpy
 
-from xml.dom import minidom
+import graspset
+
+from array import array as value_array #numpy's array is imported below as array
+from xml.etree.cElementTree import iterparse
 from srs_msgs.msg import *
 from kinematics_msgs.srv import *
 from cob_srvs.srv import *
@@ -16,6 +19,14 @@ from srs_msgs.msg import GraspingErrorCodes
 from cob_kinematics.srv import * #GetPositionIKExtended
 from arm_navigation_msgs.srv import * #PlanningScene
 
+#the values of a list written as text, "[0.1, 0.2, 0.3]" -> [0.1, 0.2, 0.3]
+def parse_list(text):
+	text = text.strip();
+	if text.startswith('[') and text.endswith(']'):
+		text = text[1:-1];
+	return [float(value) for value in text.split(',')];
+
+
 class graspingutils():
 
 	def __init__(self, simulation=True):
@@ -80,58 +91,54 @@ class graspingutils():
 		return ((category == "TOP") or (category == "SIDE") or (category == "-SIDE") or (category == "FRONT"));
 
 
+	#reads a grasp file (a file name or a file object) into a graspset. the file is read grasp by grasp, every Grasp element is
+	#dropped once its values are kept in the columns, and the orientations of all the grasps are converted at the end.
 	def get_grasps(self, file_name):
 
 		try:
-			xmldoc = minidom.parse(file_name)  
-			object_id = int(((xmldoc.firstChild)).getElementsByTagName('object_id')[0].firstChild.nodeValue)
-			res = []
-			hijos = (xmldoc.firstChild).getElementsByTagName('Grasp')
-			grasps = []
-			for hijo in hijos:
-				sdh_joint_values = ((hijo.getElementsByTagName('joint_values'))[0]).firstChild.nodeValue
-				aux = (hijo.getElementsByTagName('GraspPose'))[0]
-				Translation = eval((aux.getElementsByTagName('Translation')[0]).firstChild.nodeValue)
-				Rotation = eval((aux.getElementsByTagName('Rotation')[0]).firstChild.nodeValue)
-				grasp = PoseStamped()
-				grasp.header.frame_id = "/base_link";
-				grasp.pose.position.x = float(Translation[0])
-				grasp.pose.position.y = float(Translation[1])
-				grasp.pose.position.z = float(Translation[2])
-				Rotation =  tf.transformations.quaternion_from_euler(Rotation[0], Rotation[1], Rotation[2], axes='sxyz')
-				grasp.pose.orientation.x = float(Rotation[0])
-				grasp.pose.orientation.y = float(Rotation[1])
-				grasp.pose.orientation.z = float(Rotation[2])
-				grasp.pose.orientation.w = float(Rotation[3])
-				aux = (hijo.getElementsByTagName('PreGraspPose'))[0]
-
-				Translation = eval((aux.getElementsByTagName('Translation')[0]).firstChild.nodeValue)
-				Rotation = eval((aux.getElementsByTagName('Rotation')[0]).firstChild.nodeValue)
-
-				pre_grasp = PoseStamped()
-				pre_grasp.header.frame_id = "/base_link"; 
-				pre_grasp.pose.position.x = float(Translation[0])
-				pre_grasp.pose.position.y = float(Translation[1])
-				pre_grasp.pose.position.z = float(Translation[2])
-				Rotation = tf.transformations.quaternion_from_euler(Rotation[0], Rotation[1], Rotation[2], axes='sxyz')
-				pre_grasp.pose.orientation.x = float(Rotation[0])
-				pre_grasp.pose.orientation.y = float(Rotation[1])
-				pre_grasp.pose.orientation.z = float(Rotation[2])
-				pre_grasp.pose.orientation.w = float(Rotation[3])
-				category = ((hijo.getElementsByTagName('category'))[0]).firstChild.nodeValue
-
-				GC = DBGrasp()
-				GC.object_id = object_id
-				GC.hand_type = "SDH"
-				GC.sdh_joint_values = eval(sdh_joint_values)
-				GC.pre_grasp = pre_grasp
-				GC.grasp = grasp
-				GC.category= str(category)
-				grasps.append(GC)
-
-			return grasps
-		except:
-			print "There are not generated files for this object."
+			object_id = None;
+			complete = True;
+			joint_values = value_array('d');
+			poses = {'GraspPose': value_array('d'), 'PreGraspPose': value_array('d')};
+			categories = [];
+			root = None;
+			for event, elem in iterparse(file_name, events=('start', 'end')):
+				if event == 'start':
+					if root is None:
+						root = elem;
+					continue;
+
+				if elem.tag == 'object_id' and object_id is None:
+					object_id = int(elem.text);
+				elif elem.tag == 'complete':
+					complete = (elem.text.strip() != "False");
+				elif elem.tag == 'Grasp':
+					values = parse_list(elem.findtext('joint_values'));
+					if len(values) != 7:
+						raise ValueError("%d joint values" %len(values));
+					for pose_tag in ('GraspPose', 'PreGraspPose'):
+						pose = elem.find(pose_tag);
+						Translation = parse_list(pose.findtext('Translation'));
+						Rotation = parse_list(pose.findtext('Rotation'));
+						if len(Translation) != 3 or len(Rotation) != 3:
+							raise ValueError("wrong %s" %pose_tag);
+						poses[pose_tag].extend(Translation + Rotation);
+					joint_values.extend(values);
+					categories.append(elem.findtext('category').strip());
+					root.clear();
+
+			if object_id is None:
+				raise ValueError("no object_id");
+
+			#[x, y, z, roll, pitch, yaw] -> [x, y, z, qx, qy, qz, qw]
+			res = {};
+			for pose_tag in poses:
+				euler_poses = numpy.frombuffer(poses[pose_tag], dtype=float).reshape(-1, 6);
+				res[pose_tag] = numpy.hstack((euler_poses[:,0:3], graspset.quaternions_from_euler(euler_poses[:,3:6])));
+
+			return graspset.graspset(object_id, numpy.frombuffer(joint_values, dtype=float).reshape(-1, 7), res['GraspPose'], res['PreGraspPose'], categories, complete=complete);
+		except (SyntaxError, ValueError, TypeError, AttributeError), e:
+			print "There are not generated files for this object: %s" %str(e)
 			return GraspingErrorCodes.CORRUPTED_GRASP_FILE;
 
 
@@ -158,6 +165,19 @@ class graspingutils():
 
 		return category;
 
+
+	#the categories of get_grasp_category for (N,3) pregrasp and grasp positions
+	def get_grasp_categories(self, pre, g):
+		d = numpy.asarray(pre) - numpy.asarray(g);
+		x = d[:,0];
+		y = d[:,1];
+		z = d[:,2];
+		categories = numpy.array(["UNKNOWN"]*len(d), dtype='S7');
+		#the checks of get_grasp_category from the last one to the first one, so the first true check is kept
+		for (mask, category) in [(z < -0.08, "DOWN"), (z > 0.08, "TOP"), (y < -0.08, "-SIDE"), (y > 0.08, "SIDE"), (x < -0.08, "BACK"), (x > 0.08, "FRONT")]:
+			categories[mask] = category;
+		return categories;
+
 	def parse_cartesian_param(self, param, now = None):
 		if now is None:
 			now = rospy.Time.now()
@@ -206,7 +226,11 @@ class graspingutils():
 			ps = param
 		return pose_target,ps
 
-	def callIKSolver(self,current_pose, goal_pose):
+	#a new connection to the IK solver. a persistent connection keeps its socket open between the calls, it must not be shared by threads.
+	def get_ik_service(self, persistent=False):
+		return rospy.ServiceProxy(self.ik_service_name, self.get_ik_srv_type(), persistent=persistent)
+
+	def callIKSolver(self,current_pose, goal_pose, ik_service=None):
 
 		req = GetPositionIKRequest();
 		if self.ik_service_name == "/srs_arm_kinematics/get_ik" or self.ik_service_name == "/cob_arm_kinematics/get_ik" or self.ik_service_name == "/cob_ik_wrapper/arm/get_ik":
@@ -234,7 +258,9 @@ class graspingutils():
 		req.ik_request.pose_stamped = goal_pose
 		req.ik_request.ik_seed_state.joint_state.position = current_pose
 		req.ik_request.ik_seed_state.joint_state.name = ["arm_%d_joint" % (d+1) for d in range(7)]
-		resp = self.ik_service(req);
+		if ik_service is None:
+			ik_service = self.ik_service
+		resp = ik_service(req);
 		return (list(resp.solution.joint_state.position), resp.error_code);
 
 
@@ -375,3 +401,25 @@ class graspingutils():
 			pre.position.z += offset;
 
 		return pre;
+
+
+	#set_pregrasp_offsets for (N,3) pregrasp positions with their categories, returns the new positions
+	def set_pregrasps_offsets(self, categories, pre, pregrasps_offsets):
+		pre = numpy.array(pre, dtype=float);
+		if len(pregrasps_offsets) != 2:
+			return pre;
+
+		os = 0.6;
+		side_offset = max(pregrasps_offsets[0] - os, 0);
+		top_offset = max(pregrasps_offsets[1] - os, 0);
+		height = max(pregrasps_offsets[1], 0);
+
+		front = (categories == "FRONT");
+		side = (categories == "SIDE");
+		mside = (categories == "-SIDE");
+		pre[front,0] += side_offset;
+		pre[side,1] += side_offset;
+		pre[mside,1] -= side_offset;
+		pre[front | side | mside,2] += height;
+		pre[~(front | side | mside),2] += top_offset;
+		return pre;
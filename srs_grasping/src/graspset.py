@@ -0,0 +1,170 @@
+#!/usr/bin/python
+
+import roslib
+roslib.load_manifest('srs_grasping')
+import numpy
+
+from srs_msgs.msg import DBGrasp
+from geometry_msgs.msg import PoseStamped
+
+#The grasps of an object kept as columns of numpy arrays instead of one DBGrasp message per grasp:
+#	joint_values	(N,7) sdh joint values
+#	grasp_poses	(N,7) grasp poses [x, y, z, qx, qy, qz, qw] in the object frame
+#	pregrasp_poses	(N,7) pregrasp poses [x, y, z, qx, qy, qz, qw] in the object frame
+#	categories	(N,) category names
+#complete is False for the grasps of a generation which has not finished yet.
+#The DBGrasp messages are only built when they are sent.
+
+class graspset():
+
+	def __init__(self, object_id, joint_values, grasp_poses, pregrasp_poses, categories, hand_type="SDH", complete=True):
+		self.object_id = object_id;
+		self.hand_type = hand_type;
+		self.complete = complete;
+		self.joint_values = numpy.asarray(joint_values, dtype=float).reshape(-1, 7);
+		self.grasp_poses = numpy.asarray(grasp_poses, dtype=float).reshape(-1, 7);
+		self.pregrasp_poses = numpy.asarray(pregrasp_poses, dtype=float).reshape(-1, 7);
+		self.categories = numpy.asarray(categories, dtype=str).reshape(-1);
+
+
+	def __len__(self):
+		return len(self.grasp_poses);
+
+
+	#the grasps of the indices (all of them by default) as DBGrasp messages
+	def to_grasps(self, indices=None, frame_id="/base_link"):
+		if indices is None:
+			indices = range(0, len(self));
+
+		grasps = [];
+		for i in indices:
+			GC = DBGrasp();
+			GC.object_id = self.object_id;
+			GC.hand_type = self.hand_type;
+			GC.sdh_joint_values = self.joint_values[i].tolist();
+			GC.pre_grasp = pose_stamped(self.pregrasp_poses[i], frame_id);
+			GC.grasp = pose_stamped(self.grasp_poses[i], frame_id);
+			GC.category = str(self.categories[i]);
+			grasps.append(GC);
+		return grasps;
+
+
+	#the grasps of the indices as a new graspset
+	def select(self, indices):
+		return graspset(self.object_id, self.joint_values[indices], self.grasp_poses[indices], self.pregrasp_poses[indices], self.categories[indices], self.hand_type, self.complete);
+
+
+#the graspset of a list of DBGrasp messages, object_id is used when the list is empty
+def from_grasps(grasps, object_id=0):
+	if len(grasps) > 0:
+		object_id = grasps[0].object_id;
+
+	joint_values = numpy.zeros((len(grasps), 7));
+	grasp_poses = numpy.zeros((len(grasps), 7));
+	pregrasp_poses = numpy.zeros((len(grasps), 7));
+	categories = [];
+	for i in range(0, len(grasps)):
+		joint_values[i] = grasps[i].sdh_joint_values;
+		grasp_poses[i] = array_from_pose(grasps[i].grasp.pose);
+		pregrasp_poses[i] = array_from_pose(grasps[i].pre_grasp.pose);
+		categories.append(grasps[i].category);
+	return graspset(object_id, joint_values, grasp_poses, pregrasp_poses, categories);
+
+
+#quaternions [qx, qy, qz, qw] of (N,3) euler angles with axes='sxyz', as tf.transformations.quaternion_from_euler
+def quaternions_from_euler(euler):
+	euler = numpy.asarray(euler, dtype=float).reshape(-1, 3) / 2.0;
+	ci = numpy.cos(euler[:,0]);
+	si = numpy.sin(euler[:,0]);
+	cj = numpy.cos(euler[:,1]);
+	sj = numpy.sin(euler[:,1]);
+	ck = numpy.cos(euler[:,2]);
+	sk = numpy.sin(euler[:,2]);
+	cc = ci*ck;
+	cs = ci*sk;
+	sc = si*ck;
+	ss = si*sk;
+
+	q = numpy.empty((len(euler), 4));
+	q[:,0] = cj*sc - sj*cs;
+	q[:,1] = cj*ss + sj*cc;
+	q[:,2] = cj*cs - sj*sc;
+	q[:,3] = cj*cc + sj*ss;
+	return q;
+
+
+#(N,4,4) homogeneous matrices of (N,7) poses [x, y, z, qx, qy, qz, qw], as tf.transformations.quaternion_matrix
+def matrices_from_poses(poses):
+	poses = numpy.asarray(poses, dtype=float).reshape(-1, 7);
+	q = poses[:,3:7] / numpy.sqrt((poses[:,3:7]**2).sum(axis=1))[:,numpy.newaxis];
+	x = q[:,0];
+	y = q[:,1];
+	z = q[:,2];
+	w = q[:,3];
+
+	M = numpy.zeros((len(poses), 4, 4));
+	M[:,0,0] = 1.0 - 2.0*(y*y + z*z);
+	M[:,0,1] = 2.0*(x*y - z*w);
+	M[:,0,2] = 2.0*(x*z + y*w);
+	M[:,1,0] = 2.0*(x*y + z*w);
+	M[:,1,1] = 1.0 - 2.0*(x*x + z*z);
+	M[:,1,2] = 2.0*(y*z - x*w);
+	M[:,2,0] = 2.0*(x*z - y*w);
+	M[:,2,1] = 2.0*(y*z + x*w);
+	M[:,2,2] = 1.0 - 2.0*(x*x + y*y);
+	M[:,0:3,3] = poses[:,0:3];
+	M[:,3,3] = 1.0;
+	return M;
+
+
+#(N,7) poses [x, y, z, qx, qy, qz, qw] of (N,4,4) homogeneous matrices, with the same branches as tf.transformations.quaternion_from_matrix
+def poses_from_matrices(M):
+	M = numpy.asarray(M, dtype=float).reshape(-1, 4, 4);
+	q = numpy.zeros((len(M), 4));
+	t = numpy.zeros(len(M));
+	trace = M[:,0,0] + M[:,1,1] + M[:,2,2] + M[:,3,3];
+
+	done = trace > M[:,3,3];
+	t[done] = trace[done];
+	q[done,3] = trace[done];
+	q[done,2] = M[done,1,0] - M[done,0,1];
+	q[done,1] = M[done,0,2] - M[done,2,0];
+	q[done,0] = M[done,2,1] - M[done,1,2];
+
+	#the largest diagonal element gives the axis i of the remaining matrices
+	i = numpy.zeros(len(M), dtype=int);
+	i[M[:,1,1] > M[:,0,0]] = 1;
+	diagonal = M[:,[0,1,2],[0,1,2]];
+	i[diagonal[:,2] > diagonal[numpy.arange(len(M)),i]] = 2;
+	for (axis, j, k) in [(0, 1, 2), (1, 2, 0), (2, 0, 1)]:
+		m = (~done) & (i == axis);
+		t[m] = M[m,axis,axis] - (M[m,j,j] + M[m,k,k]) + M[m,3,3];
+		q[m,axis] = t[m];
+		q[m,j] = M[m,axis,j] + M[m,j,axis];
+		q[m,k] = M[m,k,axis] + M[m,axis,k];
+		q[m,3] = M[m,k,j] - M[m,j,k];
+
+	q *= (0.5 / numpy.sqrt(t * M[:,3,3]))[:,numpy.newaxis];
+	return numpy.hstack((M[:,0:3,3], q));
+
+
+#the (N,4,4) matrices of the poses in the frame of transform (4,4), transform * M for every matrix
+def transform_matrices(transform, M):
+	return numpy.einsum('ij,njk->nik', numpy.asarray(transform, dtype=float), M);
+
+
+def array_from_pose(pose):
+	return [pose.position.x, pose.position.y, pose.position.z, pose.orientation.x, pose.orientation.y, pose.orientation.z, pose.orientation.w];
+
+
+def pose_stamped(values, frame_id="/base_link"):
+	ps = PoseStamped();
+	ps.header.frame_id = frame_id;
+	ps.pose.position.x = float(values[0]);
+	ps.pose.position.y = float(values[1]);
+	ps.pose.position.z = float(values[2]);
+	ps.pose.orientation.x = float(values[3]);
+	ps.pose.orientation.y = float(values[4]);
+	ps.pose.orientation.z = float(values[5]);
+	ps.pose.orientation.w = float(values[6]);
+	return ps;
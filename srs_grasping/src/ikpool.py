@@ -0,0 +1,91 @@
+#!/usr/bin/python
+
+import roslib
+roslib.load_manifest('srs_grasping')
+import rospy
+import threading
+import Queue
+
+#Persistent connections to the IK solver, shared by the threads which check the grasps of a request.
+#Every thread takes one connection for the whole request, so a connection is never used by two threads at the same time.
+#The grasps are checked in the given order and the check stops when max_results grasps have been found before all
+#the grasps which are still being checked, so the result is the same as checking the grasps one by one.
+
+class ikpool():
+
+	def __init__(self, graspingutils, num_connections=4):
+		self.graspingutils = graspingutils;
+		self.num_connections = max(1, num_connections);
+		self.connections = Queue.Queue();
+		for i in range(0, self.num_connections):
+			self.connections.put(None);
+
+
+	def get_connection(self):
+		connection = self.connections.get();
+		if connection is None:
+			connection = self.graspingutils.get_ik_service(persistent=True);
+		return connection;
+
+
+	def release_connection(self, connection):
+		self.connections.put(connection);
+
+
+	#check(candidate, ik_service) is called for the candidates in order by num_connections threads and returns True for a feasible one.
+	#returns the indices of the feasible candidates, the first max_results of them (all of them when max_results <= 0).
+	def solve(self, candidates, check, max_results=0):
+		state = {'next': 0, 'stop': False};
+		results = [None]*len(candidates);
+		lock = threading.Lock();
+
+		def worker():
+			ik_service = self.get_connection();
+			try:
+				while True:
+					lock.acquire();
+					try:
+						if state['stop'] or state['next'] >= len(candidates):
+							return;
+						i = state['next'];
+						state['next'] += 1;
+					finally:
+						lock.release();
+
+					try:
+						feasible = check(candidates[i], ik_service);
+					except rospy.ServiceException, e:
+						#the persistent connection is closed after an error, a new one is opened for the next grasp
+						rospy.logerr("IK service did not process request: %s", str(e));
+						ik_service.close();
+						ik_service = self.graspingutils.get_ik_service(persistent=True);
+						feasible = False;
+
+					lock.acquire();
+					try:
+						results[i] = feasible;
+						if max_results > 0:
+							#the feasible grasps before the first grasp which is still being checked
+							found = 0;
+							for result in results:
+								if result is None:
+									break;
+								if result:
+									found += 1;
+							if found >= max_results:
+								state['stop'] = True;
+					finally:
+						lock.release();
+			finally:
+				self.release_connection(ik_service);
+
+		threads = [threading.Thread(target=worker) for i in range(0, min(self.num_connections, len(candidates)))];
+		for thread in threads:
+			thread.start();
+		for thread in threads:
+			thread.join();
+
+		feasible = [i for i in range(0, len(candidates)) if results[i]];
+		if max_results > 0:
+			feasible = feasible[0:max_results];
+		return feasible;
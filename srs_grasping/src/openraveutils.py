@@ -9,12 +9,14 @@ import sys
 import tf
 import os
 import copy
-#import multiprocessing
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import graspfile
 
 from numpy import *
 from traceback import print_exc
-from xml.dom.minidom import Document
-import re
 from srs_msgs.msg import GraspingErrorCodes
 class openraveutils():
 
@@ -23,7 +25,11 @@ class openraveutils():
 			   robotManipulator="arm",
 			   env=None,
 			   robot=None,
-			   pregrasp_offset=0.2):
+			   pregrasp_offset=0.2,
+			   num_workers=None,
+			   chunk_size=100,
+			   checkpoint_dir="/tmp",
+			   insert_batch=None):
 
 		self.robotName = roslib.packages.get_pkg_dir("srs_grasping")+"/robots/"+robotName;
 		self.manipulator = robotManipulator;
@@ -32,6 +38,25 @@ class openraveutils():
 		self.pregrasp_offset = pregrasp_offset;
 		self.databaseutils = databaseutils
 
+		#the grasp generation is split in chunks of chunk_size grasps for num_workers processes, the finished chunks are kept in checkpoint_dir
+		if num_workers is None:
+			num_workers = rospy.get_param("/srs/grasp_generation_workers", 1)
+		self.num_workers = num_workers;
+		self.chunk_size = chunk_size;
+		self.checkpoint_dir = checkpoint_dir;
+		self.checkpoint = None;
+		self.mesh_data = None;
+
+		#the grasps are sent to the DB every insert_batch new grasps while they are generated
+		if insert_batch is None:
+			insert_batch = rospy.get_param("/srs/grasp_insert_batch", 200)
+		self.insert_batch = insert_batch;
+		self.inserted = 0;
+		#the generations running in the background by object_id, the generations share the environment so they run one by one
+		self.generations = {};
+		self.generations_lock = threading.Lock();
+		self.generation_lock = threading.Lock();
+
 
 		if self.databaseutils is None:
 			self.databaseutils = grasping_functions.databaseutils();
@@ -57,6 +82,10 @@ class openraveutils():
 			return mesh_file
 
 		try:
+			#the workers of the generation load the mesh in their own environments
+			f = open(mesh_file, 'r')
+			self.mesh_data = f.read()
+			f.close()
 			target = self.env.ReadKinBodyXMLFile(mesh_file)
 			self.env.AddKinBody(target);
 			os.remove(mesh_file);
@@ -235,76 +264,204 @@ class openraveutils():
 ########################## NEW FUNCTIONS ########################################################
 
 	def generator(self, object_id):
-		grasps = self.generate_grasp_file(object_id)
-		if grasps < 0:
-			return grasps;
-		elif self.databaseutils.insert_grasps(object_id, grasps) < 0:
-			return GraspingErrorCodes.SERVICE_DID_NOT_PROCESS_REQUEST;
-		else:
+		self.generation_lock.acquire();
+		try:
+			grasps = self.generate_grasp_file(object_id)
+			if grasps < 0:
+				return grasps;
+			elif self.databaseutils.insert_grasps(object_id, grasps) < 0:
+				return GraspingErrorCodes.SERVICE_DID_NOT_PROCESS_REQUEST;
+			else:
+				#the grasps are in the DB, the generation does not need to be resumed
+				self.remove_checkpoint(object_id);
+				return GraspingErrorCodes.SUCCESS;
+		finally:
+			self.generation_lock.release();
+
+
+	#starts the generator of the object in the background, unless it is already running. returns the generation:
+	#	available	set when there are grasps of the object in the DB or the generation has finished
+	#	result		the result of generator, None while it is running
+	def start_generator(self, object_id):
+		self.generations_lock.acquire();
+		try:
+			generation = self.generations.get(object_id);
+			if generation is None:
+				generation = {'available': threading.Event(), 'result': None};
+				self.generations[object_id] = generation;
+				thread = threading.Thread(target=self.run_generator, args=(object_id, generation));
+				thread.daemon = True;
+				thread.start();
+			return generation;
+		finally:
+			self.generations_lock.release();
+
+
+	def run_generator(self, object_id, generation):
+		try:
+			generation['result'] = self.generator(object_id);
+		except Exception, e:
+			rospy.logerr("The grasp generation of the object with ID=%d has failed: %s", object_id, str(e));
+			generation['result'] = GraspingErrorCodes.SERVICE_DID_NOT_PROCESS_REQUEST;
+		finally:
+			self.generations_lock.acquire();
+			try:
+				self.generations.pop(object_id, None);
+			finally:
+				self.generations_lock.release();
+			generation['available'].set();
+
+
+	#waits for the first grasps of a generation. returns SUCCESS when there are grasps in the DB, the error of the generation otherwise.
+	def wait_generator(self, generation):
+		generation['available'].wait();
+		if generation['result'] is None:
 			return GraspingErrorCodes.SUCCESS;
+		return generation['result'];
+
 
+	def is_generating(self, object_id):
+		return object_id in self.generations;
 
-	def generate_grasps(self, gmodel, doc):
+
+	def generate_grasps(self, gmodel, grasp_file):
 		starttime = time.time();
 		rospy.loginfo("GENERATING GRASPS...")
-		counter = self.autogenerate(gmodel, doc);
+		counter = self.autogenerate(gmodel, grasp_file);
 		rospy.loginfo("GRASPS GENERATION HAS FINISHED. Time employed: %s", str(time.time() - starttime))
 		return counter;
 		
 
-	def autogenerate(self, gmodel, doc, options=None):
-		counter = self.generate(gmodel, doc, *gmodel.autogenerateparams(options))
+	def autogenerate(self, gmodel, grasp_file, options=None):
+		counter = self.generate(gmodel, grasp_file, *gmodel.autogenerateparams(options))
 		starttime = time.time();
 		gmodel.save()
 		return counter
 
 
-	def generate(self, gmodel, doc, *args, **kwargs):
-		graspingnoise = args[4]
-		forceclosure = args[5]
-		forceclosurethreshold = args[6]
-		checkgraspfn = args[7]
+	#The approach rays of the producer are split in chunks of chunk_size grasps. The chunks are tested by num_workers processes
+	#(or by this process when num_workers is 1) and the valid grasps of every chunk are saved as arrays in the checkpoint of the object,
+	#so a generation which was interrupted goes on with the chunks which were not finished. The chunks are added to the grasp file in the
+	#order of the producer and the grasp file is sent to the DB every insert_batch new grasps.
+	def generate(self, gmodel, grasp_file, *args, **kwargs):
 
 		starttime = time.time()
 		statesaver = self.robot.CreateRobotStateSaver()
 		bodies = [(b,b.IsEnabled()) for b in self.env.GetBodies() if b != self.robot and b != gmodel.target]
 		if gmodel.disableallbodies:
-		    for b in bodies:
-			b[0].Enable(False)
+			for b in bodies:
+				b[0].Enable(False)
+		counter_isValid = 0
 		try:
-		    if gmodel.numthreads is not None and gmodel.numthreads > 1:
-			gmodel._generateThreaded(*args,**kwargs)
-		    else:
-			with gmodel.GripperVisibility(gmodel.manip):
-			    if self.env.GetViewer() is not None:
-				self.env.UpdatePublishedBodies()
-
-			    aux = [item for item in args]
-			    aux[1] = array([0.03, 0.05])	#standoffs
-				
-			    producer,consumer,gatherer,numjobs = gmodel.generatepcg(*aux,**kwargs)
-			    counter = 0
-			    counter_isValid = 0
-			    for work in producer():
-				print '\r[grasp %d/%d][Good grasps: %d]'%(counter,numjobs,counter_isValid),
-				sys.stdout.flush()
-				counter += 1
-				results = self.consumer(gmodel, doc, counter_isValid, graspingnoise, forceclosure, forceclosurethreshold, checkgraspfn, *work)
-				if results is not None:
-				    gatherer(results)
-				    counter_isValid+=1;
-
-			    gatherer() # gather results
+			if gmodel.numthreads is not None and gmodel.numthreads > 1:
+				gmodel._generateThreaded(*args,**kwargs)
+			else:
+				with gmodel.GripperVisibility(gmodel.manip):
+					if self.env.GetViewer() is not None:
+						self.env.UpdatePublishedBodies()
+
+					aux = [item for item in args]
+					aux[1] = array([0.03, 0.05])	#standoffs
+
+					producer,consumer,gatherer,numjobs = gmodel.generatepcg(*aux,**kwargs)
+					works = [work for work in producer()]
+					chunks = [(chunk_id, first, works[first:first+self.chunk_size]) for (chunk_id, first) in enumerate(range(0, len(works), self.chunk_size))]
+
+					results = self.load_checkpoint(len(works))
+					pending = [chunk for chunk in chunks if chunk[0] not in results]
+					self.inserted = 0
+					if len(results) > 0:
+						rospy.loginfo("Resuming the grasp generation: %d of %d chunks were already generated.", len(results), len(chunks))
+						for chunk_id in results:
+							grasp_file.add_chunk(chunk_id, results[chunk_id])
+						self.insert_partial_grasps(grasp_file, force=True)
+
+					if self.num_workers > 1 and len(pending) > 1:
+						pool = multiprocessing.Pool(min(self.num_workers, len(pending)), init_generation_worker, (self, aux, kwargs))
+						try:
+							for (chunk_id, result) in pool.imap_unordered(generate_chunk, pending):
+								self.save_chunk(chunk_id, result)
+								results[chunk_id] = result
+								grasp_file.add_chunk(chunk_id, result)
+								self.print_progress(results, chunks, len(works))
+								self.insert_partial_grasps(grasp_file)
+							pool.close()
+						except:
+							pool.terminate()
+							raise
+						pool.join()
+					else:
+						for (chunk_id, first, chunk_works) in pending:
+							result = self.generate_works(gmodel, first, chunk_works, aux)
+							self.save_chunk(chunk_id, result)
+							results[chunk_id] = result
+							grasp_file.add_chunk(chunk_id, result)
+							self.print_progress(results, chunks, len(works))
+							self.insert_partial_grasps(grasp_file)
+
+					#the grasps of the model keep the order of the producer
+					for chunk_id in range(0, len(chunks)):
+						for grasp in results[chunk_id]['grasp']:
+							gatherer(grasp)
+					counter_isValid = len(grasp_file)
+
+					gatherer() # gather results
 		finally:
-		    for b,enable in bodies:
-			b.Enable(enable)
-		    statesaver = None
+			for b,enable in bodies:
+				b.Enable(enable)
+			statesaver = None
 
-		print 'grasping finished in %fs'%(time.time()-starttime)
+		print '\ngrasping finished in %fs'%(time.time()-starttime)
 		return counter_isValid
 
 
-	def consumer(self, gmodel, doc, counter, graspingnoise, forceclosure, forceclosurethreshold, checkgraspfn, approachray, roll, preshape, standoff, manipulatordirection):
+	#sends the grasps generated so far to the DB when there are insert_batch new grasps (or any new grasp with force),
+	#so they can be used before the generation finishes. a failed insert is tried again with the next batch.
+	def insert_partial_grasps(self, grasp_file, force=False):
+		if len(grasp_file) == self.inserted or (not force and len(grasp_file) - self.inserted < self.insert_batch):
+			return False
+
+		if self.databaseutils.insert_grasps(grasp_file.object_id, grasp_file.to_xml(complete=False)) < 0:
+			rospy.logwarn("The grasps generated so far could not be sent to the DB.")
+			return False
+
+		self.inserted = len(grasp_file)
+		generation = self.generations.get(grasp_file.object_id)
+		if generation is not None:
+			generation['available'].set()
+		return True
+
+
+	def print_progress(self, results, chunks, numjobs):
+		tested = sum([len(chunks[chunk_id][2]) for chunk_id in results])
+		valid = sum([len(results[chunk_id]['work']) for chunk_id in results])
+		print '\r[grasp %d/%d][Good grasps: %d]'%(tested,numjobs,valid),
+		sys.stdout.flush()
+
+
+	#tests the works of a chunk, works[0] is the work number first of the producer. returns the valid grasps as arrays.
+	def generate_works(self, gmodel, first, works, args):
+		graspingnoise = args[4]
+		forceclosure = args[5]
+		forceclosurethreshold = args[6]
+		checkgraspfn = args[7]
+
+		valid = []
+		for i in range(0, len(works)):
+			results = self.consumer(gmodel, graspingnoise, forceclosure, forceclosurethreshold, checkgraspfn, *works[i])
+			if results is not None:
+				valid.append((first+i, results[0], results[1]))
+
+		return {'work': array([v[0] for v in valid], dtype=int).reshape(-1),
+			'grasp': array([v[1] for v in valid], dtype=float).reshape(-1, gmodel.totaldof),
+			'joint_values': array([v[2][0] for v in valid], dtype=float).reshape(-1, 7),
+			'grasp_pose': array([list(v[2][1])+list(v[2][2]) for v in valid], dtype=float).reshape(-1, 6),
+			'pregrasp_pose': array([list(v[2][3])+list(v[2][2]) for v in valid], dtype=float).reshape(-1, 6),
+			'category': array([v[2][4] for v in valid], dtype='S7').reshape(-1)}
+
+
+	#returns (grasp, (joint_values, t, e, tp, category)) for a valid grasp, None otherwise
+	def consumer(self, gmodel, graspingnoise, forceclosure, forceclosurethreshold, checkgraspfn, approachray, roll, preshape, standoff, manipulatordirection):
 
 		grasp = zeros(gmodel.totaldof)
 		grasp[gmodel.graspindices.get('igrasppos')] = approachray[0:3]
@@ -322,7 +479,7 @@ class openraveutils():
 				return None
 		except:
 			print 'Grasp Failed: '
-                	print_exc(e)
+			print_exc()
 			return None
 
 		Tlocalgrasp = eye(4)
@@ -350,8 +507,9 @@ class openraveutils():
 
 				if checkgraspfn is None or gmodel.checkgraspfn(contacts,finalconfig,grasp,{'mindist':mindist,'volume':volume}):
 
-					if self.add_valid_grasp_to_file(doc, counter, values):
-						return grasp
+					valid_grasp = self.get_valid_grasp(values)
+					if valid_grasp is not None:
+						return (grasp, valid_grasp)
 					else:
 						return None
 
@@ -364,46 +522,16 @@ class openraveutils():
 		if gmodel < 0:
 			return gmodel
 
-		doc = Document()
-		GraspList = doc.createElement("GraspList")
-		doc.appendChild(GraspList)
-
-		obj_id = doc.createElement("object_id")
-		GraspList.appendChild(obj_id)
-		obj_id_text = doc.createTextNode(str(object_id))
-		obj_id.appendChild(obj_id_text)
-
-		hand_type = doc.createElement("hand_type")
-		GraspList.appendChild(hand_type)
-		hand_type_text = doc.createTextNode("SDH")
-		hand_type.appendChild(hand_type_text)
-
-		joint_names = doc.createElement("joint_names")
-		GraspList.appendChild(joint_names)
-		joint_names_text = doc.createTextNode("[sdh_knuckle_joint, sdh_thumb_2_joint, sdh_thumb_3_joint, sdh_finger_12_joint, sdh_finger_13_joint, sdh_finger_22_joint, sdh_finger_23_joint]")
-		joint_names.appendChild(joint_names_text)
-
-		tip_link = doc.createElement("tip_link")
-		GraspList.appendChild(tip_link)
-		tip_link_text = doc.createTextNode("sdh_palm_link")
-		tip_link.appendChild(tip_link_text)
-
-		cont = self.generate_grasps(gmodel, doc);
-
-		NumberOfGrasps = doc.createElement("NumberOfGrasps")
-		GraspList.appendChild(NumberOfGrasps)
-		NumberOfGrasps_text = doc.createTextNode(str(cont))
-		NumberOfGrasps.appendChild(NumberOfGrasps_text)
-
-		uglyXml = doc.toprettyxml(indent="  ")
-		text_re = re.compile('>\n\s+([^<>\s].*?)\n\s+</', re.DOTALL)    
-		prettyXml = text_re.sub('>\g<1></', uglyXml)
+		grasp_file = graspfile.graspfile(object_id);
+		self.checkpoint = self.get_checkpoint(object_id);
+		cont = self.generate_grasps(gmodel, grasp_file);
 
 		print str(cont)+" grasps have been added to the XML file."
-		return prettyXml;
+		return grasp_file.to_xml();
 
 
-	def add_valid_grasp_to_file(self, doc, counter, values):
+	#returns (values, t, e, tp, category) of the palm of the robot for the joint values of a valid grasp, None for an unknown category
+	def get_valid_grasp(self, values):
 
 		index = (self.robot.GetLink("sdh_palm_link")).GetIndex()
 		matrix = (self.robot.GetLinkTransformations())[index]
@@ -412,48 +540,90 @@ class openraveutils():
 
 		category = self.graspingutils.get_grasping_direction(matrix)
 		if category is GraspingErrorCodes.UNKNOWN_CATEGORY:
-			return False;
+			return None;
 
 		tp = []
 		tp = self.graspingutils.set_pregrasp(t, category, self.pregrasp_offset);
 		if tp is GraspingErrorCodes.UNKNOWN_CATEGORY:
-			return False;
+			return None;
 
-		GraspList = (doc.getElementsByTagName("GraspList"))[0]
-		Grasp = doc.createElement("Grasp")
-		Grasp.setAttribute("Index", str(counter))
-		GraspList.appendChild(Grasp)
-		
-		joint_values = doc.createElement("joint_values")
-		Grasp.appendChild(joint_values)
-		joint_values_text = doc.createTextNode(str(values))
-		joint_values.appendChild(joint_values_text)
-
-		GraspPose = doc.createElement("GraspPose")
-		Grasp.appendChild(GraspPose)
-		Translation = doc.createElement("Translation")
-		GraspPose.appendChild(Translation)
-		Translation_text = doc.createTextNode("["+str(t[0])+", "+str(t[1])+", "+str(t[2])+"]")
-		Translation.appendChild(Translation_text)
-		Rotation = doc.createElement("Rotation")
-		GraspPose.appendChild(Rotation)
-		Rotation_text = doc.createTextNode("["+str(e[0])+", "+str(e[1])+", "+str(e[2])+"]")
-		Rotation.appendChild(Rotation_text)
-
-		PreGraspPose = doc.createElement("PreGraspPose")
-		Grasp.appendChild(PreGraspPose)
-		Translation2 = doc.createElement("Translation")
-		PreGraspPose.appendChild(Translation2)
-		Translation2_text = doc.createTextNode("["+str(tp[0])+", "+str(tp[1])+", "+str(tp[2])+"]")
-		Translation2.appendChild(Translation2_text)
-		Rotation2 = doc.createElement("Rotation")
-		PreGraspPose.appendChild(Rotation2)
-		Rotation2_text = doc.createTextNode("["+str(e[0])+", "+str(e[1])+", "+str(e[2])+"]")
-		Rotation2.appendChild(Rotation2_text)
-
-		cat = doc.createElement("category")
-		Grasp.appendChild(cat)
-		category_text = doc.createTextNode(category)
-		cat.appendChild(category_text)
-
-		return True;
+		return (values, t, e, tp, category);
+
+
+	#the directory of the checkpoint of an object
+	def get_checkpoint(self, object_id):
+		return os.path.join(self.checkpoint_dir, "grasps_"+str(object_id));
+
+
+	#the chunks of the checkpoint, by chunk number. a checkpoint of another producer (other number of works or chunk size) is removed.
+	def load_checkpoint(self, numjobs):
+		results = {}
+		info = "%d %d" %(numjobs, self.chunk_size)
+		info_file = os.path.join(self.checkpoint, "info")
+		if os.path.exists(info_file) and open(info_file).read() == info:
+			for name in os.listdir(self.checkpoint):
+				if name.startswith("chunk_") and name.endswith(".npz"):
+					try:
+						data = load(os.path.join(self.checkpoint, name))
+						results[int(name[6:-4])] = dict([(key, data[key]) for key in data.files])
+					except (IOError, ValueError, KeyError), e:
+						rospy.logwarn("The checkpoint %s can not be read, the chunk is generated again: %s", name, str(e))
+		else:
+			if os.path.exists(self.checkpoint):
+				shutil.rmtree(self.checkpoint)
+			os.makedirs(self.checkpoint)
+			f = open(info_file, 'w')
+			f.write(info)
+			f.close()
+		return results
+
+
+	#the chunk is written to a temporary file and renamed, an interrupted write does not leave a broken chunk
+	def save_chunk(self, chunk_id, result):
+		chunk_file = os.path.join(self.checkpoint, "chunk_%05d.npz" %chunk_id)
+		tmp_file = os.path.join(self.checkpoint, "tmp_%05d.npz" %chunk_id)
+		savez(tmp_file, **result)
+		os.rename(tmp_file, chunk_file)
+
+
+	def remove_checkpoint(self, object_id):
+		checkpoint = self.get_checkpoint(object_id)
+		if os.path.exists(checkpoint):
+			shutil.rmtree(checkpoint)
+
+
+#the worker processes of generate. every worker has its own OpenRAVE environment with the robot and the object of the parent,
+#the environment of the parent can not be used by other processes. the workers are forked, so the parent is not pickled.
+generation_worker = None
+
+def init_generation_worker(parent, args, kwargs):
+	global generation_worker
+
+	env = openravepy.Environment()
+	robot = env.ReadRobotXMLFile(parent.robotName)
+	robot.SetActiveManipulator(parent.manipulator)
+	env.AddRobot(robot)
+
+	(fd, mesh_file) = tempfile.mkstemp(suffix=".iv")
+	os.write(fd, parent.mesh_data)
+	os.close(fd)
+	try:
+		target = env.ReadKinBodyXMLFile(mesh_file)
+		env.AddKinBody(target)
+	finally:
+		os.remove(mesh_file)
+
+	worker = copy.copy(parent)
+	worker.env = env
+	worker.robot = robot
+	gmodel = openravepy.databases.grasping.GraspingModel(robot=robot,target=target)
+	with gmodel.GripperVisibility(gmodel.manip):
+		gmodel.generatepcg(*args,**kwargs)		#initializes the grasping model of the worker
+	generation_worker = (worker, gmodel, args)
+
+
+def generate_chunk(chunk):
+	(chunk_id, first, works) = chunk
+	(worker, gmodel, args) = generation_worker
+	with gmodel.GripperVisibility(gmodel.manip):
+		return (chunk_id, worker.generate_works(gmodel, first, works, args))
@@ -22,7 +22,7 @@ def likelihood_client(x, y):
     rospy.wait_for_service('likelihood')
     try:
         likelihood = rospy.ServiceProxy('likelihood', Likelihood)
-        resp1 = likelihood(x, y)
+        resp1 = likelihood(command=x, candidate=y)
         print "DEM wants to know likelihood for %s  from %s"%(x,y)
 	return resp1
     except rospy.ServiceException, e:
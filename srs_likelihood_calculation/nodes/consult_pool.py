@@ -0,0 +1,26 @@
+#################################################################
+# \note worker pool of the consult services
+# \input the service handlers of the learning server
+# \output the handlers limited to max_workers at the same time
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import threading
+
+#rospy serves every service connection in its own thread, so the consults of several DEMs run at the same time.
+#the pool lets at most max_workers of them run a handler, the others wait for a free worker.
+
+class ConsultPool(object):
+
+    def __init__(self,max_workers=4):
+        self.max_workers=max_workers
+        self.workers=threading.BoundedSemaphore(max_workers)
+
+    def wrap(self,handler):
+        def consult_handler(req):
+            self.workers.acquire()
+            try:
+                return handler(req)
+            finally:
+                self.workers.release()
+        return consult_handler
@@ -0,0 +1,46 @@
+#################################################################
+# \note parser of the execution feedback of the decision making
+# \input(from DEM to learning) ExecutionFeedback messages
+# \output the succeeded actions as ActionFeedback records
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import json # or `import simplejson as json` if on Python < 2.6
+from collections import namedtuple
+
+#the fields of a succeeded action which are used by the learning server
+ActionFeedback=namedtuple('ActionFeedback',['name','target_object','parent_object','step_id','task_id','task_name','task_parameter'])
+
+#read the json_feedback field of an ExecutionFeedback message into an ActionFeedback record.
+#returns None for the feedback of the init state, of a started action and of an action which did not succeed.
+#the decision making sets current_state to "action:outcome" when an action terminates and to "action: started" when it starts,
+#so the feedback of the actions which did not succeed is skipped before the json is decoded.
+def parse_feedback(feedback):
+    if feedback.current_state!='' and not feedback.current_state.endswith(':succeeded'):
+        return None
+    if feedback.json_feedback=='':
+        return None
+    try:
+        feedback_dict=json.loads(feedback.json_feedback)
+        if isinstance(feedback_dict,basestring):
+            #the decision making json.dumps the json object once more, so the first loads returns a string
+            feedback_dict=json.loads(feedback_dict)
+        current_action=feedback_dict["current_action"]
+        if current_action["state"]!='succeeded': # only record the successful actions
+            return None
+        task_info=feedback_dict.get("task",{})
+        return ActionFeedback(current_action["name"],current_action.get("target_object",''),current_action.get("parent_object",''),current_action.get("step_id",''),
+                              task_info.get("task_id",''),task_info.get("task_name",''),task_info.get("task_parameter",''))
+    except (ValueError,KeyError,TypeError,AttributeError), e:
+        print "can not read the json_feedback: %s"%e
+        return None
+
+
+#the succeeded actions of a task as a line of the historical_data, the location of the task is the parent_object of its last action.
+#the feedback does not name the location of a move, it is written as move(base,location) in front of the actions.
+#returns None when the last action has no parent_object, a task without a location would take a place in the learning windows.
+def history_line(action_feedbacks):
+    if not action_feedbacks or action_feedbacks[-1].parent_object=='':
+        return None
+    actions=['%s(%s)'%(action_feedback.name,action_feedback.target_object) for action_feedback in action_feedbacks]
+    return ', '.join(['move(base,%s)'%action_feedbacks[-1].parent_object]+actions)
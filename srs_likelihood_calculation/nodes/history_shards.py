@@ -0,0 +1,132 @@
+#################################################################
+# \note historical_data sharded by the task type, with one writer and read-only snapshots for the consults
+# \input finished tasks with the command or the task name of the DEM
+# \output snapshots of the likelihood models for the consults
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import os
+import time
+import sqlite3
+import threading
+import Queue
+
+import history_store
+import likelihood_counters
+import likelihood_models
+
+#the tasks are sharded by the task type of their command (get milk -> get). the type is kept as the command of the task in the
+#history store and the likelihood models have a window for every type, a consult only sees the tasks of its type
+#(or all the tasks when there is none of its type yet).
+#
+#one thread writes: it appends the recorded tasks to the store, imports the lines appended to the historical_data txt file,
+#updates the models and publishes a new snapshot of them. the consults only read the last snapshot, they never wait for the
+#store or for each other, so several DEMs can be served at the same time.
+
+TASK_TYPES=['get','fetch','search','deliver']
+
+STOP=None
+
+
+#the task type of a command or task name, '' for the commands which are not of a known type
+def task_type(command):
+    words=command.split()
+    if words and words[0].lower() in TASK_TYPES:
+        return words[0].lower()
+    return ''
+
+
+#the file of a task type next to historical_full_path, historical_data.txt -> historical_data_get.txt
+def shard_path(historical_full_path,task_type):
+    if task_type=='':
+        return historical_full_path
+    (root,extension)=os.path.splitext(historical_full_path)
+    return '%s_%s%s'%(root,task_type,extension)
+
+
+#the models of the consults at one point of the history. they are not updated any more, so they can be read by any thread.
+class HistorySnapshot(object):
+
+    def __init__(self,counters,encoded_history):
+        self.counters=counters
+        self.encoded_history=encoded_history
+
+    #the likelihood of the candidates for the task type of the command, in the format of calculate_likelihood.
+    #model '' is the learning window of calculate_likelihood, the others are the likelihood_models. raises ValueError for an unknown model.
+    def likelihood(self,candidate_list,command='',model='',window=0):
+        if model=='':
+            return self.counters.likelihood(candidate_list,task_type(command))
+        return self.encoded_history.likelihood(candidate_list,task_type(command),model,window)
+
+
+class ShardedHistory(object):
+
+    def __init__(self,historical_full_path,learning_window_width=10,import_interval=1.0,queue_size=1000):
+        self.store=history_store.history_store(historical_full_path)
+        self.import_interval=import_interval
+        self.queue=Queue.Queue(queue_size)
+        self.counters=likelihood_counters.LikelihoodCounters(learning_window_width)
+        self.encoded_history=likelihood_models.EncodedHistory()
+        self.recorded=0
+        self.dropped=0
+        self.current=None
+        #the history which is already in the store is loaded before the first consult
+        self.refresh()
+        self.thread=threading.Thread(target=self.run)
+        self.thread.daemon=True
+        self.thread.start()
+
+    #queue a finished task for the writer. returns False when the queue is full and the task is dropped.
+    def record(self,actions,command=''):
+        try:
+            self.queue.put_nowait((actions,task_type(command)))
+            return True
+        except Queue.Full:
+            self.dropped+=1
+            return False
+
+    #the last published snapshot
+    def snapshot(self):
+        return self.current
+
+    #write the queued tasks and stop the writer
+    def close(self,timeout=5.0):
+        self.queue.put(STOP)
+        self.thread.join(timeout)
+        print "historical data shards: %d tasks recorded, %d tasks dropped"%(self.recorded,self.dropped)
+
+    #import the txt file, update the models with the new tasks of the store and publish them when there are new tasks
+    def refresh(self):
+        last_id=self.counters.last_id
+        self.store.import_text()
+        self.counters.update(self.store)
+        self.encoded_history.update(self.store)
+        if self.current is None or self.counters.last_id!=last_id:
+            self.current=HistorySnapshot(self.counters.snapshot(),self.encoded_history.snapshot())
+
+    def run(self):
+        stop=False
+        while not stop:
+            batch=[]
+            try:
+                batch.append(self.queue.get(timeout=self.import_interval))
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except Queue.Empty:
+                pass
+            if STOP in batch:
+                stop=True
+            tasks=[task for task in batch if task is not STOP]
+            try:
+                if tasks:
+                    self.store.append_tasks(tasks)
+                    self.recorded+=len(tasks)
+            except sqlite3.Error, e:
+                print "recording %d tasks failed: %s"%(len(tasks),e)
+                self.dropped+=len(tasks)
+            try:
+                self.refresh()
+            except (sqlite3.Error,IOError,OSError), e:
+                #the consults keep the last snapshot
+                print "updating the historical data failed: %s"%e
+                time.sleep(self.import_interval)
@@ -0,0 +1,178 @@
+#################################################################
+# \note historical_data store of the learning services
+# \input action sequences of finished tasks
+# \output the last tasks of the learning window, or the tasks of a command and location
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import os
+import sqlite3
+import threading
+
+#the tasks are kept in an sqlite database next to the old historical_data txt file.
+#the rows are only appended, the row id is the position of the task in the history,
+#so the last n tasks are read from the end of the row id index without touching the older ones.
+#lines which are appended to the txt file by other writers are imported when the store is read.
+
+stores={}
+stores_lock=threading.Lock()
+
+#the location of a task is the target of its last move(base,location) action, as used by calculate_likelihood
+def task_location(actions):
+    location_flag=actions.rfind('move(base,')
+    if location_flag<0:
+        return ''
+    location_end=actions.find(')',location_flag)
+    if location_end<0:
+        return ''
+    return actions[location_flag+len('move(base,'):location_end]
+
+
+class HistoryStore(object):
+
+    def __init__(self,db_path,text_path=None):
+        self.db_path=db_path
+        self.text_path=text_path
+        self.lock=threading.Lock()
+        #rospy calls the services and the subscribers from different threads, the lock serialises them on one connection
+        self.db=sqlite3.connect(db_path,check_same_thread=False)
+        self.db.text_factory=str
+        self.db.execute('CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, command TEXT, location TEXT, actions TEXT)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS tasks_command_location ON tasks (command, location)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS tasks_location ON tasks (location)')
+        #how much of each txt file is already in the store
+        self.db.execute('CREATE TABLE IF NOT EXISTS imported (path TEXT PRIMARY KEY, offset INTEGER)')
+        self.db.commit()
+
+    #append the action sequence of a finished task
+    def append(self,actions,command=''):
+        self.lock.acquire()
+        try:
+            self.db.execute('INSERT INTO tasks (command, location, actions) VALUES (?, ?, ?)',(command,task_location(actions),actions))
+            self.db.commit()
+        finally:
+            self.lock.release()
+
+    #append the finished tasks as (actions, command) in one transaction
+    def append_tasks(self,tasks):
+        self.lock.acquire()
+        try:
+            self.db.executemany('INSERT INTO tasks (command, location, actions) VALUES (?, ?, ?)',[(command,task_location(actions),actions) for (actions,command) in tasks])
+            self.db.commit()
+        finally:
+            self.lock.release()
+
+    #import the lines which were appended to the txt file since the last import. a file which became shorter is imported again from the start.
+    def import_text(self):
+        if self.text_path is None or not os.path.exists(self.text_path):
+            return 0
+        size=os.path.getsize(self.text_path)
+        self.lock.acquire()
+        try:
+            #the learning servers of other processes may import the same file, the write lock of the database is taken before the offset is read
+            self.db.execute('BEGIN IMMEDIATE')
+            row=self.db.execute('SELECT offset FROM imported WHERE path = ?',(self.text_path,)).fetchone()
+            offset=0
+            if row is not None and row[0]<=size:
+                offset=row[0]
+            if offset==size:
+                self.db.commit()
+                return 0
+            fo=open(self.text_path,'r')
+            fo.seek(offset)
+            tasks=[]
+            for line in fo:
+                if line[-1]!='\n':
+                    #the last line is still being written, it is imported next time
+                    break
+                offset+=len(line)
+                line=line[:-1]
+                tasks.append(('',task_location(line),line))
+            fo.close()
+            self.db.executemany('INSERT INTO tasks (command, location, actions) VALUES (?, ?, ?)',tasks)
+            self.db.execute('INSERT OR REPLACE INTO imported (path, offset) VALUES (?, ?)',(self.text_path,offset))
+            self.db.commit()
+            return len(tasks)
+        finally:
+            self.lock.release()
+
+    #the action sequences of the last n tasks, the oldest first
+    def last_tasks(self,n):
+        self.lock.acquire()
+        try:
+            rows=self.db.execute('SELECT actions FROM tasks ORDER BY id DESC LIMIT ?',(n,)).fetchall()
+        finally:
+            self.lock.release()
+        rows.reverse()
+        return [row[0] for row in rows]
+
+    #the action sequences of the tasks of a command and / or location, the oldest first. n limits them to the last n tasks.
+    def find_tasks(self,command=None,location=None,n=-1):
+        query='SELECT actions FROM tasks'
+        conditions=[]
+        parameters=[]
+        if command is not None:
+            conditions.append('command = ?')
+            parameters.append(command)
+        if location is not None:
+            conditions.append('location = ?')
+            parameters.append(location)
+        if conditions:
+            query+=' WHERE '+' AND '.join(conditions)
+        query+=' ORDER BY id DESC LIMIT ?'
+        parameters.append(n)
+        self.lock.acquire()
+        try:
+            rows=self.db.execute(query,parameters).fetchall()
+        finally:
+            self.lock.release()
+        rows.reverse()
+        return [row[0] for row in rows]
+
+    #the tasks after the row id last_id as (id, command, actions), the oldest first. n limits them to the first n of those tasks.
+    def tasks_after(self,last_id,n=-1):
+        self.lock.acquire()
+        try:
+            return self.db.execute('SELECT id, command, actions FROM tasks WHERE id > ? ORDER BY id LIMIT ?',(last_id,n)).fetchall()
+        finally:
+            self.lock.release()
+
+    #the row id of the last task, 0 for an empty store
+    def last_id(self):
+        self.lock.acquire()
+        try:
+            row=self.db.execute('SELECT MAX(id) FROM tasks').fetchone()
+        finally:
+            self.lock.release()
+        if row[0] is None:
+            return 0
+        return row[0]
+
+    #the commands which have tasks in the store
+    def commands(self):
+        self.lock.acquire()
+        try:
+            rows=self.db.execute('SELECT DISTINCT command FROM tasks').fetchall()
+        finally:
+            self.lock.release()
+        return [row[0] for row in rows]
+
+    #number of tasks in the store
+    def count(self):
+        self.lock.acquire()
+        try:
+            return self.db.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+        finally:
+            self.lock.release()
+
+
+#the store which replaces the historical_data txt file historical_full_path. there is one store per file in a process.
+def history_store(historical_full_path):
+    stores_lock.acquire()
+    try:
+        if historical_full_path not in stores:
+            db_path=os.path.splitext(historical_full_path)[0]+'.db'
+            stores[historical_full_path]=HistoryStore(db_path,historical_full_path)
+        return stores[historical_full_path]
+    finally:
+        stores_lock.release()
@@ -0,0 +1,128 @@
+#################################################################
+# \note background writer of the historical_data txt files
+# \input lines from the subscriber callbacks of the learning server
+# \output the historical_data txt files, rotated by size
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import os
+import time
+import threading
+import Queue
+
+#the callbacks only put their lines into a bounded queue, one thread writes them to the files.
+#the thread writes all the lines which are waiting at once, fsyncs the files every fsync_interval seconds
+#and renames a file to file.1 (file.1 to file.2, ...) when it grows beyond max_bytes.
+#when the queue is full the line is dropped, the callbacks never wait for the disk.
+
+STOP=None
+
+class HistoryWriter(object):
+
+    def __init__(self,queue_size=1000,fsync_interval=1.0,max_bytes=10*1024*1024,backup_count=5,max_batch=500):
+        self.queue=Queue.Queue(queue_size)
+        self.fsync_interval=fsync_interval
+        self.max_bytes=max_bytes #0 never rotates
+        self.backup_count=backup_count
+        self.max_batch=max_batch
+        self.files={}
+        self.unsynced=set()
+        self.written=0
+        self.dropped=0
+        self.thread=threading.Thread(target=self.run)
+        self.thread.daemon=True
+        self.thread.start()
+
+    #queue a line for the file path. returns False when the queue is full and the line is dropped.
+    def write(self,path,line):
+        try:
+            self.queue.put_nowait((path,line))
+            return True
+        except Queue.Full:
+            self.dropped+=1
+            return False
+
+    #write the queued lines and stop the thread
+    def close(self,timeout=5.0):
+        self.queue.put(STOP)
+        self.thread.join(timeout)
+        print "historical data writer: %d lines written, %d lines dropped"%(self.written,self.dropped)
+
+    def open_file(self,path):
+        if path not in self.files:
+            self.files[path]=open(path,'ab')
+        return self.files[path]
+
+    def sync(self):
+        for path in self.unsynced:
+            fo=self.files[path]
+            fo.flush()
+            os.fsync(fo.fileno())
+        self.unsynced.clear()
+
+    #file -> file.1 -> file.2 ... -> file.backup_count, the oldest one is removed
+    def rotate(self,path):
+        fo=self.files.pop(path)
+        fo.flush()
+        os.fsync(fo.fileno())
+        fo.close()
+        self.unsynced.discard(path)
+        if self.backup_count>0:
+            for n in range(self.backup_count-1,0,-1):
+                if os.path.exists('%s.%d'%(path,n)):
+                    os.rename('%s.%d'%(path,n),'%s.%d'%(path,n+1))
+            os.rename(path,path+'.1')
+        else:
+            os.remove(path)
+
+    def run(self):
+        last_sync=time.time()
+        stop=False
+        while not stop:
+            batch=[]
+            try:
+                batch.append(self.queue.get(timeout=self.fsync_interval))
+                while len(batch)<self.max_batch:
+                    batch.append(self.queue.get_nowait())
+            except Queue.Empty:
+                pass
+            if STOP in batch:
+                stop=True
+                #the lines queued after STOP are written as well
+                while True:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except Queue.Empty:
+                        break
+
+            lines={}
+            for record in batch:
+                if record is not STOP:
+                    lines.setdefault(record[0],[]).append(record[1])
+            for path in lines:
+                try:
+                    fo=self.open_file(path)
+                    fo.write(''.join(lines[path]))
+                    fo.flush()
+                    self.unsynced.add(path)
+                    self.written+=len(lines[path])
+                    if self.max_bytes>0 and fo.tell()>=self.max_bytes:
+                        self.rotate(path)
+                except (IOError,OSError), e:
+                    print "writing historical data to %s failed: %s"%(path,e)
+                    self.dropped+=len(lines[path])
+                    if path in self.files:
+                        self.files.pop(path).close()
+                        self.unsynced.discard(path)
+
+            if stop or time.time()-last_sync>=self.fsync_interval:
+                try:
+                    self.sync()
+                except (IOError,OSError), e:
+                    print "syncing historical data failed: %s"%e
+                    self.unsynced.clear()
+                last_sync=time.time()
+
+        for fo in self.files.values():
+            fo.close()
+        self.files={}
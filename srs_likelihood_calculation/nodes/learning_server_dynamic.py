@@ -21,9 +21,12 @@ import actionlib
 
 from srs_decision_making.msg import *
 
-import fileinput
-
-import json # or `import simplejson as json` if on Python < 2.6
+import history_store
+import history_shards
+import history_writer
+import consult_pool
+import feedback_parser
+import ontology_relation
 
 #randomly generate the location
 
@@ -33,56 +36,32 @@ foo = ['table2', 'table1','fridge']
 
 historical_data_LW=[]
 
+#the historical_data sharded by task type, with the likelihood counters (learning_window_width=10) and the encoded history
+#for the other likelihood models. started by consulting_server
+learning_history=None
+#the compiled relationship rules and the cache of the ontology consults
+relation_rules=ontology_relation.RelationRules()
+
 #global action_sequences_global
 
 action_sequences_global=[]# action sequence for taks instance
+action_feedbacks_global=[]# the succeeded actions of the task instance, for the task name and the history of the likelihood
 
 task_flag=""
+
+#background writer of the historical_data txt files, started by consulting_server
+historical_data_writer=None
         
 #using learning window to read historical data 
-#this function will be updated 
 #the learning_window_width will be decided based on the learning experience
-#this function should only need the historical_data file name, and will search this file itself
+#the historical_data is kept in a history store next to the historical_data file, the last learning_window_width tasks
+#are read from the end of its index, so the time does not grow with the size of the history.
+#lines appended to the historical_data file by other writers are imported first.
 
 def data_from_learning_window(learning_window_width,historical_full_path):
-    #learning_window_width=learning_window_width
-    line_offset = []
-    historical_data_LW=[]
-    
-    num_lines=0 #the number of lines of the historical_data(how big the experience is)
-    offset = 0 #the offset for a line
-
-    fo=open(historical_full_path,'r')#open the historical_data
-    
-    #calculate the num_lines and the offset for every line
-    for line in fo:
-	line_offset.append(offset)
-	offset += len(line)
-        num_lines+=1
-    #file.seek(0) # reset offset to the begining of the file
-    #n+learning_window_width=num_lines 
-    #the n is the line number, so n >=0, this means, num_lines>=learning_window_width, the program should make sure this is true
-    if num_lines>=learning_window_width:
-      #learning according the learning_window_width
-      n=num_lines-learning_window_width
-    else:
-      n=0 #using the whole historical_data
-    
-    # Now, to skip to line n (with the first line being line 0), just do
-    fo.seek(line_offset[n])   
-    
-
-    for line in fo:
-        
-	#remove the end-line character from the action sequence
-	if line[-1] == '\n':
-           line1=line[:-1]
-        else:
-           line1=line        
-	historical_data_LW.append(line1)
-	
-    # Close opend file
-    fo.close()
+    store=history_store.history_store(historical_full_path)
+    store.import_text()
+    historical_data_LW=store.last_tasks(learning_window_width)
     return historical_data_LW #return the historical_data list based on the learning_window_width
 
 def calculate_likelihood(data_for_likelihood,candidate_list):
@@ -153,92 +132,26 @@ def handle_consulting(req):
     #cadidates used for activity cluster
     print "consulting command is: %s "%req.command
     print "consulting candidates are: %s" %req.candidate
-    #here we just read the historical_data from the txt file
-    #the final data should come from a search based on the command (task classification) and candidates(for activity cluster)
-    #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-    data_for_likelihood=data_from_learning_window(10,'historical_data.txt')
-    print"the historical_data based on learning_window_width=10 is: "
-    print data_for_likelihood
-    print "the number of historical_data is %d"%len(data_for_likelihood)
-    #calculating the likelihood
-    #likelihoodresponse="likelihood for %s from %s is ??? "%(req.command,req.candidate)
-    likelihoodresponse=calculate_likelihood(data_for_likelihood,req.candidate)
+    #the likelihood is calculated from the last snapshot of the history of the task type of the command (task classification),
+    #the tasks recorded since then (by this node or by other writers of the historical_data) are added by the writer of the history
+    snapshot=learning_history.snapshot()
+    #calculating the likelihood, the model and the window are chosen by the DEM ('' is the learning window of calculate_likelihood)
+    try:
+      likelihoodresponse=snapshot.likelihood(req.candidate,req.command,req.model,req.window)
+    except ValueError, e:
+      raise rospy.ServiceException(str(e))
+    print "candidate_likelihood is %s" %likelihoodresponse
     return LikelihoodResponse(likelihoodresponse)
 
 
 #definition of the find_ralation function
+#the relationship rules are compiled once into a table, the actions are checked in one pass and the relationship is cached per actions and results
 
 def find_ralation(actions,results,objects):
-    
-    #define the on relationship
-    on_something={}
-    on_something['move']='3'
-    on_something['detect']='3'
-    on_something['grasp']='3'
-    on_something['place_on_tray']='3'
-    
-    #define the in relationship
-    in_something={}
-    in_something['move']='3'
-    in_something['open']='3'
-    in_something['detect']='3'
-    in_something['grasp']='3'    
-    in_something['place_on_tray']='3'
-    in_something['close']='3'
-    
-    action_list=actions.split()
-    print action_list
-    result_list=results.split()
-    print result_list
-    # build up the action_result dictionary to use the results of actions
-    actions_result={}
-    for action in action_list:
-      actions_result[action]=result_list[int(action_list.index(action))]
-    #print 'actions_result is: ',actions_result.items()
-    #return str(actions_result)
-    #print 'actions_result.keys()',actions_result.keys()
-    
-    for action in action_list:
-      #for relationship detect action is the marker of the relationship
-      print action
-      
-      if action.find('detect')>=0:
-	  
-	 print 'detect action is found!'
-	  #find the action mark
-	  #then check the detect action successful or not
-	 if actions_result[action]=='3':
-	    #detect action is successful
-	    #then find the open action
-	    print 'detect action is successful!'
-	    if actions.rfind('open')>=0:
-	      for action1 in action_list:
-	       if action1.find('open')>=0:
-		print 'is open'
-		#find the open action
-		#then check the open is successful
-		if actions_result[action1]=='3':
-		  return 'in_something'
-		else:
-		  print 'unknown relationship'
-		  return 'unknow relationship'
-		  
-	    elif actions.rfind('move')>=0:
-	       for action1 in action_list:
-		 if action1.find('move')>=0:
-		  print 'is move'
-		  if actions_result[action1]=='3':
-		      return 'on_something'
-		  else:
-		      print 'unknown relationship'
-		      return 'unknow relationship'
-	    else:
-	      print 'unknown relationship'
-	      return 'unknow relationship'
-	 else:
-	   print 'detect action is failed, can not detect object!'
-	   return 'can not detect object!'	
-   
+    relation=relation_rules.relation(actions,results)
+    print 'relationship of %s is: %s'%(objects,relation)
+    return relation
+
 
 # callback function for receive consulting for ontology expanding
 def handle_consulting2(req):
@@ -266,89 +179,42 @@ def callback_record_data(data):
     #print rospy.get_name()+" Action sequence is: ",data.data
     print "task instance result is:",data.result
     global action_sequences_global
+    global action_feedbacks_global
     # Open a file
     #action_sequences=action_sequences_global
-    if data.result==' return_value: 3':#task successfully executed return_value: 3
+    if data.result.return_value==3 and action_feedbacks_global:#task successfully executed return_value: 3
       print "Task successfully finished\n"
       task_action_sequence=','.join(action_sequences_global)
-      fo = open("dynamic_historical_data.txt", "ab")
-      fo.write( task_action_sequence +"\n");
-      action_sequences_global=[]
-
-      # Close opend file
-      fo.close()
+      task_name=action_feedbacks_global[-1].task_name
+      # queue the task for the writer thread, the callback does not wait for the file. every task type has its own file
+      historical_data_writer.write(history_shards.shard_path("dynamic_historical_data.txt",history_shards.task_type(task_name)), task_action_sequence +"\n")
+      # and for the writer of the history of the likelihood, in the shard of its task type. a task without a location is not recorded
+      history_line=feedback_parser.history_line(action_feedbacks_global)
+      if history_line is not None:
+        learning_history.record(history_line,task_name)
+    # the actions of a failed task are not kept for the next one
+    action_sequences_global=[]
+    action_feedbacks_global=[]
     
 
 def historical_data_recorder(data): #publish the data
     #print "Json feedback is: ",data
     global action_sequences_global
     
-    print "action_sequences_global is %s" %action_sequences_global
+    #the json_feedback field is read directly, only the succeeded actions are returned
+    action_feedback=feedback_parser.parse_feedback(data)
+    if action_feedback is None:
+      return
     
-    feedback_temp=str(data)
+    action_with_para_str=action_feedback.name+' '+action_feedback.target_object
+    print "curret action is: %s" %action_with_para_str
     
-    location_flag_jsonfeedback=feedback_temp.find('json_feedback:')# mark where is the location for grasp
-    sub_feedback_temp=feedback_temp[location_flag_jsonfeedback+len('json_feedback:'):]#sub action sequence begining with move action
-    if sub_feedback_temp.find('name')>0:
-      print "sub_feedback_temp is: %s" %sub_feedback_temp      
-      
-      feedback_dict=json.loads(sub_feedback_temp) #type of feedback_dict: <type 'unicode'>
-      
-      
-      
-      #print "feedback_dict is: %s" %feedback_dict
-      
-      #print "type of feedback_dict: %s" %type(feedback_dict)
-      
-      feedback_dict1=json.loads(feedback_dict)#type of feedback_dict1: <type 'dict'>
-      
-      #print "type of feedback_dict1: %s" %type(feedback_dict1)
-      
-      actions_doing=feedback_dict1["current_action"]
-      
-      task_info=feedback_dict1["task"]
-      
-      task_flag_temp=task_info["task_id"]
-            
-	
-      if actions_doing["state"]=='succeeded': # only record the successful actions
-      
-	  actionis=actions_doing["name"]#get the action
-	  action_with_para_li=[actionis]
-	  ## get the action target
-	  
-	  #action_with_para_li.append(actions_doing["target"])
-	  action_target=actions_doing["target_object"]
-	  
-	  action_with_para_li.append(action_target)
-	  
-	  action_with_para_str=' '.join(action_with_para_li)
-	
-	  print "curret action is: %s" %action_with_para_str
-	  
-	  ### this action_sequences is used as a stack for storing action sequence of a task instance
-	  ## the following two lines update action_sequences
-	  
-	  if  action_sequences_global==[]:#this action_sequences is null
-	    action_sequences_global=[action_with_para_str]
-	    print "action %s is recorded into historical data\n" %action_with_para_str
-	    print "the first action_sequences_global is %s" %action_sequences_global
-	    #action_sequences_global = action_sequences
-	  
-	  else:
-	    print "the non_null action_sequences_global list is %s" %action_sequences_global
-	    #####action_sequences_global=action_sequences_global.append(action_with_para_str)#update action sequence
-	    action_sequences_global.append(action_with_para_str)#update action sequence
-	    print "action %s is recorded into historical data\n" %action_with_para_str
-	    #action_sequences_global = action_sequences
-	  
-	 # Open a file
-	  fo = open("dict_dynamic_feedback_DM_historical_data.txt", "ab")	
-	  fo.write(action_with_para_str+"\n")
-     	  fo.close()
-	  
-    else:
-	print 'This is init state'
+    ### this action_sequences is used as a stack for storing action sequence of a task instance
+    action_sequences_global.append(action_with_para_str)#update action sequence
+    action_feedbacks_global.append(action_feedback)
+    
+    # queue the action for the writer thread
+    historical_data_writer.write("dict_dynamic_feedback_DM_historical_data.txt", action_with_para_str+"\n")
   
     
     
@@ -364,13 +230,24 @@ def callback_record_data2(data):
 
 def consulting_server():
     
+    global historical_data_writer
+    global learning_history
     rospy.init_node('likelyhood_server', anonymous=True)    
     
+    #the historical_data files are written by one thread. fsync_interval in seconds, the files are rotated at max_bytes (0 never rotates)
+    historical_data_writer=history_writer.HistoryWriter(queue_size=rospy.get_param('~history_queue_size', 1000), fsync_interval=rospy.get_param('~history_fsync_interval', 1.0), max_bytes=rospy.get_param('~history_max_bytes', 10*1024*1024), backup_count=rospy.get_param('~history_backup_count', 5))
+    rospy.on_shutdown(historical_data_writer.close)
+    #the history of the likelihood is written by its own thread, the consults read its snapshots
+    learning_history=history_shards.ShardedHistory('historical_data.txt',10,import_interval=rospy.get_param('~history_import_interval', 1.0))
+    rospy.on_shutdown(learning_history.close)
+    #at most max_workers likelihood and ontology consults are calculated at the same time
+    pool=consult_pool.ConsultPool(rospy.get_param('~max_workers', 4))
+    
     rospy.Subscriber("srs_decision_making_actions/feedback", ExecutionActionFeedback, callback_record_data2) #record the historical data
     rospy.Subscriber("srs_decision_making_actions/result", ExecutionActionResult, callback_record_data) #record the historical data 
     
-    rospy.Service('likelihood', Likelihood, handle_consulting) #provide service
-    rospy.Service('ontology', Ontology, handle_consulting2) #provide service
+    rospy.Service('likelihood', Likelihood, pool.wrap(handle_consulting)) #provide service
+    rospy.Service('ontology', Ontology, pool.wrap(handle_consulting2)) #provide service
     print "Ready to receive consulting."
     rospy.spin()
 
@@ -0,0 +1,117 @@
+#################################################################
+# \note incremental likelihood of the candidate locations
+# \input the tasks of the history store
+# \output candidate and correspomding likelihood
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import threading
+from collections import deque
+
+import history_store
+
+#the counters of calculate_likelihood, kept up to date task by task instead of recounted for every consult.
+#for every command (and '' for all the tasks) there is a learning window with the locations of the last tasks and, for every location,
+#the number of its tasks in the window (frequency) and the sum of the positions of its tasks in the window (weight).
+#the oldest task of a full window has position 1 and weight 0.1, the newest one position 10 and weight 1.0.
+#when a task is added to a full window the oldest one leaves it and all the others move down one position.
+
+class LikelihoodCounters(object):
+
+    def __init__(self,learning_window_width=10):
+        self.learning_window_width=learning_window_width
+        self.weight_step=1.0/learning_window_width #0.1 for 10 tasks
+        self.weight_sum=(learning_window_width+1)/2.0 #5.5=(0.1+0.2+...+1)
+        self.lock=threading.Lock()
+        self.windows={}
+        self.frequency={}
+        self.weight={}
+        self.last_id=None
+
+    #add the location of a task to the window of a command
+    def add_location(self,command,location):
+        if command not in self.windows:
+            self.windows[command]=deque()
+            self.frequency[command]={}
+            self.weight[command]={}
+        window=self.windows[command]
+        frequency=self.frequency[command]
+        weight=self.weight[command]
+        if len(window)==self.learning_window_width:
+            oldest=window.popleft()
+            frequency[oldest]-=1
+            weight[oldest]-=1
+            if frequency[oldest]==0:
+                del frequency[oldest]
+                del weight[oldest]
+            for location_in_window in frequency:
+                weight[location_in_window]-=frequency[location_in_window]
+        window.append(location)
+        frequency[location]=frequency.get(location,0)+1
+        weight[location]=weight.get(location,0)+len(window)
+
+    #add a finished task to the window of all the tasks and to the window of its command
+    def add_task(self,actions,command=''):
+        location=history_store.task_location(actions)
+        self.add_location('',location)
+        if command!='':
+            self.add_location(command,location)
+
+    #add the tasks which were appended to the store since the last update. the first update only reads the last learning windows.
+    def update(self,store):
+        self.lock.acquire()
+        try:
+            if self.last_id is None:
+                self.last_id=store.last_id()
+                for actions in store.last_tasks(self.learning_window_width):
+                    self.add_location('',history_store.task_location(actions))
+                for command in store.commands():
+                    if command!='':
+                        for actions in store.find_tasks(command=command,n=self.learning_window_width):
+                            self.add_location(command,history_store.task_location(actions))
+            for (task_id,command,actions) in store.tasks_after(self.last_id):
+                self.add_task(actions,command)
+                self.last_id=task_id
+        finally:
+            self.lock.release()
+
+    #a copy of the counters which is not changed by later updates
+    def snapshot(self):
+        self.lock.acquire()
+        try:
+            snapshot=LikelihoodCounters(self.learning_window_width)
+            for command in self.windows:
+                snapshot.windows[command]=deque(self.windows[command])
+                snapshot.frequency[command]=dict(self.frequency[command])
+                snapshot.weight[command]=dict(self.weight[command])
+            snapshot.last_id=self.last_id
+        finally:
+            self.lock.release()
+        return snapshot
+
+    #likelihood=(frequency+weight)/2 of the candidates as a list, 0 for the candidates without a task in the window.
+    #the window of the command is used when tasks of the command have been recorded, otherwise the window of all the tasks.
+    def likelihoods(self,candidates,command=''):
+        self.lock.acquire()
+        try:
+            if command not in self.windows:
+                command=''
+            frequency=self.frequency.get(command,{})
+            weight=self.weight.get(command,{})
+            candidate_likelihoods=[]
+            for candi in candidates:
+                if candi in frequency:
+                    candidate_frenquence=frequency[candi]/float(self.learning_window_width)
+                    candidate_weight=weight[candi]*self.weight_step/self.weight_sum
+                    candidate_likelihoods.append((candidate_frenquence+candidate_weight)/2.0)
+                else:
+                    candidate_likelihoods.append(0)
+        finally:
+            self.lock.release()
+        return candidate_likelihoods
+
+    #likelihood of the candidates in the format of calculate_likelihood
+    def likelihood(self,candidate_list,command=''):
+        candidates=candidate_list.split()
+        candidate_likelihood=dict(zip(candidates,self.likelihoods(candidates,command)))
+        return str(candidate_likelihood.items())
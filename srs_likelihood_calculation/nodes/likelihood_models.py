@@ -0,0 +1,153 @@
+#################################################################
+# \note likelihood models over the encoded historical_data
+# \input the tasks of the history store
+# \output candidate and correspomding likelihood for the chosen model and window
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import threading
+from array import array
+
+import numpy
+
+import history_store
+
+#the location of every task is encoded as an integer, the history of a command (and '' for all the tasks) is an int32 array of codes.
+#a model is evaluated with numpy over the end of that array, for all the candidates (and windows) at once.
+#
+#window: likelihood=(frequency+weight)/2 over the last window tasks, as calculate_likelihood does for window=10.
+#        frequency=count/window, the weight of a task is its position in the window (1 for the oldest) / window,
+#        normalised by (window+1)/2 (5.5 for 10 tasks).
+#decay:  exponentially decayed share of the tasks over the whole history. window is the half life in tasks,
+#        a task of age window counts half as much as the newest one. tasks older than 20 half lives (weight < 1e-6) are left out.
+
+MODELS=['window','decay']
+DEFAULT_WINDOW=10
+DECAY_HORIZON=20
+
+
+#likelihood of the candidates (codes) for several learning windows. returns a (windows x candidates) array.
+def window_likelihoods(codes,candidate_codes,windows):
+    max_window=max(windows)
+    recent=codes[-max_window:]
+    match=(recent[:,numpy.newaxis]==candidate_codes[numpy.newaxis,:])
+    likelihoods=numpy.zeros((len(windows),len(candidate_codes)))
+    for n,window in enumerate(windows):
+        window_match=match[-window:]
+        #position 1 for the oldest task in the window
+        positions=numpy.arange(1,len(window_match)+1,dtype=float)
+        frequency=window_match.sum(axis=0)/float(window)
+        weight=numpy.dot(positions,window_match)/float(window)/((window+1)/2.0)
+        likelihoods[n]=(frequency+weight)/2.0
+    return likelihoods
+
+
+#exponentially decayed likelihood of the candidates (codes) for several half lives. returns a (half lives x candidates) array.
+def decay_likelihoods(codes,candidate_codes,half_lives):
+    horizon=int(max(half_lives)*DECAY_HORIZON)
+    recent=codes[-horizon:]
+    match=(recent[:,numpy.newaxis]==candidate_codes[numpy.newaxis,:])
+    ages=numpy.arange(len(recent)-1,-1,-1,dtype=float)
+    likelihoods=numpy.zeros((len(half_lives),len(candidate_codes)))
+    for n,half_life in enumerate(half_lives):
+        weight=0.5**(ages/half_life)
+        weight[ages>=half_life*DECAY_HORIZON]=0.0
+        if len(recent)>0:
+            likelihoods[n]=numpy.dot(weight,match)/weight.sum()
+    return likelihoods
+
+
+class EncodedHistory(object):
+
+    def __init__(self):
+        self.lock=threading.Lock()
+        self.location_codes={}
+        self.codes={'':array('i')}
+        #the length of every history in a snapshot, None when the history is still being added to
+        self.lengths=None
+        self.last_id=0
+
+    def encode(self,location):
+        if location not in self.location_codes:
+            self.location_codes[location]=len(self.location_codes)
+        return self.location_codes[location]
+
+    #add a finished task to the history of all the tasks and to the history of its command
+    def add_task(self,actions,command=''):
+        code=self.encode(history_store.task_location(actions))
+        self.codes[''].append(code)
+        if command!='':
+            if command not in self.codes:
+                self.codes[command]=array('i')
+            self.codes[command].append(code)
+
+    #add the tasks which were appended to the store since the last update
+    def update(self,store):
+        self.lock.acquire()
+        try:
+            for (task_id,command,actions) in store.tasks_after(self.last_id):
+                self.add_task(actions,command)
+                self.last_id=task_id
+        finally:
+            self.lock.release()
+
+    #the codes of the last n tasks of a command, of all the tasks when the command has no tasks of its own
+    def history(self,command='',n=None):
+        if command not in self.codes:
+            command=''
+        codes=self.codes[command]
+        if self.lengths is None:
+            end=len(codes)
+        else:
+            end=self.lengths[command]
+        start=0
+        if n is not None and n<end:
+            start=end-n
+        return numpy.array(codes[start:end],dtype=numpy.int32)
+
+    #a view of the history which is not changed by later tasks. the codes are only appended to, so the snapshot shares them
+    #and keeps the length of every history.
+    def snapshot(self):
+        self.lock.acquire()
+        try:
+            snapshot=EncodedHistory()
+            snapshot.location_codes=dict(self.location_codes)
+            snapshot.codes=dict(self.codes)
+            snapshot.lengths=dict([(command,len(codes)) for (command,codes) in self.codes.items()])
+            snapshot.last_id=self.last_id
+        finally:
+            self.lock.release()
+        return snapshot
+
+    #likelihoods of the candidates as a (windows x candidates) array
+    def likelihoods(self,candidates,command='',model='window',windows=[DEFAULT_WINDOW]):
+        if model not in MODELS:
+            raise ValueError("unknown likelihood model %s, the models are %s"%(model,', '.join(MODELS)))
+        self.lock.acquire()
+        try:
+            #candidates without a task get a code which is not in the history
+            candidate_codes=numpy.array([self.location_codes.get(candi,-1) for candi in candidates],dtype=numpy.int32)
+            #only the end of the history which the model can see is copied
+            if model=='window':
+                codes=self.history(command,max(windows))
+            else:
+                codes=self.history(command,int(max(windows)*DECAY_HORIZON))
+        finally:
+            self.lock.release()
+        if model=='window':
+            return window_likelihoods(codes,candidate_codes,windows)
+        return decay_likelihoods(codes,candidate_codes,windows)
+
+    #likelihood of the candidates in the format of calculate_likelihood. window 0 is the default window of the model.
+    def likelihood(self,candidate_list,command='',model='window',window=0):
+        if window<=0:
+            window=DEFAULT_WINDOW
+        candidates=candidate_list.split()
+        likelihoods=self.likelihoods(candidates,command,model,[window])[0]
+        candidate_likelihood={}
+        for candi,likelihood in zip(candidates,likelihoods):
+            if likelihood>0:
+                candidate_likelihood[candi]=float(likelihood)
+            else:
+                candidate_likelihood[candi]=0
+        return str(candidate_likelihood.items())
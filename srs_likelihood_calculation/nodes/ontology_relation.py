@@ -0,0 +1,96 @@
+#################################################################
+# \note relationship between an object and its parent for ontology expanding
+# \input actions of a task and the results of the actions
+# \output the relationship on_something or in_something
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+import threading
+
+#the detect action is the marker of the relationship. when the first detect action succeeded, the rules are checked in order,
+#the first rule whose action is in the task gives the relationship when the first action of the rule has the required result.
+#the actions are matched by name, as find_ralation did, so move_arm(x) is the move action of a task when it comes first.
+#an action which is repeated with the same parameters (a retried detect(milk)) counts as succeeded when any of its tries succeeded.
+#
+#    actions: move(base,fridge) open(fridge) detect(milk) grasp(milk)
+#    results: 3 3 3 3
+#    relation: in_something
+
+SUCCEEDED='3'
+MARKER=('detect',SUCCEEDED)
+#(relation, action, required result)
+RULES=[('in_something','open',SUCCEEDED),
+       ('on_something','move',SUCCEEDED)]
+
+UNKNOWN='unknow relationship'
+NOT_DETECTED='can not detect object!'
+
+CACHE_SIZE=10000
+
+
+#the rule table as [(action, required result)] with the marker first, then the actions of the rules in order
+def compile_rules(rules,marker=MARKER):
+    return [marker]+[(action,result) for (relation,action,result) in rules]
+
+
+class RelationRules(object):
+
+    def __init__(self,rules=RULES,marker=MARKER,cache_size=CACHE_SIZE):
+        self.rules=rules
+        self.marker=marker
+        self.table=compile_rules(rules,marker)
+        self.cache={}
+        self.cache_size=cache_size
+        self.lock=threading.Lock()
+        self.hits=0
+        self.misses=0
+
+    #one pass over the actions. returns the relationship, None when there is no detect action.
+    def evaluate(self,action_list,result_list):
+        #action name -> the first action of the task with the name
+        first={}
+        #action -> the results of all its tries
+        tries={}
+        for n,action in enumerate(action_list):
+            if n<len(result_list):
+                result=result_list[n]
+            else:
+                result=''
+            tries.setdefault(action,[]).append(result)
+            for (name,required) in self.table:
+                if name not in first and action.find(name)>=0:
+                    first[name]=action
+        (name,required)=self.marker
+        if name not in first:
+            return None
+        if required not in tries[first[name]]:
+            return NOT_DETECTED
+        for (relation,name,required) in self.rules:
+            if name in first:
+                if required in tries[first[name]]:
+                    return relation
+                return UNKNOWN
+        return UNKNOWN
+
+    #the relationship for the actions and results strings of a consult, repeated consults are answered from the cache
+    def relation(self,actions,results):
+        action_list=actions.split()
+        result_list=results.split()
+        key=(tuple(action_list),tuple(result_list))
+        self.lock.acquire()
+        try:
+            if key in self.cache:
+                self.hits+=1
+                return self.cache[key]
+            self.misses+=1
+        finally:
+            self.lock.release()
+        relation=self.evaluate(action_list,result_list)
+        self.lock.acquire()
+        try:
+            if len(self.cache)>=self.cache_size:
+                self.cache.clear()
+            self.cache[key]=relation
+        finally:
+            self.lock.release()
+        return relation
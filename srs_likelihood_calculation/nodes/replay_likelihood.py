@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+#################################################################
+# \note offline replay of recorded historical_data through the likelihood models
+# \input a historical_data txt file, or a rosbag of srs_decision_making_actions/feedback and /result
+# \output prediction accuracy of every model for every candidate location, and the replay throughput
+#   Project name: srs learning service for choosing priority
+#################################################################
+
+#every task is replayed in the order it was recorded. before a task is added to a model, the model is consulted with the
+#candidates and the candidate with the highest likelihood is its prediction of the location of the task.
+#no ros node is started, a rosbag can only be read when the rosbag python module is installed.
+#
+#example:
+#    ./replay_likelihood.py historical_data.txt -c "table1 table2 fridge" -m counters,window:5,window:20,decay:10
+
+import sys
+import time
+from optparse import OptionParser
+
+import history_store
+import history_shards
+import likelihood_counters
+import likelihood_models
+import feedback_parser
+
+FEEDBACK_TOPIC='srs_decision_making_actions/feedback'
+RESULT_TOPIC='srs_decision_making_actions/result'
+
+
+#the tasks of a historical_data txt file as (command, actions), the command is unknown
+def tasks_from_text(historical_full_path):
+    tasks=[]
+    fo=open(historical_full_path,'r')
+    for line in fo:
+        if line[-1]=='\n':
+            line=line[:-1]
+        if line!='':
+            tasks.append(('',line))
+    fo.close()
+    return tasks
+
+
+#the tasks of a rosbag, put together from the succeeded actions like historical_data_recorder and callback_record_data do.
+#the command is the task_name, a task whose last action has no parent_object is skipped.
+def tasks_from_bag(bag_path):
+    try:
+        import rosbag
+    except ImportError:
+        print "reading %s needs the rosbag python module of ros"%bag_path
+        sys.exit(1)
+    tasks=[]
+    action_feedbacks=[]
+    bag=rosbag.Bag(bag_path)
+    for topic,msg,t in bag.read_messages(topics=[FEEDBACK_TOPIC,'/'+FEEDBACK_TOPIC,RESULT_TOPIC,'/'+RESULT_TOPIC]):
+        if topic.endswith('feedback'):
+            action_feedback=feedback_parser.parse_feedback(msg.feedback)
+            if action_feedback is not None:
+                action_feedbacks.append(action_feedback)
+        elif msg.result.return_value==3: #task successfully executed return_value: 3
+            history_line=feedback_parser.history_line(action_feedbacks)
+            if history_line is not None:
+                tasks.append((action_feedbacks[-1].task_name,history_line))
+            action_feedbacks=[]
+        else:
+            action_feedbacks=[]
+    bag.close()
+    return tasks
+
+
+#a model under test. counters is the learning window of the likelihood service, window:n and decay:n are the likelihood_models.
+#all the window models share one encoded history and are evaluated at once, the same for the decay models.
+class ReplayModels(object):
+
+    def __init__(self,model_names):
+        self.model_names=model_names
+        self.counters=None
+        self.windows=[]
+        self.half_lives=[]
+        for model_name in model_names:
+            if model_name=='counters':
+                self.counters=likelihood_counters.LikelihoodCounters(10)
+            else:
+                (model,window)=model_name.split(':')
+                if model=='window':
+                    self.windows.append(int(window))
+                elif model=='decay':
+                    self.half_lives.append(int(window))
+                else:
+                    raise ValueError("unknown likelihood model %s"%model_name)
+        self.encoded_history=likelihood_models.EncodedHistory()
+        self.time={}
+        for model_name in model_names:
+            self.time[model_name]=0.0
+
+    #the likelihoods of the candidates for every model
+    def likelihoods(self,candidates,command):
+        likelihoods={}
+        if self.counters is not None:
+            start=time.time()
+            likelihoods['counters']=self.counters.likelihoods(candidates,command)
+            self.time['counters']+=time.time()-start
+        for (model,windows) in [('window',self.windows),('decay',self.half_lives)]:
+            if windows:
+                start=time.time()
+                model_likelihoods=self.encoded_history.likelihoods(candidates,command,model,windows)
+                elapsed=(time.time()-start)/len(windows)
+                for n,window in enumerate(windows):
+                    likelihoods['%s:%d'%(model,window)]=model_likelihoods[n]
+                    self.time['%s:%d'%(model,window)]+=elapsed
+        return likelihoods
+
+    def add_task(self,actions,command):
+        if self.counters is not None:
+            start=time.time()
+            self.counters.add_task(actions,command)
+            self.time['counters']+=time.time()-start
+        if self.windows or self.half_lives:
+            start=time.time()
+            self.encoded_history.add_task(actions,command)
+            elapsed=time.time()-start
+            for model_name in self.model_names:
+                if model_name!='counters':
+                    self.time[model_name]+=elapsed/(len(self.windows)+len(self.half_lives))
+
+
+#replay the tasks. returns for every model {location: [tasks, correct predictions]} and the number of scored tasks.
+#the first warmup tasks are only added to the models.
+def replay(tasks,candidates,models,warmup=10,use_command=False):
+    scores={}
+    for model_name in models.model_names:
+        scores[model_name]={}
+        for candi in candidates:
+            scores[model_name][candi]=[0,0]
+    scored=0
+    for n,(command,actions) in enumerate(tasks):
+        #the history is sharded by the task type of the command, as in the learning servers
+        if use_command:
+            command=history_shards.task_type(command)
+        else:
+            command=''
+        location=history_store.task_location(actions)
+        if n>=warmup and location in candidates:
+            scored+=1
+            likelihoods=models.likelihoods(candidates,command)
+            for model_name in models.model_names:
+                model_likelihoods=list(likelihoods[model_name])
+                best=max(model_likelihoods)
+                score=scores[model_name][location]
+                score[0]+=1
+                #no prediction when no candidate has a likelihood
+                if best>0 and candidates[model_likelihoods.index(best)]==location:
+                    score[1]+=1
+        models.add_task(actions,command)
+    return scores,scored
+
+
+def report(scores,scored,candidates,models):
+    print "%d tasks scored"%scored
+    print "%-14s %9s %14s  %s"%('model','accuracy','tasks/s',' '.join(['%12s'%candi for candi in candidates]))
+    for model_name in models.model_names:
+        score=scores[model_name]
+        correct=sum([score[candi][1] for candi in candidates])
+        accuracy=correct/float(max(scored,1))
+        throughput=scored/max(models.time[model_name],1e-9)
+        per_candidate=[]
+        for candi in candidates:
+            if score[candi][0]>0:
+                per_candidate.append('%12s'%('%.3f (%d)'%(score[candi][1]/float(score[candi][0]),score[candi][0])))
+            else:
+                per_candidate.append('%12s'%'-')
+        print "%-14s %9.3f %14.0f  %s"%(model_name,accuracy,throughput,' '.join(per_candidate))
+
+
+if __name__ == "__main__":
+    parser=OptionParser(usage="%prog [options] historical_data.txt|feedback.bag")
+    parser.add_option('-c','--candidates',default='',help='candidate locations, space separated. default: all the locations of the history')
+    parser.add_option('-m','--models',default='counters,window:5,window:10,window:20,decay:5,decay:10,decay:20',help='models as counters, window:n or decay:n, comma separated')
+    parser.add_option('-w','--warmup',type='int',default=10,help='number of tasks which are only learned, not scored')
+    parser.add_option('--use-command',action='store_true',default=False,help='use the history of the task type of each task')
+    (options,args)=parser.parse_args()
+    if len(args)!=1:
+        parser.error('one historical_data file or rosbag is needed')
+
+    start=time.time()
+    if args[0].endswith('.bag'):
+        tasks=tasks_from_bag(args[0])
+    else:
+        tasks=tasks_from_text(args[0])
+    print "%d tasks read from %s in %.2fs"%(len(tasks),args[0],time.time()-start)
+
+    candidates=options.candidates.split()
+    if not candidates:
+        locations={}
+        for (command,actions) in tasks:
+            locations[history_store.task_location(actions)]=True
+        candidates=sorted([location for location in locations if location!=''])
+    try:
+        models=ReplayModels(options.models.split(','))
+    except ValueError, e:
+        parser.error(str(e))
+
+    start=time.time()
+    (scores,scored)=replay(tasks,candidates,models,options.warmup,options.use_command)
+    elapsed=time.time()-start
+    print "replayed in %.2fs, %.0f tasks/s for all the models"%(elapsed,len(tasks)/max(elapsed,1e-9))
+    report(scores,scored,candidates,models)
@@ -16,54 +16,26 @@ from srs_likelihood_calculation.srv import *
 from std_msgs.msg import String
 import rospy
 
-import fileinput
+import history_store
+import history_shards
+import consult_pool
 
 historical_data_LW=[]
+
+#the historical_data sharded by task type, with the likelihood counters (learning_window_width=10) and the encoded history
+#for the other likelihood models. started by consulting_server
+learning_history=None
         
 #using learning window to read historical data 
-#this function will be updated 
 #the learning_window_width will be decided based on the learning experience
-#this function should only need the historical_data file name, and will search this file itself
+#the historical_data is kept in a history store next to the historical_data file, the last learning_window_width tasks
+#are read from the end of its index, so the time does not grow with the size of the history.
+#lines appended to the historical_data file by other writers are imported first.
 
 def data_from_learning_window(learning_window_width,historical_full_path):
-    #learning_window_width=learning_window_width
-    line_offset = []
-    historical_data_LW=[]
-    
-    num_lines=0 #the number of lines of the historical_data(how big the experience is)
-    offset = 0 #the offset for a line
-
-    fo=open(historical_full_path,'r')#open the historical_data
-    
-    #calculate the num_lines and the offset for every line
-    for line in fo:
-	line_offset.append(offset)
-	offset += len(line)
-        num_lines+=1
-    #file.seek(0) # reset offset to the begining of the file
-    #n+learning_window_width=num_lines 
-    #the n is the line number, so n >=0, this means, num_lines>=learning_window_width, the program should make sure this is true
-    if num_lines>=learning_window_width:
-      #learning according the learning_window_width
-      n=num_lines-learning_window_width
-    else:
-      n=0 #using the whole historical_data
-    
-    # Now, to skip to line n (with the first line being line 0), just do
-    fo.seek(line_offset[n])   
-    
-
-    for line in fo:
-        
-	#remove the end-line character from the action sequence
-	if line[-1] == '\n':
-           line1=line[:-1]
-        else:
-           line1=line        
-	historical_data_LW.append(line1)
-	
-    # Close opend file
-    fo.close()
+    store=history_store.history_store(historical_full_path)
+    store.import_text()
+    historical_data_LW=store.last_tasks(learning_window_width)
     return historical_data_LW #return the historical_data based on the learning_window_width
 
 def calculate_likelihood(data_for_likelihood,candidate_list):
@@ -129,37 +101,37 @@ def handle_consulting(req):
     #both the command and candidates will be used for likelihood calculating based on the historical data of learning 
     print "consulting command is: %s "%req.command
     print "consulting candidates are: %s" %req.candidate
-    #here we just read the historical_data from the txt file
-    #the final data should come from a search based on the command (task classification) and candidates(for activity cluster)
-    #!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!
-    data_for_likelihood=data_from_learning_window(10,'historical_data.txt')
-    print"the historical_data based on learning_window_width=10 is: "
-    print data_for_likelihood
-    print "the number of historical_data is %d"%len(data_for_likelihood)
-    #calculating the likelihood
-    #likelihoodresponse="likelihood for %s from %s is ??? "%(req.command,req.candidate)
-    likelihoodresponse=calculate_likelihood(data_for_likelihood,req.candidate)
+    #the likelihood is calculated from the last snapshot of the history of the task type of the command (task classification),
+    #the tasks recorded since then (by this node or by other writers of the historical_data) are added by the writer of the history
+    snapshot=learning_history.snapshot()
+    #calculating the likelihood, the model and the window are chosen by the DEM ('' is the learning window of calculate_likelihood)
+    try:
+      likelihoodresponse=snapshot.likelihood(req.candidate,req.command,req.model,req.window)
+    except ValueError, e:
+      raise rospy.ServiceException(str(e))
+    print "candidate_likelihood is %s" %likelihoodresponse
     return LikelihoodResponse(likelihoodresponse)
 
 def callback_record_data(data):
     #rospy.loginfo(rospy.get_name()+"Action sequence is: %s",data.data)
     #print rospy.get_name()+" Action sequence is: ",data.data
     print "Action sequence is: ",data.data
-    # Open a file
-    fo = open("historical_data.txt", "ab")
-    fo.write( data.data+"\n");
-
-    # Close opend file
-    fo.close()
+    # queue the task for the writer of the history store of historical_data.txt, it is counted in the next snapshot
+    learning_history.record(data.data)
 
 def consulting_server():
     
+    global learning_history
     rospy.init_node('likelyhood_server', anonymous=True)
+    learning_history=history_shards.ShardedHistory('historical_data.txt',10,import_interval=rospy.get_param('~history_import_interval', 1.0))
+    rospy.on_shutdown(learning_history.close)
+    #at most max_workers consults are calculated at the same time
+    pool=consult_pool.ConsultPool(rospy.get_param('~max_workers', 4))
     #rospy.init_node('recorder', anonymous=True)
     #rospy.loginfo("node is initialized")
     rospy.Subscriber("historical_data", String, callback_record_data) #record the historical data 
     #rospy.init_node('likelyhood_server')
-    s = rospy.Service('likelihood', Likelihood, handle_consulting) #provide service
+    s = rospy.Service('likelihood', Likelihood, pool.wrap(handle_consulting)) #provide service
     print "Ready to receive consulting."
     rospy.spin()
 
@@ -44,7 +44,7 @@ class select_srs_grasp(smach.State):
             return 'failed'
         
         get_grasps_from_position = rospy.ServiceProxy('get_feasible_grasps', GetFeasibleGrasps)
-        req = GetFeasibleGraspsRequest(userdata.target_object_id, object_pose_bl.pose, [0.0, 0.0]) #[X,Z]
+        req = GetFeasibleGraspsRequest(object_id=userdata.target_object_id, object_pose=object_pose_bl.pose, pregrasp_offsets=[0.0, 0.0], max_grasps=0) #[X,Z]
         grasp_configuration = copy.deepcopy((get_grasps_from_position(req)).grasp_configuration)
 
         if len(grasp_configuration) < 1: # no valid configurations found
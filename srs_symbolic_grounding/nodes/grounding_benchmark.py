@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Benchmark of the symbol grounding handlers on synthetic apartments. The handlers
+# are called directly with a generated map, so no ros master is needed.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import roslib; roslib.load_manifest('srs_symbolic_grounding')
+from srs_symbolic_grounding.srv import *
+from srs_msgs.msg import SRSSpatialInfo
+from geometry_msgs.msg import *
+from nav_msgs.msg import *
+import sys
+import time
+import math
+import random
+from optparse import OptionParser
+import numpy
+from tf.transformations import quaternion_from_euler
+import grounding_map
+import grounding_cache
+import grounding_coalesce
+import symbol_grounding_scan_base_pose_server
+import symbol_grounding_scan_base_region_server
+import symbol_grounding_grasp_base_region_server
+import symbol_grounding_grasp_base_pose_experimental_server
+import symbol_grounding_deliver_base_region_server
+import symbol_grounding_explore_base_pose_server
+
+
+
+#occupancy grid of a square apartment of size x size metres. the outer walls and the walls between the rooms (every room_size metres) are occupied, every wall between two rooms has a 1m door.
+def syntheticMap(size, resolution=0.05, room_size=5.0):
+	cells = int(round(size / resolution))
+	wall = max(1, int(round(0.1 / resolution)))
+	door = int(round(1.0 / resolution))
+	room_cells = int(round(room_size / resolution))
+	occupancy = numpy.zeros((cells, cells), dtype=numpy.int8)
+	occupancy[:wall, :] = 100
+	occupancy[-wall:, :] = 100
+	occupancy[:, :wall] = 100
+	occupancy[:, -wall:] = 100
+	for line in range(room_cells, cells - wall, room_cells):
+		occupancy[line:line + wall, :] = 100
+		occupancy[:, line:line + wall] = 100
+		for room in range(0, cells, room_cells):
+			middle = room + room_cells / 2
+			occupancy[line:line + wall, middle - door / 2:middle + door / 2] = 0
+			occupancy[middle - door / 2:middle + door / 2, line:line + wall] = 0
+
+	grid = OccupancyGrid()
+	grid.header.frame_id = '/map'
+	grid.info.resolution = resolution
+	grid.info.width = cells
+	grid.info.height = cells
+	grid.info.origin.position.x = -0.5 * size
+	grid.info.origin.position.y = -0.5 * size
+	grid.info.origin.orientation.w = 1.0
+	grid.data = occupancy.ravel().tolist()
+	return grid
+
+
+#n furnitures (tables, shelves, ...) in an apartment of size x size metres, roughly aligned with the walls
+def syntheticFurniture(size, n, rng):
+	furniture_geometry_list = list()
+	for index in range(n):
+		furniture_geometry = SRSSpatialInfo()
+		furniture_geometry.l = rng.uniform(0.6, 2.0)
+		furniture_geometry.w = rng.uniform(0.4, 1.0)
+		furniture_geometry.h = rng.uniform(0.45, 1.2)
+		furniture_geometry.pose.position.x = rng.uniform(-0.5 * size + 1.0, 0.5 * size - 1.0)
+		furniture_geometry.pose.position.y = rng.uniform(-0.5 * size + 1.0, 0.5 * size - 1.0)
+		furniture_geometry.pose.position.z = furniture_geometry.h
+		q = quaternion_from_euler(0.0, 0.0, rng.choice([0.0, 0.5 * math.pi, math.pi, -0.5 * math.pi]) + rng.uniform(-0.1, 0.1))
+		furniture_geometry.pose.orientation.x = q[0]
+		furniture_geometry.pose.orientation.y = q[1]
+		furniture_geometry.pose.orientation.z = q[2]
+		furniture_geometry.pose.orientation.w = q[3]
+		furniture_geometry_list.append(furniture_geometry)
+	return furniture_geometry_list
+
+
+#a target obj near the front edge of the parent obj
+def syntheticTarget(parent_obj_geometry, rng):
+	parent_obj_th = 2.0 * math.atan2(parent_obj_geometry.pose.orientation.z, parent_obj_geometry.pose.orientation.w)
+	offset_w = 0.5 * parent_obj_geometry.w - 0.1
+	offset_l = rng.uniform(-0.4, 0.4) * parent_obj_geometry.l
+	target_obj_pose = Pose()
+	target_obj_pose.position.x = parent_obj_geometry.pose.position.x + offset_w * math.cos(parent_obj_th) - offset_l * math.sin(parent_obj_th)
+	target_obj_pose.position.y = parent_obj_geometry.pose.position.y + offset_w * math.sin(parent_obj_th) + offset_l * math.cos(parent_obj_th)
+	target_obj_pose.position.z = parent_obj_geometry.h + 0.1
+	target_obj_pose.orientation.w = 1.0
+	return target_obj_pose
+
+
+#give all the server modules the synthetic map. the map is handed to the map cache the way the static_map service would, and the result caches
+#neither keep nor write answers, so every call is grounded. the deliver server gets a fixed robot pose instead of asking tf.
+def setUpServers(grid):
+	map_cache = grounding_map.MapCache(map_topic=None)
+	map_cache.setMap(grid)
+	symbol_grounding_scan_base_pose_server.map_cache = map_cache
+	symbol_grounding_scan_base_region_server.map_cache = map_cache
+	symbol_grounding_grasp_base_region_server.map_cache = map_cache
+	symbol_grounding_grasp_base_pose_experimental_server.map_cache = map_cache
+	symbol_grounding_deliver_base_region_server.map_cache = map_cache
+	symbol_grounding_scan_base_pose_server.result_cache = grounding_cache.GroundingCache('scan_base_pose', capacity=0, map_topic=None, persistent=False)
+	symbol_grounding_explore_base_pose_server.result_cache = grounding_cache.GroundingCache('explore_base_pose', capacity=0, map_topic=None, persistent=False)
+	symbol_grounding_grasp_base_region_server.coalescer = grounding_coalesce.RequestCoalescer('grasp_base_region')
+	symbol_grounding_deliver_base_region_server.getRobotPose = lambda: Pose2D(0.0, 0.0, 0.0)
+
+
+#requests of every handler for a furniture list. each request grounds a random furniture as parent obj. the scan plan starts at the fixed robot pose of setUpServers.
+def syntheticRequests(furniture_geometry_list, rng, count=16, batch_size=8):
+	requests = dict()
+	for name in ['grasp_base_region', 'grasp_base_region_batch', 'grasp_base_pose_search', 'grasp_base_pose_experimental', 'scan_base_pose', 'scan_base_pose_batch', 'scan_base_region', 'explore_base_pose', 'deliver_base_region', 'deliver_base_region_batch', 'scan_plan']:
+		requests[name] = list()
+	for n in range(count):
+		parent_obj_geometry = rng.choice(furniture_geometry_list)
+		target_obj_pose = syntheticTarget(parent_obj_geometry, rng)
+		parent_obj_list = [rng.choice(furniture_geometry_list) for b in range(batch_size)]
+		requests['grasp_base_region'].append(SymbolGroundingGraspBaseRegionRequest(target_obj_pose, parent_obj_geometry, furniture_geometry_list))
+		requests['grasp_base_region_batch'].append(SymbolGroundingGraspBaseRegionBatchRequest([syntheticTarget(parent_obj, rng) for parent_obj in parent_obj_list], parent_obj_list, furniture_geometry_list))
+		requests['grasp_base_pose_search'].append(SymbolGroundingGraspBasePoseSearchRequest(target_obj_pose, parent_obj_geometry, furniture_geometry_list, 5))
+		requests['grasp_base_pose_experimental'].append(SymbolGroundingGraspBasePoseExperimentalRequest(target_obj_pose, parent_obj_geometry, furniture_geometry_list))
+		requests['scan_base_pose'].append(SymbolGroundingScanBasePoseRequest(parent_obj_geometry, furniture_geometry_list))
+		requests['scan_base_pose_batch'].append(SymbolGroundingScanBasePoseBatchRequest(parent_obj_list, furniture_geometry_list))
+		requests['scan_base_region'].append(SymbolGroundingScanBaseRegionRequest(parent_obj_geometry, furniture_geometry_list))
+		requests['explore_base_pose'].append(SymbolGroundingExploreBasePoseRequest(parent_obj_geometry, furniture_geometry_list))
+		requests['deliver_base_region'].append(SymbolGroundingDeliverBaseRegionRequest(parent_obj_geometry, furniture_geometry_list))
+		requests['deliver_base_region_batch'].append(SymbolGroundingDeliverBaseRegionBatchRequest(parent_obj_list, furniture_geometry_list))
+		requests['scan_plan'].append(SymbolGroundingScanPlanRequest(parent_obj_list, furniture_geometry_list, Pose2D(0.0, 0.0, 0.0)))
+	return requests
+
+
+handlers = [
+	('grasp_base_region', symbol_grounding_grasp_base_region_server.handle_symbol_grounding_grasp_base_region),
+	('grasp_base_region_batch', symbol_grounding_grasp_base_region_server.handle_symbol_grounding_grasp_base_region_batch),
+	('grasp_base_pose_search', symbol_grounding_grasp_base_region_server.handle_symbol_grounding_grasp_base_pose_search),
+	('grasp_base_pose_experimental', symbol_grounding_grasp_base_pose_experimental_server.handle_symbol_grounding_grasp_base_pose_experimental),
+	('scan_base_pose', symbol_grounding_scan_base_pose_server.handle_symbol_grounding_scan_base_pose),
+	('scan_base_pose_batch', symbol_grounding_scan_base_pose_server.handle_symbol_grounding_scan_base_pose_batch),
+	('scan_base_region', symbol_grounding_scan_base_region_server.handle_symbol_grounding_scan_base_region),
+	('explore_base_pose', symbol_grounding_explore_base_pose_server.handle_symbol_grounding_explore_base_pose),
+	('deliver_base_region', symbol_grounding_deliver_base_region_server.handle_symbol_grounding_deliver_base_region),
+	('deliver_base_region_batch', symbol_grounding_deliver_base_region_server.handle_symbol_grounding_deliver_base_region_batch),
+	('scan_plan', symbol_grounding_scan_base_region_server.handle_symbol_grounding_scan_plan)]
+
+
+class NullWriter(object):
+	def write(self, text):
+		pass
+
+
+#call handler with the requests in turn and return the latency of every call in seconds and the number of calls which raised an exception.
+#the first call is not timed, it builds the distance transform and the furniture index. the handlers print a lot, so stdout is muted meanwhile.
+def measure(handler, requests, iterations):
+	latencies = list()
+	failures = 0
+	stdout = sys.stdout
+	sys.stdout = NullWriter()
+	try:
+		try:
+			handler(requests[0])
+		except Exception:
+			pass
+		for n in range(iterations):
+			req = requests[n % len(requests)]
+			start = time.time()
+			try:
+				handler(req)
+			except Exception:
+				failures += 1
+			latencies.append(time.time() - start)
+	finally:
+		sys.stdout = stdout
+	return latencies, failures
+
+
+def benchmark(sizes, iterations, seed):
+	print "%6s %6s %-30s %6s %9s %9s %9s %9s %9s %8s" % ('map_m', 'furn', 'handler', 'calls', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'req/s', 'failed')
+	for (size, furniture_count) in sizes:
+		rng = random.Random(seed)
+		setUpServers(syntheticMap(size))
+		furniture_geometry_list = syntheticFurniture(size, furniture_count, rng)
+		requests = syntheticRequests(furniture_geometry_list, rng)
+		for (name, handler) in handlers:
+			latencies, failures = measure(handler, requests[name], iterations)
+			latencies_ms = numpy.array(latencies) * 1000.0
+			print "%6.1f %6d %-30s %6d %9.3f %9.3f %9.3f %9.3f %9.1f %8d" % (size, furniture_count, name, len(latencies), latencies_ms.mean(), numpy.percentile(latencies_ms, 50), numpy.percentile(latencies_ms, 90), numpy.percentile(latencies_ms, 99), len(latencies) / max(sum(latencies), 1e-9), failures)
+
+
+
+if __name__ == "__main__":
+	parser = OptionParser(usage="%prog [options]")
+	parser.add_option('-n', '--iterations', type='int', default=50, help='timed calls per handler and apartment')
+	parser.add_option('-s', '--sizes', default='10:10,20:50,40:200', help='apartments as map_size_in_m:number_of_furnitures, comma separated')
+	parser.add_option('--seed', type='int', default=0, help='seed of the synthetic apartments')
+	(options, args) = parser.parse_args()
+	sizes = list()
+	for size in options.sizes.split(','):
+		(map_size, furniture_count) = size.split(':')
+		sizes.append((float(map_size), int(furniture_count)))
+	benchmark(sizes, options.iterations, options.seed)
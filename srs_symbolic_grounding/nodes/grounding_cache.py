@@ -0,0 +1,250 @@
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Result cache of the symbol grounding servers. Answers are kept in memory (LRU)
+# and on disk, and are dropped whenever a new map is published.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import os
+import threading
+import hashlib
+import cPickle
+from StringIO import StringIO
+from collections import OrderedDict
+import rospy
+from nav_msgs.msg import OccupancyGrid
+
+
+
+#caches the answers of a grounding service. the key of an answer is a hash of the serialised parent obj geometry, the furniture list and the header stamp of the map.
+#the newest answers are kept in memory, all answers are also written to cache_dir so they survive a restart of the server. a map with a new stamp clears both.
+#with persistent False nothing is written to disk, with map_topic None the map stamp has to be given with setMapStamp.
+class GroundingCache(object):
+
+	def __init__(self, name, capacity=128, cache_dir=None, map_topic='map', persistent=True):
+		if not persistent:
+			cache_dir = None
+		elif cache_dir is None:
+			cache_dir = os.path.join(os.environ.get('ROS_HOME', os.path.join(os.path.expanduser('~'), '.ros')), 'srs_symbolic_grounding', name)
+		self.name = name
+		self.capacity = capacity
+		self.cache_dir = cache_dir
+		self.lock = threading.Lock()
+		self.entries = OrderedDict()
+		self.map_stamp = None
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		self.invalidations = 0
+		try:
+			if cache_dir is not None and not os.path.isdir(cache_dir):
+				os.makedirs(cache_dir)
+		except OSError, e:
+			rospy.logwarn("grounding cache %s works in memory only: %s"%(name, e))
+			self.cache_dir = None
+		self.map_sub = None
+		if map_topic is not None:
+			self.map_sub = rospy.Subscriber(map_topic, OccupancyGrid, self.setMapStamp)
+
+
+	#drop all answers when a map with a different stamp is published. the stamp is also stored in cache_dir, so the answers written for an older map are dropped after a restart.
+	def setMapStamp(self, grid):
+		map_stamp = (grid.header.stamp.secs, grid.header.stamp.nsecs)
+		self.lock.acquire()
+		try:
+			if self.map_stamp is None:
+				self.map_stamp = self.readMapStamp()
+			if map_stamp != self.map_stamp:
+				if self.map_stamp is not None:
+					self.invalidations += 1
+				self.clear()
+				self.map_stamp = map_stamp
+				self.writeMapStamp()
+		finally:
+			self.lock.release()
+
+
+	def readMapStamp(self):
+		if self.cache_dir is None:
+			return None
+		try:
+			stamp_file = open(os.path.join(self.cache_dir, 'map_stamp'), 'r')
+			try:
+				(secs, nsecs) = stamp_file.read().split()
+				return (int(secs), int(nsecs))
+			finally:
+				stamp_file.close()
+		except (IOError, ValueError):
+			return None
+
+
+	def writeMapStamp(self):
+		if self.cache_dir is None:
+			return
+		try:
+			stamp_file = open(os.path.join(self.cache_dir, 'map_stamp'), 'w')
+			try:
+				stamp_file.write("%d %d"%self.map_stamp)
+			finally:
+				stamp_file.close()
+		except IOError, e:
+			rospy.logwarn("grounding cache %s could not write the map stamp: %s"%(self.name, e))
+
+
+	#remove all the answers from memory and disk. the caller holds the lock.
+	def clear(self):
+		self.entries.clear()
+		if self.cache_dir is not None:
+			for file_name in os.listdir(self.cache_dir):
+				if file_name.endswith('.pkl'):
+					try:
+						os.remove(os.path.join(self.cache_dir, file_name))
+					except OSError:
+						pass
+
+
+	#hash of the furniture list. it is shared by all the parent objs of a batch request.
+	def furnitureDigest(self, furniture_geometry_list):
+		digest = hashlib.sha1()
+		buff = StringIO()
+		for furniture_geometry in furniture_geometry_list:
+			furniture_geometry.serialize(buff)
+		digest.update(buff.getvalue())
+		return digest
+
+
+	#key of the answer for a parent obj, a furniture list (or its digest) and the current map
+	def key(self, parent_obj_geometry, furniture_geometry_list):
+		if isinstance(furniture_geometry_list, list) or isinstance(furniture_geometry_list, tuple):
+			digest = self.furnitureDigest(furniture_geometry_list)
+		else:
+			digest = furniture_geometry_list.copy()
+		buff = StringIO()
+		parent_obj_geometry.serialize(buff)
+		digest.update(buff.getvalue())
+		digest.update(repr(self.map_stamp))
+		return digest.hexdigest()
+
+
+	#cached answer of key, None if there is none
+	def get(self, key):
+		self.lock.acquire()
+		try:
+			if key in self.entries:
+				value = self.entries.pop(key)
+				self.entries[key] = value
+				self.hits += 1
+				return value
+		finally:
+			self.lock.release()
+
+		value = None
+		if self.cache_dir is not None:
+			try:
+				cache_file = open(os.path.join(self.cache_dir, key + '.pkl'), 'rb')
+				try:
+					value = cPickle.load(cache_file)
+				finally:
+					cache_file.close()
+			except (IOError, EOFError, cPickle.UnpicklingError):
+				value = None
+
+		self.lock.acquire()
+		try:
+			if value is None:
+				self.misses += 1
+			else:
+				self.disk_hits += 1
+				self.remember(key, value)
+		finally:
+			self.lock.release()
+		return value
+
+
+	#store the answer of key in memory and on disk
+	def put(self, key, value):
+		self.lock.acquire()
+		try:
+			self.remember(key, value)
+		finally:
+			self.lock.release()
+		if self.cache_dir is not None:
+			file_name = os.path.join(self.cache_dir, key + '.pkl')
+			try:
+				cache_file = open(file_name + '.tmp', 'wb')
+				try:
+					cPickle.dump(value, cache_file, cPickle.HIGHEST_PROTOCOL)
+				finally:
+					cache_file.close()
+				os.rename(file_name + '.tmp', file_name)
+			except (IOError, OSError), e:
+				rospy.logwarn("grounding cache %s could not write %s: %s"%(self.name, file_name, e))
+
+
+	#put an answer into the in-memory LRU. the caller holds the lock.
+	def remember(self, key, value):
+		if key in self.entries:
+			self.entries.pop(key)
+		self.entries[key] = value
+		while len(self.entries) > self.capacity:
+			self.entries.popitem(last=False)
+
+
+	#hit and miss counters of the cache
+	def stats(self):
+		self.lock.acquire()
+		try:
+			lookups = self.hits + self.disk_hits + self.misses
+			hit_rate = 0.0
+			if lookups > 0:
+				hit_rate = float(self.hits + self.disk_hits) / lookups
+			return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'invalidations': self.invalidations, 'size': len(self.entries), 'hit_rate': hit_rate}
+		finally:
+			self.lock.release()
+
+
+	def logStats(self):
+		rospy.loginfo("grounding cache %s: %s"%(self.name, self.stats()))
@@ -0,0 +1,131 @@
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Request coalescing of the symbol grounding servers. Identical requests which
+# arrive while one of them is grounded wait for its result instead of grounding again.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import threading
+import hashlib
+from StringIO import StringIO
+import rospy
+
+
+
+#key of a request: a hash of the serialised messages
+def requestKey(*msgs):
+	buff = StringIO()
+	for msg in msgs:
+		msg.serialize(buff)
+	return hashlib.sha1(buff.getvalue()).hexdigest()
+
+
+class InFlightCall(object):
+
+	def __init__(self):
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+		self.waiters = 0
+
+
+#shares the computation of identical requests. the first caller of a key computes the result, the callers which arrive with the same key
+#before it is done wait and get the same result (or exception). nothing is kept after the computation, see grounding_cache for that.
+class RequestCoalescer(object):
+
+	def __init__(self, name):
+		self.name = name
+		self.lock = threading.Lock()
+		self.in_flight = dict()
+		self.computed = 0
+		self.shared = 0
+
+
+	def call(self, key, compute):
+		self.lock.acquire()
+		try:
+			in_flight_call = self.in_flight.get(key)
+			leader = in_flight_call is None
+			if leader:
+				in_flight_call = InFlightCall()
+				self.in_flight[key] = in_flight_call
+				self.computed += 1
+			else:
+				in_flight_call.waiters += 1
+				self.shared += 1
+		finally:
+			self.lock.release()
+
+		if leader:
+			try:
+				in_flight_call.result = compute()
+			except Exception, e:
+				in_flight_call.error = e
+			self.lock.acquire()
+			try:
+				del self.in_flight[key]
+			finally:
+				self.lock.release()
+			in_flight_call.done.set()
+		else:
+			in_flight_call.done.wait()
+
+		if in_flight_call.error is not None:
+			raise in_flight_call.error
+		return in_flight_call.result
+
+
+	#number of computed and of shared requests
+	def stats(self):
+		self.lock.acquire()
+		try:
+			return {'computed': self.computed, 'shared': self.shared, 'in_flight': len(self.in_flight)}
+		finally:
+			self.lock.release()
+
+
+	def logStats(self):
+		rospy.loginfo("request coalescer %s: %s"%(self.name, self.stats()))
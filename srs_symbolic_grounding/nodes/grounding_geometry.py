@@ -0,0 +1,122 @@
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Shared geometry used by the symbol grounding servers. All candidate poses
+# are checked against a set of box footprints at once with numpy arrays.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import numpy
+from srs_symbolic_grounding.msg import FurnitureGeometry
+from tf.transformations import euler_from_quaternion
+
+
+
+#transfrom furniture geometry data from database (SRSSpatialInfo) to FurnitureGeometry
+def furnitureGeometryList(spatial_info_list):
+	furniture_geometry_list = list()
+	for spatial_info in spatial_info_list:
+		furniture_geometry = FurnitureGeometry()
+		furniture_geometry.pose.x = spatial_info.pose.position.x
+		furniture_geometry.pose.y = spatial_info.pose.position.y
+		furniture_pose_rpy = euler_from_quaternion([spatial_info.pose.orientation.x, spatial_info.pose.orientation.y, spatial_info.pose.orientation.z, spatial_info.pose.orientation.w])
+		furniture_geometry.pose.theta = furniture_pose_rpy[2]
+		furniture_geometry.l = spatial_info.l
+		furniture_geometry.w = spatial_info.w
+		furniture_geometry.h = spatial_info.h
+		furniture_geometry_list.append(furniture_geometry)
+	return furniture_geometry_list
+
+
+#convert a list of Pose2D into coordinate arrays (x, y, theta)
+def poseArrays(pose_list):
+	pose_x = numpy.array([pose.x for pose in pose_list], dtype=float)
+	pose_y = numpy.array([pose.y for pose in pose_list], dtype=float)
+	pose_th = numpy.array([pose.theta for pose in pose_list], dtype=float)
+	return pose_x, pose_y, pose_th
+
+
+#convert a list of FurnitureGeometry into box arrays (x, y, theta, w, l)
+def furnitureArrays(furniture_geometry_list):
+	box_x = numpy.array([furniture.pose.x for furniture in furniture_geometry_list], dtype=float)
+	box_y = numpy.array([furniture.pose.y for furniture in furniture_geometry_list], dtype=float)
+	box_th = numpy.array([furniture.pose.theta for furniture in furniture_geometry_list], dtype=float)
+	box_w = numpy.array([furniture.w for furniture in furniture_geometry_list], dtype=float)
+	box_l = numpy.array([furniture.l for furniture in furniture_geometry_list], dtype=float)
+	return box_x, box_y, box_th, box_w, box_l
+
+
+#keep the poses of pose_list for which mask is true
+def filterPoseList(pose_list, mask):
+	return [pose for pose, valid in zip(pose_list, mask) if valid]
+
+
+#express every pose in the frame of every box. returns two (poses x boxes) arrays.
+#this is the rotation the servers used to do with atan / sqrt / cos / sin for each pair.
+def boxFrameOffsets(pose_x, pose_y, box_x, box_y, box_th):
+	dx = numpy.asarray(pose_x, dtype=float)[:, numpy.newaxis] - numpy.asarray(box_x, dtype=float)[numpy.newaxis, :]
+	dy = numpy.asarray(pose_y, dtype=float)[:, numpy.newaxis] - numpy.asarray(box_y, dtype=float)[numpy.newaxis, :]
+	cos_th = numpy.cos(box_th)[numpy.newaxis, :]
+	sin_th = numpy.sin(box_th)[numpy.newaxis, :]
+	delta_x = dx * cos_th + dy * sin_th
+	delta_y = dy * cos_th - dx * sin_th
+	return delta_x, delta_y
+
+
+#true for the poses which are outside all of the boxes grown by clearance. a pose on the border counts as outside.
+def boxClearMask(pose_x, pose_y, box_x, box_y, box_th, box_w, box_l, clearance):
+	if len(box_x) == 0:
+		return numpy.ones(len(pose_x), dtype=bool)
+	delta_x, delta_y = boxFrameOffsets(pose_x, pose_y, box_x, box_y, box_th)
+	half_w = numpy.asarray(box_w, dtype=float)[numpy.newaxis, :] / 2.0 + clearance
+	half_l = numpy.asarray(box_l, dtype=float)[numpy.newaxis, :] / 2.0 + clearance
+	outside = (numpy.abs(delta_x) >= half_w) | (numpy.abs(delta_y) >= half_l)
+	return outside.all(axis=1)
+
+
+#to check if the poses are too close to the edge of the parent obj
+def parentObjClearMask(pose_x, pose_y, po_x, po_y, po_th, po_w, po_l, dist_to_table):
+	return boxClearMask(pose_x, pose_y, [po_x], [po_y], [po_th], [po_w], [po_l], dist_to_table)
+
@@ -0,0 +1,233 @@
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Spatial index over the furniture footprints of a grounding request. Only the
+# furnitures near a pose are checked for collisions and clearance.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import math
+import threading
+import hashlib
+from StringIO import StringIO
+from collections import OrderedDict
+import numpy
+import grounding_geometry
+
+
+
+#uniform grid over the bounding boxes of the furniture footprints. every cell keeps the furnitures whose bounding box overlaps it,
+#so collision and clearance queries only look at the furnitures around the poses instead of all the furnitures of the map.
+class FurnitureIndex(object):
+
+	def __init__(self, furniture_geometry_list, cell_size=1.0):
+		self.furniture_geometry_list = furniture_geometry_list
+		self.cell_size = float(cell_size)
+		self.box_x, self.box_y, self.box_th, self.box_w, self.box_l = grounding_geometry.furnitureArrays(furniture_geometry_list)
+
+		#half size of the axis aligned bounding box of each footprint
+		cos_th = numpy.abs(numpy.cos(self.box_th))
+		sin_th = numpy.abs(numpy.sin(self.box_th))
+		self.half_x = self.box_w / 2.0 * cos_th + self.box_l / 2.0 * sin_th
+		self.half_y = self.box_w / 2.0 * sin_th + self.box_l / 2.0 * cos_th
+
+		self.cells = dict()
+		self.cell_min = None
+		self.cell_max = None
+		for index in range(len(furniture_geometry_list)):
+			(i_min, j_min) = self.cell(self.box_x[index] - self.half_x[index], self.box_y[index] - self.half_y[index])
+			(i_max, j_max) = self.cell(self.box_x[index] + self.half_x[index], self.box_y[index] + self.half_y[index])
+			for i in range(i_min, i_max + 1):
+				for j in range(j_min, j_max + 1):
+					self.cells.setdefault((i, j), list()).append(index)
+			if self.cell_min is None:
+				self.cell_min = [i_min, j_min]
+				self.cell_max = [i_max, j_max]
+			else:
+				self.cell_min = [min(self.cell_min[0], i_min), min(self.cell_min[1], j_min)]
+				self.cell_max = [max(self.cell_max[0], i_max), max(self.cell_max[1], j_max)]
+
+
+	def __len__(self):
+		return len(self.furniture_geometry_list)
+
+
+	#grid cell of a point
+	def cell(self, x, y):
+		return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+
+	#indices of the furnitures whose bounding box may overlap the rectangle [x_min, x_max] x [y_min, y_max]
+	def candidates(self, x_min, y_min, x_max, y_max):
+		if self.cell_min is None:
+			return numpy.zeros(0, dtype=int)
+		(i_min, j_min) = self.cell(x_min, y_min)
+		(i_max, j_max) = self.cell(x_max, y_max)
+		i_min = max(i_min, self.cell_min[0])
+		j_min = max(j_min, self.cell_min[1])
+		i_max = min(i_max, self.cell_max[0])
+		j_max = min(j_max, self.cell_max[1])
+		found = set()
+		for i in range(i_min, i_max + 1):
+			for j in range(j_min, j_max + 1):
+				found.update(self.cells.get((i, j), ()))
+		return numpy.array(sorted(found), dtype=int)
+
+
+	#candidates for a set of poses and a clearance. a footprint grown by the clearance in its own frame stays inside its bounding box grown by sqrt(2) * clearance.
+	def candidatesNear(self, pose_x, pose_y, clearance):
+		if len(pose_x) == 0:
+			return numpy.zeros(0, dtype=int)
+		margin = max(clearance, 0.0) * math.sqrt(2.0)
+		return self.candidates(numpy.min(pose_x) - margin, numpy.min(pose_y) - margin, numpy.max(pose_x) + margin, numpy.max(pose_y) + margin)
+
+
+	#distance of every pose to every footprint in idx, measured in the frame of the footprint as max(|delta_x| - w/2, |delta_y| - l/2). negative inside the footprint.
+	def footprintDistance(self, pose_x, pose_y, idx):
+		delta_x, delta_y = grounding_geometry.boxFrameOffsets(pose_x, pose_y, self.box_x[idx], self.box_y[idx], self.box_th[idx])
+		return numpy.maximum(numpy.abs(delta_x) - self.box_w[idx] / 2.0, numpy.abs(delta_y) - self.box_l[idx] / 2.0)
+
+
+	#to check if the poses are too close to or blocked by the furnitures in the room. only the furnitures near the poses are tested.
+	def clearMask(self, pose_x, pose_y, clearance):
+		pose_x = numpy.asarray(pose_x, dtype=float)
+		pose_y = numpy.asarray(pose_y, dtype=float)
+		idx = self.candidatesNear(pose_x, pose_y, clearance)
+		return grounding_geometry.boxClearMask(pose_x, pose_y, self.box_x[idx], self.box_y[idx], self.box_th[idx], self.box_w[idx], self.box_l[idx], clearance)
+
+
+	#indices of the furnitures closer than radius to the pose (x, y)
+	def withinRadius(self, x, y, radius):
+		idx = self.candidatesNear([x], [y], radius)
+		if len(idx) == 0:
+			return idx
+		return idx[self.footprintDistance([x], [y], idx)[0] < radius]
+
+
+	#distance of each pose to its nearest footprint, capped at max_dist. poses without a furniture closer than max_dist get max_dist.
+	def clearance(self, pose_x, pose_y, max_dist):
+		pose_x = numpy.asarray(pose_x, dtype=float)
+		pose_y = numpy.asarray(pose_y, dtype=float)
+		pose_clearance = numpy.empty(len(pose_x), dtype=float)
+		pose_clearance.fill(max_dist)
+		idx = self.candidatesNear(pose_x, pose_y, max_dist)
+		if len(idx) > 0 and len(pose_x) > 0:
+			pose_clearance = numpy.minimum(pose_clearance, self.footprintDistance(pose_x, pose_y, idx).min(axis=1))
+		return pose_clearance
+
+
+	#cells on the border of the square of cells around (ci, cj) with half size ring
+	def ringCells(self, ci, cj, ring):
+		if ring == 0:
+			return [(ci, cj)]
+		ring_cells = list()
+		for i in range(ci - ring, ci + ring + 1):
+			ring_cells.append((i, cj - ring))
+			ring_cells.append((i, cj + ring))
+		for j in range(cj - ring + 1, cj + ring):
+			ring_cells.append((ci - ring, j))
+			ring_cells.append((ci + ring, j))
+		return ring_cells
+
+
+	#nearest footprint to the pose (x, y). returns its index and distance, (None, inf) when there are no furnitures.
+	#the grid is searched in rings around the pose until no unvisited footprint can be closer than the best one.
+	def nearest(self, x, y):
+		if self.cell_min is None:
+			return None, float('inf')
+		(ci, cj) = self.cell(x, y)
+		max_ring = max(abs(ci - self.cell_min[0]), abs(ci - self.cell_max[0]), abs(cj - self.cell_min[1]), abs(cj - self.cell_max[1]))
+		visited = set()
+		best_index = None
+		best_dist = float('inf')
+		for ring in range(max_ring + 1):
+			ring_idx = set()
+			for (i, j) in self.ringCells(ci, cj, ring):
+				ring_idx.update(self.cells.get((i, j), ()))
+			ring_idx -= visited
+			if ring_idx:
+				visited.update(ring_idx)
+				idx = numpy.array(sorted(ring_idx), dtype=int)
+				dist = self.footprintDistance([x], [y], idx)[0]
+				if dist.min() < best_dist:
+					best_index = int(idx[dist.argmin()])
+					best_dist = float(dist.min())
+			#footprints outside the visited square are at least ring * cell_size away along an axis, i.e. ring * cell_size / sqrt(2) in their own frame
+			if best_dist <= ring * self.cell_size / math.sqrt(2.0):
+				break
+		return best_index, best_dist
+
+
+
+#the furniture indices of the last requests, so services asking about the same furnitures share the transformation and the grid
+furniture_index_cache = OrderedDict()
+furniture_index_cache_size = 8
+furniture_index_lock = threading.Lock()
+
+
+#furniture index of a furniture list from the database (SRSSpatialInfo). an index is only built once for the same furniture list.
+def furnitureIndex(spatial_info_list):
+	buff = StringIO()
+	for spatial_info in spatial_info_list:
+		spatial_info.serialize(buff)
+	key = hashlib.sha1(buff.getvalue()).hexdigest()
+	furniture_index_lock.acquire()
+	try:
+		if key in furniture_index_cache:
+			furniture_index = furniture_index_cache.pop(key)
+			furniture_index_cache[key] = furniture_index
+			return furniture_index
+	finally:
+		furniture_index_lock.release()
+
+	furniture_index = FurnitureIndex(grounding_geometry.furnitureGeometryList(spatial_info_list))
+	furniture_index_lock.acquire()
+	try:
+		furniture_index_cache[key] = furniture_index
+		while len(furniture_index_cache) > furniture_index_cache_size:
+			furniture_index_cache.popitem(last=False)
+	finally:
+		furniture_index_lock.release()
+	return furniture_index
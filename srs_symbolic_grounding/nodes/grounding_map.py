@@ -0,0 +1,133 @@
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Occupancy grid map cache of the symbol grounding servers. The map is fetched
+# once, refreshed from the map topic and turned into a wall clearance map.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+
+import threading
+import numpy
+from scipy import ndimage
+import rospy
+from nav_msgs.msg import OccupancyGrid
+from nav_msgs.srv import GetMap
+
+
+
+#keeps the occupancy grid map of a node. the map is read from the static_map service on the first request and replaced whenever a new map is published.
+#for every occupancy threshold a euclidean distance transform is calculated once, so the wall check of a pose is a single lookup.
+#with map_topic None no subscriber is created and the map has to be given with setMap (e.g. without a ros master).
+class MapCache(object):
+
+	def __init__(self, map_service='static_map', map_topic='map'):
+		self.map_service = map_service
+		self.lock = threading.Lock()
+		self.grid = None
+		self.occupancy = None
+		self.clearance = dict()
+		self.revision = 0
+		self.map_sub = None
+		if map_topic is not None:
+			self.map_sub = rospy.Subscriber(map_topic, OccupancyGrid, self.setMap)
+
+
+	#store a new map and drop the clearance maps calculated for the old one
+	def setMap(self, grid):
+		occupancy = numpy.asarray(grid.data, dtype=numpy.int16).reshape(grid.info.height, grid.info.width)
+		self.lock.acquire()
+		try:
+			self.grid = grid
+			self.occupancy = occupancy
+			self.clearance = dict()
+			self.revision += 1
+		finally:
+			self.lock.release()
+
+
+	#get the occupancy grid map, it is only requested from the navigation services if no map has been received yet
+	def getMap(self):
+		if self.grid is None:
+			rospy.wait_for_service(self.map_service)
+			try:
+				reqMap = rospy.ServiceProxy(self.map_service, GetMap)
+				res = reqMap()
+				self.setMap(res.map)
+			except rospy.ServiceException, e:
+				print "Service call failed: %s"%e
+		return self.grid
+
+
+	#distance in metres from every cell to the closest cell which is occupied (>= threshold) or unknown (-1). cells outside the map count as occupied.
+	def clearanceMap(self, threshold):
+		self.getMap()
+		self.lock.acquire()
+		try:
+			grid = self.grid
+			if threshold not in self.clearance:
+				free = numpy.zeros((self.occupancy.shape[0] + 2, self.occupancy.shape[1] + 2), dtype=bool)
+				free[1:-1, 1:-1] = (self.occupancy > -1) & (self.occupancy < threshold)
+				self.clearance[threshold] = (ndimage.distance_transform_edt(free)[1:-1, 1:-1] * grid.info.resolution).astype(numpy.float32)
+			clearance = self.clearance[threshold]
+		finally:
+			self.lock.release()
+		return grid, clearance
+
+
+	#clearance of each pose in metres, poses outside the map get 0
+	def poseClearance(self, pose_x, pose_y, threshold):
+		grid, clearance = self.clearanceMap(threshold)
+		col = numpy.floor((numpy.asarray(pose_x, dtype=float) - grid.info.origin.position.x) / grid.info.resolution).astype(int)
+		row = numpy.floor((numpy.asarray(pose_y, dtype=float) - grid.info.origin.position.y) / grid.info.resolution).astype(int)
+		inside = (col >= 0) & (col < clearance.shape[1]) & (row >= 0) & (row < clearance.shape[0])
+		pose_clearance = numpy.zeros(len(col), dtype=numpy.float32)
+		pose_clearance[inside] = clearance[row[inside], col[inside]]
+		return pose_clearance
+
+
+	#to check if the poses are too near to or blocked by the wall. a pose is valid when no occupied cell is closer than dist_to_walls.
+	def wallClearMask(self, pose_x, pose_y, dist_to_walls, threshold):
+		return self.poseClearance(pose_x, pose_y, threshold) >= dist_to_walls
@@ -0,0 +1,194 @@
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Scored search for grasp base poses. Candidates around the target obj are rated
+# by the fuzzy reach and the clearance, and refined from coarse to fine.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import math
+import numpy
+import grounding_geometry
+
+
+
+#predefined membership functions of the reach (same as the grasp base region server). x and y are sampled every 0.025m, th every degree.
+mf1_x = [0, 0.16, 0.33, 0.49, 0.67, 0.84, 1, 0.75, 0.5, 0.25, 0]
+mf1_y = [0, 0.16, 0.33, 0.49, 0.67, 0.84, 1, 0.875, 0.75, 0.625, 0.5, 0.375, 0.25, 0.125, 0]
+mf1_th = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0]
+mf1_x_grid = (numpy.arange(len(mf1_x)) - 6) * 0.025
+mf1_y_grid = (numpy.arange(len(mf1_y)) - 6) * 0.025
+mf1_th_grid = (numpy.arange(len(mf1_th)) - 10) * math.pi / 180.0
+
+
+
+def wrapAngle(th):
+	return (numpy.asarray(th, dtype=float) + math.pi) % (2.0 * math.pi) - math.pi
+
+
+#base poses at dist from the target obj in the direction angle. the robot grasps over its back, 0.1m beside its centre line, and is turned by heading.
+#with heading = 0 these are the poses of getRobotBasePoseList.
+def graspBasePoses(target_x, target_y, dist, angle, heading):
+	pose_x = target_x + dist * numpy.cos(angle) - 0.1 * numpy.sin(angle)
+	pose_y = target_y + dist * numpy.sin(angle) + 0.1 * numpy.cos(angle)
+	pose_th = wrapAngle(angle + heading)
+	return pose_x, pose_y, pose_th
+
+
+#fuzzy reach of the target obj from every base pose. the difference between the best gripper pose of the robot and the target obj is rated by
+#the membership functions and combined with the fuzzy rule reach = min(member_x, member_y, member_th). outside the hdz the reach is 0.
+def reachMembership(pose_x, pose_y, pose_th, target_x, target_y):
+	cos_th = numpy.cos(pose_th)
+	sin_th = numpy.sin(pose_th)
+	best_gripper_pose_x = pose_x - 0.8 * cos_th + 0.1 * sin_th
+	best_gripper_pose_y = pose_y - 0.8 * sin_th - 0.1 * cos_th
+	dx = target_x - best_gripper_pose_x
+	dy = target_y - best_gripper_pose_y
+	delta_x = dx * cos_th + dy * sin_th
+	delta_y = dy * cos_th - dx * sin_th
+	delta_th = numpy.abs(wrapAngle(pose_th - numpy.arctan2(pose_y - target_y, pose_x - target_x)))
+	member_x = numpy.interp(delta_x, mf1_x_grid, mf1_x)
+	member_y = numpy.interp(delta_y, mf1_y_grid, mf1_y)
+	member_th = numpy.interp(delta_th, mf1_th_grid, mf1_th)
+	reach = numpy.minimum(numpy.minimum(member_x, member_y), member_th)
+	reach[(delta_x > 0.1) | (delta_x < -0.15) | (delta_y > 0.15) | (delta_y < -0.1) | (delta_th > 10.0 / 180.0 * math.pi)] = 0.0
+	return reach
+
+
+#scores the grasp base poses around a target obj. poses which are too close to the walls, the parent obj or the furnitures are not valid.
+#the walls are checked first with the distance transform of the map, so the other checks only see the poses that are left.
+class GraspBasePoseScore(object):
+
+	def __init__(self, target_x, target_y, parent_obj, furniture_index, map_cache, dist_to_table=0.45, dist_to_obstacles=0.45, dist_to_walls=0.5, threshold=20, clearance_band=0.2, min_dist=0.40, hdz_size=0.05):
+		self.target_x = target_x
+		self.target_y = target_y
+		self.parent_obj = parent_obj #(x, y, th, w, l)
+		self.furniture_index = furniture_index
+		self.map_cache = map_cache
+		self.dist_to_table = dist_to_table
+		self.dist_to_obstacles = dist_to_obstacles
+		self.dist_to_walls = dist_to_walls
+		self.threshold = threshold
+		self.clearance_band = clearance_band #clearance above the minimum distances which counts as fully clear
+		self.min_dist = min_dist
+		self.hdz_size = hdz_size
+
+
+	#returns valid, score, reach and R of the poses. score = min(reach, clear), clear rises from 0 at the minimum distances to 1 at clearance_band beyond them.
+	def evaluate(self, pose_x, pose_y, pose_th):
+		score = numpy.zeros(len(pose_x))
+		reach = numpy.zeros(len(pose_x))
+		R = numpy.zeros(len(pose_x))
+
+		wall_clearance = self.map_cache.poseClearance(pose_x, pose_y, self.threshold)
+		valid = wall_clearance >= self.dist_to_walls
+		po_x, po_y, po_th, po_w, po_l = self.parent_obj
+		valid[valid] = grounding_geometry.parentObjClearMask(pose_x[valid], pose_y[valid], po_x, po_y, po_th, po_w, po_l, self.dist_to_table)
+		index = numpy.flatnonzero(valid)
+		if len(index) == 0:
+			return valid, score, reach, R
+
+		furniture_clearance = self.furniture_index.clearance(pose_x[index], pose_y[index], max(self.dist_to_obstacles + self.clearance_band, self.min_dist + self.hdz_size))
+		clear_index = furniture_clearance >= self.dist_to_obstacles
+		valid[index[~clear_index]] = False
+		index = index[clear_index]
+		furniture_clearance = furniture_clearance[clear_index]
+		if len(index) == 0:
+			return valid, score, reach, R
+
+		clear = numpy.minimum(furniture_clearance - self.dist_to_obstacles, wall_clearance[index] - self.dist_to_walls) / self.clearance_band
+		clear = numpy.clip(clear, 0.0, 1.0)
+		reach[index] = reachMembership(pose_x[index], pose_y[index], pose_th[index], self.target_x, self.target_y)
+		score[index] = numpy.minimum(reach[index], clear)
+		R[index] = numpy.minimum(furniture_clearance - self.min_dist, self.hdz_size)
+		return valid, score, reach, R
+
+
+#coarse to fine search over the distance, the angle around the target obj and the heading of the base pose.
+#the first level samples the whole circle, every following level samples the neighbourhood of the best poses found so far with half the step.
+#returns the top k valid poses as (pose_x, pose_y, pose_th, score, reach, R) arrays, best first.
+def searchGraspBasePoses(scorer, k=5, levels=3, seeds=8, dist_range=(0.6, 1.0), heading_range=10.0 / 180.0 * math.pi):
+	step_dist = 0.1
+	step_angle = 10.0 / 180.0 * math.pi
+	step_heading = heading_range
+	dist, angle, heading = numpy.meshgrid(numpy.linspace(dist_range[0], dist_range[1], 5)[1:-1], numpy.arange(0.0, 2.0 * math.pi, step_angle), numpy.array([-step_heading, 0.0, step_heading]))
+	dist = dist.ravel()
+	angle = angle.ravel()
+	heading = heading.ravel()
+
+	found = dict()
+	for level in range(levels):
+		pose_x, pose_y, pose_th = graspBasePoses(scorer.target_x, scorer.target_y, dist, angle, heading)
+		valid, score, reach, R = scorer.evaluate(pose_x, pose_y, pose_th)
+		for n in numpy.flatnonzero(valid):
+			#poses closer than 1mm / 0.1 degree are the same pose
+			key = (int(round(pose_x[n] * 1000)), int(round(pose_y[n] * 1000)), int(round(math.degrees(pose_th[n]) * 10)))
+			found[key] = (score[n], R[n], pose_x[n], pose_y[n], pose_th[n], reach[n], dist[n], angle[n], heading[n])
+		if level == levels - 1 or not found:
+			break
+
+		#refine around the best seeds
+		best = sorted(found.values(), reverse=True)[:seeds]
+		step_dist *= 0.5
+		step_angle *= 0.5
+		step_heading *= 0.5
+		offsets = numpy.array([(i, j, l) for i in (-1, 0, 1) for j in (-1, 0, 1) for l in (-1, 0, 1) if (i, j, l) != (0, 0, 0)], dtype=float)
+		seed = numpy.array([(b[6], b[7], b[8]) for b in best])
+		dist = (seed[:, 0][:, numpy.newaxis] + offsets[:, 0] * step_dist).ravel()
+		angle = (seed[:, 1][:, numpy.newaxis] + offsets[:, 1] * step_angle).ravel()
+		heading = (seed[:, 2][:, numpy.newaxis] + offsets[:, 2] * step_heading).ravel()
+		inside = (dist >= dist_range[0]) & (dist <= dist_range[1]) & (numpy.abs(heading) <= heading_range + 1e-9)
+		dist = dist[inside]
+		angle = angle[inside]
+		heading = heading[inside]
+
+	best = sorted(found.values(), reverse=True)[:k]
+	pose_x = numpy.array([b[2] for b in best])
+	pose_y = numpy.array([b[3] for b in best])
+	pose_th = numpy.array([b[4] for b in best])
+	score = numpy.array([b[0] for b in best])
+	reach = numpy.array([b[5] for b in best])
+	R = numpy.array([b[1] for b in best])
+	return pose_x, pose_y, pose_th, score, reach, R
@@ -0,0 +1,124 @@
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Scan tour of a room for the symbol grounding servers. Scan poses which see the
+# same part of a workspace are removed and the rest is ordered to keep the base travel short.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import math
+import numpy
+import grounding_search
+
+
+
+#point on the edge of the workspace which is seen from each scan pose. the robot scans over its back, view_dist behind its base.
+def viewPoints(pose_x, pose_y, pose_th, view_dist):
+	view_x = pose_x - view_dist * numpy.cos(pose_th)
+	view_y = pose_y - view_dist * numpy.sin(pose_th)
+	return view_x, view_y
+
+
+#indices of the scan poses which are kept, in the order of the poses. a pose is dropped when a pose kept before it sees the same part of a workspace:
+#their view points are closer than half of the larger detection width and they look in directions less than max_angle apart.
+def dedupeScanPoses(pose_x, pose_y, pose_th, scan_w, view_dist, max_angle=0.25 * math.pi):
+	view_x, view_y = viewPoints(pose_x, pose_y, pose_th, view_dist)
+	keep = list()
+	for n in range(len(pose_x)):
+		if keep:
+			kept = numpy.array(keep)
+			overlap = numpy.hypot(view_x[kept] - view_x[n], view_y[kept] - view_y[n]) < 0.5 * numpy.maximum(scan_w[kept], scan_w[n])
+			overlap &= numpy.abs(grounding_search.wrapAngle(pose_th[kept] - pose_th[n])) < max_angle
+			if overlap.any():
+				continue
+		keep.append(n)
+	return numpy.array(keep, dtype=int)
+
+
+#order of the scan poses which keeps the base travel short. the tour starts at the start pose and ends at the last scan pose.
+#it is built by nearest neighbour and improved with 2-opt moves (reversing a part of the tour) until no move makes it shorter.
+#returns the order as indices of the poses and the length of the tour.
+def planTour(start_x, start_y, pose_x, pose_y, max_passes=50):
+	num_poses = len(pose_x)
+	if num_poses == 0:
+		return numpy.zeros(0, dtype=int), 0.0
+
+	#node 0 is the start pose, node num_poses + 1 is the free end of the tour which is at distance 0 from all the others
+	point_x = numpy.concatenate(([start_x], pose_x))
+	point_y = numpy.concatenate(([start_y], pose_y))
+	dist = numpy.zeros((num_poses + 2, num_poses + 2))
+	dist[:-1, :-1] = numpy.hypot(point_x[:, numpy.newaxis] - point_x[numpy.newaxis, :], point_y[:, numpy.newaxis] - point_y[numpy.newaxis, :])
+
+	#nearest neighbour
+	tour = [0]
+	visited = numpy.zeros(num_poses + 1, dtype=bool)
+	visited[0] = True
+	for step in range(num_poses):
+		d = numpy.where(visited, numpy.inf, dist[tour[-1], :-1])
+		n = int(numpy.argmin(d))
+		tour.append(n)
+		visited[n] = True
+	tour.append(num_poses + 1)
+	tour = numpy.array(tour)
+
+	#2-opt. reversing tour[i..j] replaces the edges (a, b) and (c, d) by (a, c) and (b, d).
+	for n in range(max_passes):
+		improved = False
+		for i in range(1, num_poses):
+			j = numpy.arange(i + 1, num_poses + 1)
+			a = tour[i - 1]
+			b = tour[i]
+			c = tour[j]
+			d = tour[j + 1]
+			gain = dist[a, b] + dist[c, d] - dist[a, c] - dist[b, d]
+			best = int(numpy.argmax(gain))
+			if gain[best] > 1e-9:
+				tour[i:j[best] + 1] = tour[i:j[best] + 1][::-1].copy()
+				improved = True
+		if not improved:
+			break
+
+	tour_length = dist[tour[:-2], tour[1:-1]].sum()
+	return tour[1:-1] - 1, tour_length
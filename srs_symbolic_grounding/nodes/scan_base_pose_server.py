@@ -67,6 +67,9 @@ import rospy
 import math
 import tf
 from tf.transformations import euler_from_quaternion
+import grounding_geometry
+import grounding_index
+import grounding_map
 
 
 def getWorkspaceOnMap():
@@ -79,92 +82,27 @@ def getWorkspaceOnMap():
 		print "Service call failed: %s"%e
 
 
-def getMapClient(): #read map from navigation service
 
-	try:
-		reqMap = rospy.ServiceProxy('static_map', GetMap)	
-		res = reqMap()
-		return res
-	except rospy.ServiceException, e:
-		print "Service call failed: %s"%e
 
-
-
-def obstacleCheck(sbpl, fgl): 
-	obstacle_checked_scan_base_pose_list = list() #used to save obstacle checked poses
-	wall_checked_scan_base_pose_list = list() #used to save wall checked poses
-	all_checked_scan_base_pose_list = list()
+def obstacleCheck(sbpl, fgi): 
 	scan_base_pose_list = sbpl #read inputs
-	furniture_geometry_list = fgl
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(scan_base_pose_list)
 
 	#obstacle check
 	dist_to_obstacles = 0.5  #set the minimum distance to the household furnitures
-	#rospy.loginfo(math.atan(-0.5))
-	#check all of the poses from the scan pose list with all the household furnitures to find a obstacle free scan pose list. the poses will be stored in obstacle_checked_scan_base_pose_list.
-	index_1 = 0
-	while index_1 < len(scan_base_pose_list):
-		index_2 = 0
-		while index_2 < len(furniture_geometry_list):
-			th = math.atan((scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) / (scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x))
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y > furniture_geometry_list[index_2].pose.y:
-				th = math.pi + th
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y < furniture_geometry_list[index_2].pose.y:
-				th = -math.pi + th
-			delta_x = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(th - furniture_geometry_list[index_2].pose.theta)
-			delta_y = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(th - furniture_geometry_list[index_2].pose.theta)
-			if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + dist_to_obstacles) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + dist_to_obstacles)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + dist_to_obstacles) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + dist_to_obstacles)):
-				index_2 += 1
-			else:
-				break
-		if index_2 == len(furniture_geometry_list):
-			obstacle_checked_scan_base_pose_list.append(scan_base_pose_list[index_1])
-		index_1 += 1
-	#rospy.loginfo(obstacle_checked_scan_base_pose_list)
-
-	if obstacle_checked_scan_base_pose_list: #check if there is a obstacle free pose in the list.
+	#check all of the poses from the scan pose list with all the household furnitures at once to find the obstacle free poses.
+	valid = fgi.clearMask(pose_x, pose_y, dist_to_obstacles)
+
+	if valid.any(): #check if there is a obstacle free pose in the list.
 			
 		#wall check
-		data = getMapClient() #get occupancy grid map from the navigation serves 
-
-		
 		dist_to_walls = 0.5 #set the minimum distance to the walls
 		threshold = 10.0 #set the threshold to decide if a pose is occupaied. >threshold:occupied.
-		step_angle = 5.0 #set the step angle for putting points around the robot for the wall check (360 / step_angle points will be used)
-
-		#check all of the poses from the obstacle_checked_scan_base_pose_list with the occupancy map to find a wall free scan pose list
-		index_3 = 0
-		while index_3 < len(obstacle_checked_scan_base_pose_list):
-			map_index_list = list()
-			n = 0
-			while n < int(360.0 / step_angle):
-				wall_check_point_x = obstacle_checked_scan_base_pose_list[index_3].x + dist_to_walls * math.cos(n * step_angle / 180.0 * math.pi)
-				wall_check_point_y = obstacle_checked_scan_base_pose_list[index_3].y + dist_to_walls * math.sin(n * step_angle / 180.0 * math.pi)
-				
-				#rospy.loginfo([wall_check_point_x, wall_check_point_y])
-
-				map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-				map_index_list.append(map_index)
-				n += 1
-				
-			map_index = int((obstacle_checked_scan_base_pose_list[index_3].y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((obstacle_checked_scan_base_pose_list[index_3].x - data.map.info.origin.position.x) / data.map.info.resolution)
-			map_index_list.append(map_index)
-			#rospy.loginfo(map_index_list)
-
-			index_4 = 0
-			while index_4 < len(map_index_list):
-				#rospy.loginfo(data.map.data[map_index_list[index_4]])
-				if -1 < data.map.data[map_index_list[index_4]] < threshold:
-					index_4 += 1
-				else:
-					break
-			if index_4 == len(map_index_list):
-				wall_checked_scan_base_pose_list.append(obstacle_checked_scan_base_pose_list[index_3])
-			index_3 += 1
-	
-	return 	wall_checked_scan_base_pose_list			
-	#rospy.loginfo(wall_checked_scan_base_pose_list)
 
+		#check the obstacle free poses with the occupancy map to find a wall free scan pose list
+		valid[valid] = map_cache.wallClearMask(pose_x[valid], pose_y[valid], dist_to_walls, threshold)
 
+	return grounding_geometry.filterPoseList(scan_base_pose_list, valid)
 
 #calculate scan base poses
 def handle_scan_base_pose(req):
@@ -194,6 +132,7 @@ def handle_scan_base_pose(req):
 		furniture_geometry.h = furniture_geometry_list[index].h
 		furniture_geometry_list.append(furniture_geometry)
 		index += 1
+	furniture_index = grounding_index.FurnitureIndex(furniture_geometry_list)
 
 
 	
@@ -376,10 +315,10 @@ def handle_scan_base_pose(req):
 	#rospy.loginfo(scan_base_pose_list_4)
 	
 	#obstacle check
-	obstacle_checked_scan_base_pose_list_1 = obstacleCheck(scan_base_pose_list_1, furniture_geometry_list)
-	obstacle_checked_scan_base_pose_list_2 = obstacleCheck(scan_base_pose_list_2, furniture_geometry_list)
-	obstacle_checked_scan_base_pose_list_3 = obstacleCheck(scan_base_pose_list_3, furniture_geometry_list)
-	obstacle_checked_scan_base_pose_list_4 = obstacleCheck(scan_base_pose_list_4, furniture_geometry_list)
+	obstacle_checked_scan_base_pose_list_1 = obstacleCheck(scan_base_pose_list_1, furniture_index)
+	obstacle_checked_scan_base_pose_list_2 = obstacleCheck(scan_base_pose_list_2, furniture_index)
+	obstacle_checked_scan_base_pose_list_3 = obstacleCheck(scan_base_pose_list_3, furniture_index)
+	obstacle_checked_scan_base_pose_list_4 = obstacleCheck(scan_base_pose_list_4, furniture_index)
 
 
 
@@ -417,7 +356,9 @@ def handle_scan_base_pose(req):
 
 
 def scan_base_pose_server():
+	global map_cache
 	rospy.init_node('scan_base_pose_server')
+	map_cache = grounding_map.MapCache()
 	s = rospy.Service('scan_base_pose', ScanBasePose, handle_scan_base_pose)
 	print "Ready to receive requests."
 	rospy.spin()
@@ -67,110 +67,67 @@ import rospy
 import math
 import tf
 from tf.transformations import euler_from_quaternion
+import grounding_geometry
+import grounding_index
+import grounding_map
 
 
 
-
-def getMapClient(): #read map from navigation service
-
-	try:
-		reqMap = rospy.ServiceProxy('static_map', GetMap)	
-		res = reqMap()
-		return res
-	except rospy.ServiceException, e:
-		print "Service call failed: %s"%e
-
-
-
-def obstacleCheck(dbp, fgl): 
+#returns the deliver base pose when it is clear of the furnitures and the walls, None otherwise
+def obstacleCheck(dbp, fgi): 
 	deliver_base_pose = dbp
-	furniture_geometry_list = fgl
-	obstacle_checked_deliver_base_pose = Pose2D()
-	wall_checked_deliver_base_pose = Pose2D()
+	wall_checked_deliver_base_pose = None
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays([deliver_base_pose])
 
 	#obstacle check
 	dist_to_obstacles = 0.4  #set the minimum distance to the household furnitures
-	index = 0
-	while index < len(furniture_geometry_list):
-		th = math.atan((deliver_base_pose.y - furniture_geometry_list[index].pose.y) / (deliver_base_pose.x - furniture_geometry_list[index].pose.x))
-		if deliver_base_pose.x < furniture_geometry_list[index].pose.x and deliver_base_pose.y > furniture_geometry_list[index].pose.y:
-			th = math.pi + th
-		if deliver_base_pose.x < furniture_geometry_list[index].pose.x and deliver_base_pose.y < furniture_geometry_list[index].pose.y:
-			th = -math.pi + th
-		dist = math.sqrt((deliver_base_pose.x - furniture_geometry_list[index].pose.x) ** 2 + (deliver_base_pose.y - furniture_geometry_list[index].pose.y) ** 2)
-		delta_x = dist * math.cos(th - furniture_geometry_list[index].pose.theta)
-		delta_y = dist * math.sin(th - furniture_geometry_list[index].pose.theta)
-		if (delta_x <= -(furniture_geometry_list[index].w / 2.0 + dist_to_obstacles) or delta_x >= (furniture_geometry_list[index].w / 2.0 + dist_to_obstacles)) or (delta_y <= -(furniture_geometry_list[index].l / 2.0 + dist_to_obstacles) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + dist_to_obstacles)):
-			index += 1
-		else:
-			break
-	if index == len(furniture_geometry_list):
-		obstacle_checked_deliver_base_pose = deliver_base_pose
+	valid = fgi.clearMask(pose_x, pose_y, dist_to_obstacles)
 		
-	print obstacle_checked_deliver_base_pose
-	if obstacle_checked_deliver_base_pose: #check if there is a obstacle free pose.
+	if valid.any(): #check if there is a obstacle free pose.
 			
 		#wall check
-		data = getMapClient() #get occupancy grid map from the navigation serves 	
 		dist_to_walls = 0.5 #set the minimum distance to the walls
 		threshold = 10.0 #set the threshold to decide if a pose is occupaied. >threshold:occupied.
-		step_angle = 10.0 #set the step angle for putting points around the robot for the wall check (360 / step_angle points will be used)
-		map_index_list = list()
-
-		n = 0
-		while n < int(360.0 / step_angle):
-			wall_check_point_x = obstacle_checked_deliver_base_pose.x + dist_to_walls * math.cos(n * step_angle / 180.0 * math.pi)
-			wall_check_point_y = obstacle_checked_deliver_base_pose.y + dist_to_walls * math.sin(n * step_angle / 180.0 * math.pi)	
-			map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-			map_index_list.append(map_index)
-			n += 1
-				
-		map_index = int((obstacle_checked_deliver_base_pose.y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((obstacle_checked_deliver_base_pose.x - data.map.info.origin.position.x) / data.map.info.resolution)
-		map_index_list.append(map_index)
-
-		index = 0
-		while index < len(map_index_list):
-			print data.map.data[map_index_list[index]]
-			if -1 < data.map.data[map_index_list[index]] < threshold:
-				index += 1
-			else:
-				break
-		print index
-		if index == len(map_index_list):
-			wall_checked_deliver_base_pose = obstacle_checked_deliver_base_pose
+		if map_cache.wallClearMask(pose_x, pose_y, dist_to_walls, threshold).all():
+			wall_checked_deliver_base_pose = deliver_base_pose
 		
 	return 	wall_checked_deliver_base_pose			
 
-
-
-
-#calculate deliver base region
-def handle_symbol_grounding_deliver_base_region(req):
+#get the robot's current pose from tf
+def getRobotPose():
+	rb_pose = Pose2D()
+	listener = tf.TransformListener()
+	listener.waitForTransform("/map", "/base_link", rospy.Time(0), rospy.Duration(4.0)) #wait for 4secs for the coordinate to be transformed
+	(trans,rot) = listener.lookupTransform("/map", "/base_link", rospy.Time(0))
+	rb_pose.x = trans[0]
+	rb_pose.y = trans[1]
+	rb_pose_rpy = tf.transformations.euler_from_quaternion(rot)
+	rb_pose.theta = rb_pose_rpy[2]
+	rospy.sleep(0.5)
+	return rb_pose
+
+#a getter of the robot's pose which asks tf on its first call only, so tf is only used when a request needs the robot pose
+def lazyRobotPose():
+	rb_pose = list()
+	def get():
+		if not rb_pose:
+			rb_pose.append(getRobotPose())
+		return rb_pose[0]
+	return get
+
+#calculate deliver base region of one parent obj. the furniture index and the robot pose getter are shared by all the parent objs of a request.
+#the robot pose is only needed to choose between two valid deliver base poses.
+def groundDeliverBaseRegion(parent_obj_geometry, furniture_index, get_rb_pose):
 
 
 	#transform from knowledge base data to function useable data  	
-	parent_obj_x = req.parent_obj_geometry.pose.position.x
-	parent_obj_y = req.parent_obj_geometry.pose.position.y
-	parent_obj_rpy = tf.transformations.euler_from_quaternion([req.parent_obj_geometry.pose.orientation.x, req.parent_obj_geometry.pose.orientation.y, req.parent_obj_geometry.pose.orientation.z, req.parent_obj_geometry.pose.orientation.w])
+	parent_obj_x = parent_obj_geometry.pose.position.x
+	parent_obj_y = parent_obj_geometry.pose.position.y
+	parent_obj_rpy = tf.transformations.euler_from_quaternion([parent_obj_geometry.pose.orientation.x, parent_obj_geometry.pose.orientation.y, parent_obj_geometry.pose.orientation.z, parent_obj_geometry.pose.orientation.w])
 	parent_obj_th = parent_obj_rpy[2]
-	parent_obj_l = req.parent_obj_geometry.l
-	parent_obj_w = req.parent_obj_geometry.w
-	parent_obj_h = req.parent_obj_geometry.h
-	
-	#transfrom furniture geometry list
-	index = 0
-	furniture_geometry_list = list()
-	while index < len(req.furniture_geometry_list):
-		furniture_geometry = FurnitureGeometry()
-		furniture_geometry.pose.x = req.furniture_geometry_list[index].pose.position.x
-		furniture_geometry.pose.y = req.furniture_geometry_list[index].pose.position.y
-		furniture_pose_rpy = tf.transformations.euler_from_quaternion([req.furniture_geometry_list[index].pose.orientation.x, req.furniture_geometry_list[index].pose.orientation.y, req.furniture_geometry_list[index].pose.orientation.z, req.furniture_geometry_list[index].pose.orientation.w])		
-		furniture_geometry.pose.theta = furniture_pose_rpy[2]
-		furniture_geometry.l = req.furniture_geometry_list[index].l
-		furniture_geometry.w = req.furniture_geometry_list[index].w
-		furniture_geometry.h = req.furniture_geometry_list[index].h
-		furniture_geometry_list.append(furniture_geometry)
-		index += 1
+	parent_obj_l = parent_obj_geometry.l
+	parent_obj_w = parent_obj_geometry.w
+	parent_obj_h = parent_obj_geometry.h
 	
 	#variable structure define
 	deliver_base_pose = Pose2D()
@@ -202,23 +159,13 @@ def handle_symbol_grounding_deliver_base_region(req):
 		deliver_base_pose_2.theta += 2.0 * math.pi
 	
 	#obstacle check
-	obstacle_checked_deliver_base_pose_1 = obstacleCheck(deliver_base_pose_1, furniture_geometry_list)
-	obstacle_checked_deliver_base_pose_2 = obstacleCheck(deliver_base_pose_2, furniture_geometry_list)
+	obstacle_checked_deliver_base_pose_1 = obstacleCheck(deliver_base_pose_1, furniture_index)
+	obstacle_checked_deliver_base_pose_2 = obstacleCheck(deliver_base_pose_2, furniture_index)
 
 	#choose deliver base pose
 	if obstacle_checked_deliver_base_pose_1 and obstacle_checked_deliver_base_pose_2:
 
-		#get the robot's current pose from tf
-		rb_pose = Pose2D()
-		listener = tf.TransformListener()
-		listener.waitForTransform("/map", "/base_link", rospy.Time(0), rospy.Duration(4.0)) #wait for 4secs for the coordinate to be transformed
-		(trans,rot) = listener.lookupTransform("/map", "/base_link", rospy.Time(0))
-		rb_pose.x = trans[0]
-		rb_pose.y = trans[1]
-		rb_pose_rpy = tf.transformations.euler_from_quaternion(rot)
-		rb_pose.theta = rb_pose_rpy[2]
-		rospy.sleep(0.5)
-		
+		rb_pose = get_rb_pose()
 		dist_1 = (rb_pose.x - obstacle_checked_deliver_base_pose_1.x) ** 2 + (rb_pose.y - obstacle_checked_deliver_base_pose_1.y) ** 2
 		dist_2 = (rb_pose.x - obstacle_checked_deliver_base_pose_2.x) ** 2 + (rb_pose.y - obstacle_checked_deliver_base_pose_2.y) ** 2
 		if dist_1 > dist_2:
@@ -238,31 +185,37 @@ def handle_symbol_grounding_deliver_base_region(req):
 		#calculate R
 		min_dist = 0.40 #set the minimum distance to obstacles
 		deliver_region_size = 0.1
-		dist_list = list()
-		index = 0
-		while index < len(furniture_geometry_list):
-			th = math.atan((deliver_base_pose.y - furniture_geometry_list[index].pose.y) / (deliver_base_pose.x - furniture_geometry_list[index].pose.x))
-			if deliver_base_pose.x < furniture_geometry_list[index].pose.x and deliver_base_pose.y > furniture_geometry_list[index].pose.y:
-				th = math.pi + th
-			if deliver_base_pose.x < furniture_geometry_list[index].pose.x and deliver_base_pose.y < furniture_geometry_list[index].pose.y:
-				th = -math.pi + th
-			d = math.sqrt((deliver_base_pose.x - furniture_geometry_list[index].pose.x) ** 2 + (deliver_base_pose.y - furniture_geometry_list[index].pose.y) ** 2)
-			delta_x = d * math.cos(th - furniture_geometry_list[index].pose.theta)
-			delta_y = d * math.sin(th - furniture_geometry_list[index].pose.theta)
-			delta_x = abs(delta_x)
-			delta_y = abs(delta_y)
-			dist = max((delta_x - furniture_geometry_list[index].w / 2.0), (delta_y - furniture_geometry_list[index].l / 2.0))
-			dist_list.append(dist)
-			index += 1
-		R = min(min(dist_list) - min_dist, deliver_region_size)
+		#only the furnitures closer than min_dist + deliver_region_size can make R smaller than deliver_region_size
+		R = min(furniture_index.clearance([deliver_base_pose.x], [deliver_base_pose.y], min_dist + deliver_region_size)[0] - min_dist, deliver_region_size)
 
 	return deliver_base_pose, R
 
 
+def handle_symbol_grounding_deliver_base_region(req):
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+	return groundDeliverBaseRegion(req.parent_obj_geometry, furniture_index, lazyRobotPose())
+
+
+#calculate deliver base regions for a batch of parent objs. the furniture index is built once and the robot pose is looked up at most once for the whole batch.
+def handle_symbol_grounding_deliver_base_region_batch(req):
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+	deliver_base_pose_list = list()
+	R_list = list()
+	get_rb_pose = lazyRobotPose()
+	for parent_obj_geometry in req.parent_obj_geometry_list:
+		(deliver_base_pose, R) = groundDeliverBaseRegion(parent_obj_geometry, furniture_index, get_rb_pose)
+		deliver_base_pose_list.append(deliver_base_pose)
+		R_list.append(R)
+	return deliver_base_pose_list, R_list
+
+
 
 def symbol_grounding_deliver_base_region_server():
+	global map_cache
 	rospy.init_node('symbol_grounding_deliver_base_region_server')
+	map_cache = grounding_map.MapCache()
 	s = rospy.Service('symbol_grounding_deliver_base_region', SymbolGroundingDeliverBaseRegion, handle_symbol_grounding_deliver_base_region)
+	s_batch = rospy.Service('symbol_grounding_deliver_base_region_batch', SymbolGroundingDeliverBaseRegionBatch, handle_symbol_grounding_deliver_base_region_batch)
 	print "Ready to receive requests."
 	rospy.spin()
 
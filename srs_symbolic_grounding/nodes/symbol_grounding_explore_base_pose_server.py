@@ -57,13 +57,16 @@
 import roslib; roslib.load_manifest('srs_symbolic_grounding')
 
 from srs_symbolic_grounding.srv import SymbolGroundingExploreBasePose
-#from srs_symbolic_grounding.msg import *
+from srs_symbolic_grounding.msg import *
 from std_msgs.msg import *
 from geometry_msgs.msg import *
 import rospy
 import math
 import tf
 from tf.transformations import euler_from_quaternion
+import grounding_geometry
+import grounding_index
+import grounding_cache
 '''
 def getWorkspaceOnMap():
 	print 'test get all workspace (furnitures basically here) from map'
@@ -75,7 +78,16 @@ def getWorkspaceOnMap():
 		print "Service call failed: %s"%e
 '''
 
-def handle_symbol_grounding_explore_base_pose(req):
+#check the explore poses with all the household furnitures at once, the valid poses are returned.
+def obstacleCheck(ebpl, fgi):
+	explore_base_pose_list = ebpl
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(explore_base_pose_list)
+	dist_to_obstacles = 0.5 #set the minimum distance to the household furnitures
+	valid = fgi.clearMask(pose_x, pose_y, dist_to_obstacles)
+	return grounding_geometry.filterPoseList(explore_base_pose_list, valid)
+
+
+def groundExploreBasePose(req):
 	
 	parent_obj_x = req.parent_obj_geometry.pose.position.x
 	parent_obj_y = req.parent_obj_geometry.pose.position.y
@@ -109,20 +121,8 @@ def handle_symbol_grounding_explore_base_pose(req):
 		furniture_geometry_list.append(furniture_geometry)
 		index += 1
 	'''
-	#transfrom list
-	index = 0
-	furniture_geometry_list = list()
-	while index < len(req.furniture_geometry_list):
-		furniture_geometry = FurnitureGeometry()
-		furniture_geometry.pose.x = req.furniture_geometry_list[index].pose.position.x
-		furniture_geometry.pose.y = req.furniture_geometry_list[index].pose.position.y
-		furniture_pose_rpy = tf.transformations.euler_from_quaternion([req.furniture_geometry_list[index].pose.orientation.x, req.furniture_geometry_list[index].pose.orientation.y, req.furniture_geometry_list[index].pose.orientation.z, req.furniture_geometry_list[index].pose.orientation.w])		
-		furniture_geometry.pose.theta = furniture_pose_rpy[2]
-		furniture_geometry.l = req.furniture_geometry_list[index].l
-		furniture_geometry.w = req.furniture_geometry_list[index].w
-		furniture_geometry.h = req.furniture_geometry_list[index].h
-		furniture_geometry_list.append(furniture_geometry)
-		index += 1
+	#transfrom furniture geometry data from database, the index is shared with the other grounding services
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
 	
 
 	#get rb_distance 
@@ -184,20 +184,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_1):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_1[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_1[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_1[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_1[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_1.append(wall_checked_explore_base_pose_list_1[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_1 = obstacleCheck(wall_checked_explore_base_pose_list_1, furniture_index)
 	
 				
 		for num in range(int((parent_obj_l / detection_w) + 0.99)):
@@ -218,20 +205,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_2):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_2[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_2[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_2[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_2[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_2[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_2.append(wall_checked_explore_base_pose_list_2[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_2 = obstacleCheck(wall_checked_explore_base_pose_list_2, furniture_index)
 
 		for num in range(int((parent_obj_w / detection_w) + 0.99)):
 
@@ -252,20 +226,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_3):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_3[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_3[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_3[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_3[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_3[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_3[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_3.append(wall_checked_explore_base_pose_list_3[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_3 = obstacleCheck(wall_checked_explore_base_pose_list_3, furniture_index)
 				
 		for num in range(int((parent_obj_w / detection_w) + 0.99)):
 			explore_base_pose_4 = Pose2D()
@@ -285,20 +246,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_4):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_4[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_4[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_4[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_4[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_4[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_4.append(wall_checked_explore_base_pose_list_4[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_4 = obstacleCheck(wall_checked_explore_base_pose_list_4, furniture_index)
 
 	else:
 
@@ -321,20 +269,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_1):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_1[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_1[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_1[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_1[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_1.append(wall_checked_explore_base_pose_list_1[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_1 = obstacleCheck(wall_checked_explore_base_pose_list_1, furniture_index)
 	
 				
 		for num in range(int((parent_obj_w / detection_w) + 0.99)):
@@ -355,20 +290,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_2):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_2[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_2[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_2[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_2[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_2[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_2.append(wall_checked_explore_base_pose_list_2[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_2 = obstacleCheck(wall_checked_explore_base_pose_list_2, furniture_index)
 
 		for num in range(int((parent_obj_l / detection_w) + 0.99)):
 
@@ -389,20 +311,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_3):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_3[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_3[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_3[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_3[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_3[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_3[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_3.append(wall_checked_explore_base_pose_list_3[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_3 = obstacleCheck(wall_checked_explore_base_pose_list_3, furniture_index)
 				
 		for num in range(int((parent_obj_l / detection_w) + 0.99)):
 			explore_base_pose_4 = Pose2D()
@@ -422,20 +331,7 @@ def handle_symbol_grounding_explore_base_pose(req):
 			index += 1
 		
 	
-		else:
-			index_1 = 0
-			while index_1 < len(wall_checked_explore_base_pose_list_4):
-				index_2 = 0
-				while index_2 < len(furniture_geometry_list):
-					delta_x = math.sqrt((wall_checked_explore_base_pose_list_4[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_4[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(wall_checked_explore_base_pose_list_1[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					delta_y = math.sqrt((wall_checked_explore_base_pose_list_4[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (wall_checked_explore_base_pose_list_4[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(wall_checked_explore_base_pose_list_4[index_1].theta - furniture_geometry_list[index_2].pose.theta)
-					if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + 0.5) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + 0.5)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + 0.5) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + 0.5)):
-						index_2 += 1
-					else:
-						index_1 += 1
-						break
-				obstacle_checked_explore_base_pose_list_4.append(wall_checked_explore_base_pose_list_4[index_1])
-				index_1 += 1
+		obstacle_checked_explore_base_pose_list_4 = obstacleCheck(wall_checked_explore_base_pose_list_4, furniture_index)
 
 	rospy.loginfo([obstacle_checked_explore_base_pose_list_1, obstacle_checked_explore_base_pose_list_2, obstacle_checked_explore_base_pose_list_3, obstacle_checked_explore_base_pose_list_4])
 	max_len = max(len(obstacle_checked_explore_base_pose_list_1), len(obstacle_checked_explore_base_pose_list_2), len(obstacle_checked_explore_base_pose_list_3), len(obstacle_checked_explore_base_pose_list_4))
@@ -459,9 +355,23 @@ def handle_symbol_grounding_explore_base_pose(req):
 		return explore_base_pose_list
 
 
+#the answer is taken from the result cache if the same parent obj and furniture list have been grounded on the current map
+def handle_symbol_grounding_explore_base_pose(req):
+	key = result_cache.key(req.parent_obj_geometry, req.furniture_geometry_list)
+	explore_base_pose_list = result_cache.get(key)
+	if explore_base_pose_list is None:
+		explore_base_pose_list = groundExploreBasePose(req)
+		if explore_base_pose_list is not None:
+			result_cache.put(key, explore_base_pose_list)
+	return explore_base_pose_list
+
+
 
 def symbol_grounding_explore_base_pose_server():
+	global result_cache
 	rospy.init_node('symbol_grounding_explore_base_pose_server')
+	result_cache = grounding_cache.GroundingCache('explore_base_pose')
+	rospy.on_shutdown(result_cache.logStats)
 	s = rospy.Service('symbol_grounding_explore_base_pose', SymbolGroundingExploreBasePose, handle_symbol_grounding_explore_base_pose)
 	print "Ready to receive requests."
 	rospy.spin()
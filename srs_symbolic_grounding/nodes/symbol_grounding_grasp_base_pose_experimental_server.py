@@ -70,6 +70,9 @@ import rospy
 import math
 import tf
 from tf.transformations import euler_from_quaternion
+import grounding_geometry
+import grounding_index
+import grounding_map
 #import csv
 
 
@@ -86,16 +89,6 @@ def getWorkspaceOnMap():
 		print "Service call failed: %s"%e
 '''
 
-#get the occupancy grid map from the navigation services
-def getMapClient():
-
-	try:
-		reqMap = rospy.ServiceProxy('static_map', GetMap)	
-		res = reqMap()
-		return res
-	except rospy.ServiceException, e:
-		print "Service call failed: %s"%e
-
 #this function is used to calculate a list of canidate poses around the target obj. the number of candidate poses is 360/step_angle
 def getRobotBasePoseList(angle, dist, rbp, obj_x, obj_y):
 	grasp_base_pose_list = list()
@@ -124,102 +117,34 @@ def getRobotBasePoseList(angle, dist, rbp, obj_x, obj_y):
 
 	
 #function for checking if a pose is obstacle free.
-def obstacleCheck(gbpl, po_x, po_y, po_th, po_w, po_l, fgl, to_h):
-	parent_obj_checked_grasp_base_pose_list = list()
-	obstacle_checked_grasp_base_pose_list = list()
-	wall_checked_grasp_base_pose_list = list()
+def obstacleCheck(gbpl, po_x, po_y, po_th, po_w, po_l, fgi, to_h):
 	grasp_base_pose_list = gbpl
-	parent_obj_x = po_x
-	parent_obj_y = po_y
-	parent_obj_th = po_th
-	parent_obj_w = po_w
-	parent_obj_l = po_l
-	furniture_geometry_list = fgl
 	target_obj_h = to_h
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(grasp_base_pose_list)
 	
-	#to check if a pose is too close to the edge of the parent obj. the valid poses will be stored in the parent_obj_checked_grasp_base_pose_list.
+	#to check if a pose is too close to the edge of the parent obj.
 	dist_to_table = 0.6 #minimum distance to the edge of the parent obj
 	print target_obj_h
 	if target_obj_h > 1.2 or target_obj_h < 0.85:
 		dist_to_table -= 0.05	
-	index_1 = 0
-	while index_1 < len(grasp_base_pose_list):
-		th = math.atan((grasp_base_pose_list[index_1].y - parent_obj_y) / (grasp_base_pose_list[index_1].x - parent_obj_x))
-		if grasp_base_pose_list[index_1].x < parent_obj_x and grasp_base_pose_list[index_1].y > parent_obj_y:
-			th = math.pi + th
-		if grasp_base_pose_list[index_1].x < parent_obj_x and grasp_base_pose_list[index_1].y < parent_obj_y:
-			th = -math.pi + th
-		delta_x = math.sqrt((grasp_base_pose_list[index_1].x - parent_obj_x) ** 2 + (grasp_base_pose_list[index_1].y - parent_obj_y) ** 2) * math.cos(th - parent_obj_th)
-		delta_y = math.sqrt((grasp_base_pose_list[index_1].x - parent_obj_x) ** 2 + (grasp_base_pose_list[index_1].y - parent_obj_y) ** 2) * math.sin(th - parent_obj_th)
-		#rospy.loginfo([delta_x, delta_y])
-		if (delta_x <= -(parent_obj_w / 2.0 + dist_to_table) or delta_x >= (parent_obj_w / 2.0 + dist_to_table)) or (delta_y <= -(parent_obj_l / 2.0 + dist_to_table) or delta_y >= (parent_obj_l / 2.0 + dist_to_table)):
-			parent_obj_checked_grasp_base_pose_list.append(grasp_base_pose_list[index_1])
-		index_1 += 1
-	#rospy.loginfo(parent_obj_checked_grasp_base_pose_list)
+	valid = grounding_geometry.parentObjClearMask(pose_x, pose_y, po_x, po_y, po_th, po_w, po_l, dist_to_table)
 	
-		
-	if parent_obj_checked_grasp_base_pose_list: #if there is a parent obj free pose
+	if valid.any(): #if there is a parent obj free pose
 		
 		#to check if a pose is too close to or blocked by the furnitures in the room 
 		dist_to_obstacles = 0.6 #minimum disatnce to the furnitures in the room
 		if target_obj_h > 1.2 or target_obj_h < 0.85:
 			dist_to_obstacles -= 0.05
-		index_2 = 0
-		while index_2 < len(parent_obj_checked_grasp_base_pose_list):
-			index_3 = 0
-			while index_3 < len(furniture_geometry_list):
-				th = math.atan((parent_obj_checked_grasp_base_pose_list[index_2].y - furniture_geometry_list[index_3].pose.y) / (parent_obj_checked_grasp_base_pose_list[index_2].x - furniture_geometry_list[index_3].pose.x))
-				if parent_obj_checked_grasp_base_pose_list[index_2].x < furniture_geometry_list[index_3].pose.x and parent_obj_checked_grasp_base_pose_list[index_2].y > furniture_geometry_list[index_3].pose.y:
-					th = math.pi + th
-				if parent_obj_checked_grasp_base_pose_list[index_2].x < furniture_geometry_list[index_3].pose.x and parent_obj_checked_grasp_base_pose_list[index_2].y < furniture_geometry_list[index_3].pose.y:
-					th = -math.pi + th
-				delta_x = math.sqrt((parent_obj_checked_grasp_base_pose_list[index_2].x - furniture_geometry_list[index_3].pose.x) ** 2 + (parent_obj_checked_grasp_base_pose_list[index_2].y - furniture_geometry_list[index_3].pose.y) ** 2) * math.cos(th - furniture_geometry_list[index_3].pose.theta)
-				delta_y = math.sqrt((parent_obj_checked_grasp_base_pose_list[index_2].x - furniture_geometry_list[index_3].pose.x) ** 2 + (parent_obj_checked_grasp_base_pose_list[index_2].y - furniture_geometry_list[index_3].pose.y) ** 2) * math.sin(th - furniture_geometry_list[index_3].pose.theta)
-				if (delta_x <= -(furniture_geometry_list[index_3].w / 2.0 + dist_to_obstacles) or delta_x >= (furniture_geometry_list[index_3].w / 2.0 + dist_to_obstacles)) or (delta_y <= -(furniture_geometry_list[index_3].l / 2.0 + dist_to_obstacles) or delta_y >= (furniture_geometry_list[index_3].l / 2.0 + dist_to_obstacles)):
-					index_3 += 1
-				else:
-					break
-			if index_3 == len(furniture_geometry_list):
-				obstacle_checked_grasp_base_pose_list.append(parent_obj_checked_grasp_base_pose_list[index_2])
-			index_2 += 1
-		#rospy.loginfo(obstacle_checked_grasp_base_pose_list)
-
-		if obstacle_checked_grasp_base_pose_list: 
+		valid &= fgi.clearMask(pose_x, pose_y, dist_to_obstacles)
+
+		if valid.any(): 
 			
 			#to check if a pose is too near to or blocked by the wall
-			data = getMapClient() #get occupancy grid map
-			#rospy.loginfo(data.map.info)
 			dist_to_walls = 0.5 #set the minimum distance to the walls
 			threshold = 20 #>20:occupied
-			step_angle = 5.0 #(360 / step_angle) points will be put around the robot for the wall check
-
-			index_4 = 0
-			while index_4 < len(obstacle_checked_grasp_base_pose_list):
-				map_index_list = list()
-				n = 0
-				while n < int(360.0 / step_angle):
-					wall_check_point_x = obstacle_checked_grasp_base_pose_list[index_4].x + dist_to_walls * math.cos(n * step_angle / 180.0 * math.pi)
-					wall_check_point_y = obstacle_checked_grasp_base_pose_list[index_4].y + dist_to_walls * math.sin(n * step_angle / 180.0 * math.pi)
-					map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-					map_index_list.append(map_index)
-					n += 1
-				
-				map_index = int((obstacle_checked_grasp_base_pose_list[index_4].y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((obstacle_checked_grasp_base_pose_list[index_4].x - data.map.info.origin.position.x) / data.map.info.resolution)
-				map_index_list.append(map_index - 1)
-				#rospy.loginfo(map_index_list)
-
-				index_5 = 0
-				while index_5 < len(map_index_list):
-					if -1 < data.map.data[map_index_list[index_5]] < threshold:
-						index_5 += 1
-					else:
-						break
-				if index_5 == len(map_index_list):
-					wall_checked_grasp_base_pose_list.append(obstacle_checked_grasp_base_pose_list[index_4])
-				index_4 += 1
+			valid[valid] = map_cache.wallClearMask(pose_x[valid], pose_y[valid], dist_to_walls, threshold)
 	
-	return 	wall_checked_grasp_base_pose_list 			
-	#rospy.loginfo(wall_checked_grasp_base_pose_list)
+	return grounding_geometry.filterPoseList(grasp_base_pose_list, valid)
 	
 
 def handle_symbol_grounding_grasp_base_pose_experimental(req):
@@ -304,20 +229,8 @@ def handle_symbol_grounding_grasp_base_pose_experimental(req):
 		furniture_geometry_list.append(furniture_geometry)
 		index += 1
 	'''
-	#transfrom furniture geometry data from database 
-	index = 0
-	furniture_geometry_list = list()
-	while index < len(req.furniture_geometry_list):
-		furniture_geometry = FurnitureGeometry()
-		furniture_geometry.pose.x = req.furniture_geometry_list[index].pose.position.x
-		furniture_geometry.pose.y = req.furniture_geometry_list[index].pose.position.y
-		furniture_pose_rpy = tf.transformations.euler_from_quaternion([req.furniture_geometry_list[index].pose.orientation.x, req.furniture_geometry_list[index].pose.orientation.y, req.furniture_geometry_list[index].pose.orientation.z, req.furniture_geometry_list[index].pose.orientation.w])		
-		furniture_geometry.pose.theta = furniture_pose_rpy[2]
-		furniture_geometry.l = req.furniture_geometry_list[index].l
-		furniture_geometry.w = req.furniture_geometry_list[index].w
-		furniture_geometry.h = req.furniture_geometry_list[index].h
-		furniture_geometry_list.append(furniture_geometry)
-		index += 1
+	#transfrom furniture geometry data from database, the index is shared with the other grounding services
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
 	
 
 
@@ -388,7 +301,7 @@ def handle_symbol_grounding_grasp_base_pose_experimental(req):
 	#optimisation
 	obstacle_check = 1
 	#obstacle check
-	grasp_base_pose_list = obstacleCheck(grasp_base_pose_list_1, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_geometry_list, target_obj_h)
+	grasp_base_pose_list = obstacleCheck(grasp_base_pose_list_1, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_index, target_obj_h)
 
 	grasp_base_pose = Pose2D()
 	#rospy.loginfo(grasp_base_pose_list)
@@ -398,7 +311,7 @@ def handle_symbol_grounding_grasp_base_pose_experimental(req):
 
 	else:
 		#obstacle check for the grasping poses with lower reachability when no valid pose can be found from the first candidate pose list
-		grasp_base_pose_list = obstacleCheck(grasp_base_pose_list_2, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_geometry_list, target_obj_h)
+		grasp_base_pose_list = obstacleCheck(grasp_base_pose_list_2, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_index, target_obj_h)
 	
 	#rospy.loginfo(grasp_base_pose_list)
 	#check if there is valid pose
@@ -425,7 +338,9 @@ def handle_symbol_grounding_grasp_base_pose_experimental(req):
 
 
 def symbol_grounding_grasp_base_pose_experimental_server():
+	global map_cache
 	rospy.init_node('symbol_grounding_grasp_base_pose_experimental_server')
+	map_cache = grounding_map.MapCache()
 	s = rospy.Service('symbol_grounding_grasp_base_pose_experimental', SymbolGroundingGraspBasePoseExperimental, handle_symbol_grounding_grasp_base_pose_experimental)
 	print "Ready to receive requests."
 	rospy.spin()
@@ -70,6 +70,11 @@ import rospy
 import math
 import tf
 from tf.transformations import euler_from_quaternion
+import grounding_geometry
+import grounding_index
+import grounding_search
+import grounding_coalesce
+import grounding_map
 #import csv
 
 
@@ -86,21 +91,9 @@ def getWorkspaceOnMap():
 		print "Service call failed: %s"%e
 '''
 
-#get the occupancy grid map from the navigation services
-def getMapClient():
-
-	try:
-		reqMap = rospy.ServiceProxy('static_map', GetMap)	
-		res = reqMap()
-		return res
-	except rospy.ServiceException, e:
-		print "Service call failed: %s"%e
-
 #this function is used to calculate a list of canidate poses around the target obj. thre number of candidate poses is 360/step_angle
-def getRobotBasePoseList(angle, dist, rbp, obj_x, obj_y):
-	grasp_base_pose_list = list()
-	step_angle = angle
-	dist_to_obj = dist
+#direction from the target obj to the robot
+def getRobotBearing(rbp, obj_x, obj_y):
 	rb_pose = rbp
 	target_obj_x = obj_x
 	target_obj_y = obj_y
@@ -110,6 +103,16 @@ def getRobotBasePoseList(angle, dist, rbp, obj_x, obj_y):
 	if rb_pose.x < target_obj_x and rb_pose.y < target_obj_y:
 		th = -math.pi + th
 	#rospy.loginfo(th)
+	return th
+
+
+#candidate base poses on a circle around the target obj, the first one at the direction th
+def getBasePoseCircle(angle, dist, th, obj_x, obj_y):
+	grasp_base_pose_list = list()
+	step_angle = angle
+	dist_to_obj = dist
+	target_obj_x = obj_x
+	target_obj_y = obj_y
 	for n in range (0, int(2 * math.pi / step_angle)):
 		grasp_base_pose = Pose2D()
 		grasp_base_pose.x = target_obj_x + dist_to_obj * math.cos(th) - 0.1 * math.sin(th) - 2 * math.sqrt(dist_to_obj ** 2 + 0.1 ** 2) * math.sin(0.5 * n * step_angle) * math.sin(0.5 * n * step_angle + math.atan(0.1 / dist_to_obj) + th)
@@ -124,100 +127,33 @@ def getRobotBasePoseList(angle, dist, rbp, obj_x, obj_y):
 
 
 	
-#function for checking if a pose is obstacle free.
-def obstacleCheck(gbpl, po_x, po_y, po_th, po_w, po_l, fgl):
-	parent_obj_checked_grasp_base_pose_list = list()
-	obstacle_checked_grasp_base_pose_list = list()
-	wall_checked_grasp_base_pose_list = list()
+#function for checking if a pose is obstacle free. returns a mask over the poses.
+def obstacleCheck(gbpl, po_x, po_y, po_th, po_w, po_l, fgi):
 	grasp_base_pose_list = gbpl
-	parent_obj_x = po_x
-	parent_obj_y = po_y
-	parent_obj_th = po_th
-	parent_obj_w = po_w
-	parent_obj_l = po_l
-	furniture_geometry_list = fgl
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(grasp_base_pose_list)
 	
-	#to check if a pose is too close to the edge of the parent obj. the valid poses will be stored in the parent_obj_checked_grasp_base_pose_list.
+	#to check if a pose is too close to the edge of the parent obj.
 	dist_to_table = 0.45 #minimum distance to the edge of the parent obj
-	index_1 = 0
-	while index_1 < len(grasp_base_pose_list):
-		th = math.atan((grasp_base_pose_list[index_1].y - parent_obj_y) / (grasp_base_pose_list[index_1].x - parent_obj_x))
-		if grasp_base_pose_list[index_1].x < parent_obj_x and grasp_base_pose_list[index_1].y > parent_obj_y:
-			th = math.pi + th
-		if grasp_base_pose_list[index_1].x < parent_obj_x and grasp_base_pose_list[index_1].y < parent_obj_y:
-			th = -math.pi + th
-		delta_x = math.sqrt((grasp_base_pose_list[index_1].x - parent_obj_x) ** 2 + (grasp_base_pose_list[index_1].y - parent_obj_y) ** 2) * math.cos(th - parent_obj_th)
-		delta_y = math.sqrt((grasp_base_pose_list[index_1].x - parent_obj_x) ** 2 + (grasp_base_pose_list[index_1].y - parent_obj_y) ** 2) * math.sin(th - parent_obj_th)
-		#rospy.loginfo([delta_x, delta_y])
-		if (delta_x <= -(parent_obj_w / 2.0 + dist_to_table) or delta_x >= (parent_obj_w / 2.0 + dist_to_table)) or (delta_y <= -(parent_obj_l / 2.0 + dist_to_table) or delta_y >= (parent_obj_l / 2.0 + dist_to_table)):
-			parent_obj_checked_grasp_base_pose_list.append(grasp_base_pose_list[index_1])
-		index_1 += 1
-	#rospy.loginfo(parent_obj_checked_grasp_base_pose_list)
+	valid = grounding_geometry.parentObjClearMask(pose_x, pose_y, po_x, po_y, po_th, po_w, po_l, dist_to_table)
 	
-		
-	if parent_obj_checked_grasp_base_pose_list: #if there is a parent obj free pose
+	if valid.any(): #if there is a parent obj free pose
 		
 		#to check if a pose is too close to or blocked by the furnitures in the room 
 		dist_to_obstacles = 0.45 #minimum disatnce to the furnitures in the room
-		index_2 = 0
-		while index_2 < len(parent_obj_checked_grasp_base_pose_list):
-			index_3 = 0
-			while index_3 < len(furniture_geometry_list):
-				th = math.atan((parent_obj_checked_grasp_base_pose_list[index_2].y - furniture_geometry_list[index_3].pose.y) / (parent_obj_checked_grasp_base_pose_list[index_2].x - furniture_geometry_list[index_3].pose.x))
-				if parent_obj_checked_grasp_base_pose_list[index_2].x < furniture_geometry_list[index_3].pose.x and parent_obj_checked_grasp_base_pose_list[index_2].y > furniture_geometry_list[index_3].pose.y:
-					th = math.pi + th
-				if parent_obj_checked_grasp_base_pose_list[index_2].x < furniture_geometry_list[index_3].pose.x and parent_obj_checked_grasp_base_pose_list[index_2].y < furniture_geometry_list[index_3].pose.y:
-					th = -math.pi + th
-				delta_x = math.sqrt((parent_obj_checked_grasp_base_pose_list[index_2].x - furniture_geometry_list[index_3].pose.x) ** 2 + (parent_obj_checked_grasp_base_pose_list[index_2].y - furniture_geometry_list[index_3].pose.y) ** 2) * math.cos(th - furniture_geometry_list[index_3].pose.theta)
-				delta_y = math.sqrt((parent_obj_checked_grasp_base_pose_list[index_2].x - furniture_geometry_list[index_3].pose.x) ** 2 + (parent_obj_checked_grasp_base_pose_list[index_2].y - furniture_geometry_list[index_3].pose.y) ** 2) * math.sin(th - furniture_geometry_list[index_3].pose.theta)
-				if (delta_x <= -(furniture_geometry_list[index_3].w / 2.0 + dist_to_obstacles) or delta_x >= (furniture_geometry_list[index_3].w / 2.0 + dist_to_obstacles)) or (delta_y <= -(furniture_geometry_list[index_3].l / 2.0 + dist_to_obstacles) or delta_y >= (furniture_geometry_list[index_3].l / 2.0 + dist_to_obstacles)):
-					index_3 += 1
-				else:
-					break
-			if index_3 == len(furniture_geometry_list):
-				obstacle_checked_grasp_base_pose_list.append(parent_obj_checked_grasp_base_pose_list[index_2])
-			index_2 += 1
-		#rospy.loginfo(obstacle_checked_grasp_base_pose_list)
-
-		if obstacle_checked_grasp_base_pose_list: 
+		valid &= fgi.clearMask(pose_x, pose_y, dist_to_obstacles)
+
+		if valid.any(): 
 			
 			#to check if a pose is too near to or blocked by the wall
-			data = getMapClient() #get occupancy grid map
-			#rospy.loginfo(data.map.info)
 			dist_to_walls = 0.5 #set the minimum distance to the walls
 			threshold = 20 #>20:occupied
-			step_angle = 5.0 #(360 / step_angle) points will be put around the robot for the wall check
-
-			index_4 = 0
-			while index_4 < len(obstacle_checked_grasp_base_pose_list):
-				map_index_list = list()
-				n = 0
-				while n < int(360.0 / step_angle):
-					wall_check_point_x = obstacle_checked_grasp_base_pose_list[index_4].x + dist_to_walls * math.cos(n * step_angle / 180.0 * math.pi)
-					wall_check_point_y = obstacle_checked_grasp_base_pose_list[index_4].y + dist_to_walls * math.sin(n * step_angle / 180.0 * math.pi)
-					map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-					map_index_list.append(map_index)
-					n += 1
-				
-				map_index = int((obstacle_checked_grasp_base_pose_list[index_4].y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((obstacle_checked_grasp_base_pose_list[index_4].x - data.map.info.origin.position.x) / data.map.info.resolution)
-				map_index_list.append(map_index)
-				#rospy.loginfo(map_index_list)
-
-				index_5 = 0
-				while index_5 < len(map_index_list):
-					if -1 < data.map.data[map_index_list[index_5]] < threshold:
-						index_5 += 1
-					else:
-						break
-				if index_5 == len(map_index_list):
-					wall_checked_grasp_base_pose_list.append(obstacle_checked_grasp_base_pose_list[index_4])
-				index_4 += 1
+			valid[valid] = map_cache.wallClearMask(pose_x[valid], pose_y[valid], dist_to_walls, threshold)
 	
-	return 	wall_checked_grasp_base_pose_list 			
-	#rospy.loginfo(wall_checked_grasp_base_pose_list)
+	return valid
 	
 
-def handle_symbol_grounding_grasp_base_region(req):
+#get the robot's current base pose
+def getRobotPose():
 	
 	'''
 	#get the robot's current pose from tf
@@ -236,7 +172,11 @@ def handle_symbol_grounding_grasp_base_region(req):
 	rb_pose.x = -1.06
 	rb_pose.y = -1.08
 	rb_pose.theta = 0.0
-		
+	return rb_pose
+
+
+#calculate the reachability of the target obj from the robot's current base pose. this is the only robot specific part of the grasp base region.
+def getReach(rb_pose, target_obj_pose):
 	#predefined membership function
 	mf1_x = [0, 0.16, 0.33, 0.49, 0.67, 0.84, 1, 0.75, 0.5, 0.25, 0]
 	mf1_y = [0, 0.16, 0.33, 0.49, 0.67, 0.84, 1, 0.875, 0.75, 0.625, 0.5, 0.375, 0.25, 0.125, 0]
@@ -252,11 +192,10 @@ def handle_symbol_grounding_grasp_base_region(req):
 	mf3_th = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0]
 	'''
 
-
-	#transfrom the parent obj data from database 
-	target_obj_x = req.target_obj_pose.position.x
-	target_obj_y = req.target_obj_pose.position.y
-	target_obj_rpy = tf.transformations.euler_from_quaternion([req.target_obj_pose.orientation.x, req.target_obj_pose.orientation.y, req.target_obj_pose.orientation.z, req.target_obj_pose.orientation.w])
+	#transfrom the target obj data from database 
+	target_obj_x = target_obj_pose.position.x
+	target_obj_y = target_obj_pose.position.y
+	target_obj_rpy = tf.transformations.euler_from_quaternion([target_obj_pose.orientation.x, target_obj_pose.orientation.y, target_obj_pose.orientation.z, target_obj_pose.orientation.w])
 	target_obj_th = target_obj_rpy[2]
 	#rospy.loginfo(target_obj_th)
 
@@ -264,57 +203,6 @@ def handle_symbol_grounding_grasp_base_region(req):
 	robot_base_pose_y = rb_pose.y
 	robot_base_pose_th = rb_pose.theta
 
-	parent_obj_x = req.parent_obj_geometry.pose.position.x
-	parent_obj_y = req.parent_obj_geometry.pose.position.y
-	parent_obj_rpy = tf.transformations.euler_from_quaternion([req.parent_obj_geometry.pose.orientation.x, req.parent_obj_geometry.pose.orientation.y, req.parent_obj_geometry.pose.orientation.z, req.parent_obj_geometry.pose.orientation.w])
-	parent_obj_th = parent_obj_rpy[2]
-	parent_obj_l = req.parent_obj_geometry.l
-	parent_obj_w = req.parent_obj_geometry.w
-	parent_obj_h = req.parent_obj_geometry.h
-
-
-	'''
-	#get furniture list from the knowledge base (part 2)
-
-	workspace_info = getWorkspaceOnMap()	
-	furniture_geometry_list = list()
-	furniture_geometry_list = workspace_info.objectsInfo
-	
-	
-	#transfrom list
-	index = 0
-	furniture_geometry_list = list()
-	while index < len(furniture_geometry_list):
-		furniture_geometry = FurnitureGeometry()
-		furniture_geometry.pose.x = furniture_geometry_list[index].pose.position.x
-		furniture_geometry.pose.y = furniture_geometry_list[index].pose.position.y
-		furniture_pose_rpy = tf.transformations.euler_from_quaternion([furniture_geometry_list[index].pose.orientation.x, furniture_geometry_list[index].pose.orientation.y, furniture_geometry_list[index].pose.orientation.z, furniture_geometry_list[index].pose.orientation.w])		
-		furniture_geometry.pose.theta = furniture_pose_rpy[2]
-		furniture_geometry.l = furniture_geometry_list[index].l
-		furniture_geometry.w = furniture_geometry_list[index].w
-		furniture_geometry.h = furniture_geometry_list[index].h
-		furniture_geometry_list.append(furniture_geometry)
-		index += 1
-	'''
-	#transfrom furniture geometry data from database 
-	index = 0
-	furniture_geometry_list = list()
-	while index < len(req.furniture_geometry_list):
-		furniture_geometry = FurnitureGeometry()
-		furniture_geometry.pose.x = req.furniture_geometry_list[index].pose.position.x
-		furniture_geometry.pose.y = req.furniture_geometry_list[index].pose.position.y
-		furniture_pose_rpy = tf.transformations.euler_from_quaternion([req.furniture_geometry_list[index].pose.orientation.x, req.furniture_geometry_list[index].pose.orientation.y, req.furniture_geometry_list[index].pose.orientation.z, req.furniture_geometry_list[index].pose.orientation.w])		
-		furniture_geometry.pose.theta = furniture_pose_rpy[2]
-		furniture_geometry.l = req.furniture_geometry_list[index].l
-		furniture_geometry.w = req.furniture_geometry_list[index].w
-		furniture_geometry.h = req.furniture_geometry_list[index].h
-		furniture_geometry_list.append(furniture_geometry)
-		index += 1
-	
-
-
-
-	#calculate the reachability
 
 	#calculate the best grippier pose from the robot's current base pose 
 	best_gripper_pose_x = robot_base_pose_x - 0.8 * math.cos(robot_base_pose_th) + 0.1 * math.sin(robot_base_pose_th)
@@ -355,6 +243,49 @@ def handle_symbol_grounding_grasp_base_region(req):
 		#Apply the fuzzy rule.
 		reach = min(member_x, member_y, member_th)
 		#rospy.loginfo(reach)
+	return reach
+
+
+#the robot independent part of the grasp base region: the obstacle check of two full circles of candidate poses around the target obj.
+#the circles start at the direction 0, every robot picks its first valid pose from its own direction afterwards.
+def groundGraspBaseCircles(target_obj_pose, parent_obj_geometry, furniture_index):
+
+	#transfrom the target obj data from database 
+	target_obj_x = target_obj_pose.position.x
+	target_obj_y = target_obj_pose.position.y
+
+	parent_obj_x = parent_obj_geometry.pose.position.x
+	parent_obj_y = parent_obj_geometry.pose.position.y
+	parent_obj_rpy = tf.transformations.euler_from_quaternion([parent_obj_geometry.pose.orientation.x, parent_obj_geometry.pose.orientation.y, parent_obj_geometry.pose.orientation.z, parent_obj_geometry.pose.orientation.w])
+	parent_obj_th = parent_obj_rpy[2]
+	parent_obj_l = parent_obj_geometry.l
+	parent_obj_w = parent_obj_geometry.w
+	parent_obj_h = parent_obj_geometry.h
+
+
+	'''
+	#get furniture list from the knowledge base (part 2)
+
+	workspace_info = getWorkspaceOnMap()	
+	furniture_geometry_list = list()
+	furniture_geometry_list = workspace_info.objectsInfo
+	
+	
+	#transfrom list
+	index = 0
+	furniture_geometry_list = list()
+	while index < len(furniture_geometry_list):
+		furniture_geometry = FurnitureGeometry()
+		furniture_geometry.pose.x = furniture_geometry_list[index].pose.position.x
+		furniture_geometry.pose.y = furniture_geometry_list[index].pose.position.y
+		furniture_pose_rpy = tf.transformations.euler_from_quaternion([furniture_geometry_list[index].pose.orientation.x, furniture_geometry_list[index].pose.orientation.y, furniture_geometry_list[index].pose.orientation.z, furniture_geometry_list[index].pose.orientation.w])		
+		furniture_geometry.pose.theta = furniture_pose_rpy[2]
+		furniture_geometry.l = furniture_geometry_list[index].l
+		furniture_geometry.w = furniture_geometry_list[index].w
+		furniture_geometry.h = furniture_geometry_list[index].h
+		furniture_geometry_list.append(furniture_geometry)
+		index += 1
+	'''
 
 
 
@@ -362,77 +293,116 @@ def handle_symbol_grounding_grasp_base_region(req):
 	#the first candidate pose list
 	step_angle_1 = 5.0 / 180.0 * math.pi #360 / step_angle of candidate poses will be put around the target obj
 	dist_1 = 0.8 #distance to the target obj
-	grasp_base_pose_list_1 = list()
-	grasp_base_pose_list_1 = getRobotBasePoseList(step_angle_1, dist_1, rb_pose, target_obj_x, target_obj_y)
-	#rospy.loginfo(grasp_base_pose_list)
+	grasp_base_pose_list_1 = getBasePoseCircle(step_angle_1, dist_1, 0.0, target_obj_x, target_obj_y)
 
 	#calculate another list of candidate grasping poses with lower reachability
 	step_angle_2 = 5.0 / 180.0 * math.pi
 	dist_2 = 0.9
-	grasp_base_pose_list_2 = list()
-	grasp_base_pose_list_2 = getRobotBasePoseList(step_angle_2, dist_2, rb_pose, target_obj_x, target_obj_y)
-	#rospy.loginfo(grasp_base_pose_list) 
+	grasp_base_pose_list_2 = getBasePoseCircle(step_angle_2, dist_2, 0.0, target_obj_x, target_obj_y)
 
-	
-	#optimisation
-	obstacle_check = 1
 	#obstacle check
-	grasp_base_pose_list = obstacleCheck(grasp_base_pose_list_1, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_geometry_list)
+	valid_1 = obstacleCheck(grasp_base_pose_list_1, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_index)
+	valid_2 = obstacleCheck(grasp_base_pose_list_2, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_index)
+	return [(grasp_base_pose_list_1, valid_1), (grasp_base_pose_list_2, valid_2)]
 
-	grasp_base_pose = Pose2D()
-	#rospy.loginfo(grasp_base_pose_list)
-	if grasp_base_pose_list:
-		obstacle_check = 0
-		grasp_base_pose = grasp_base_pose_list[0]
 
-	else:
-		#obstacle check for the grasping poses with lower reachability when no valid pose can be found from the first candidate pose list
-		grasp_base_pose_list = obstacleCheck(grasp_base_pose_list_2, parent_obj_x, parent_obj_y, parent_obj_th, parent_obj_w, parent_obj_l, furniture_geometry_list)
-	
-	#rospy.loginfo(grasp_base_pose_list)
-	#check if there is valid pose
-	if grasp_base_pose_list:
-
-		obstacle_check = 0
-		grasp_base_pose = grasp_base_pose_list[0]		
-	
-
-	#calculate R
+#pick the first valid pose from the direction of the robot. the poses with lower reachability are used when no pose of the first circle is valid.
+#the direction of the robot is rounded to the step angle of the circles.
+def pickGraspBasePose(grasp_base_circles, rb_pose, target_obj_pose):
+	th = getRobotBearing(rb_pose, target_obj_pose.position.x, target_obj_pose.position.y)
+	obstacle_check = 1
+	grasp_base_pose = Pose2D()
+	for grasp_base_pose_list, valid in grasp_base_circles:
+		num_poses = len(grasp_base_pose_list)
+		first = int(round(th / (2 * math.pi) * num_poses)) % num_poses
+		for n in range(0, num_poses):
+			if valid[(first + n) % num_poses]:
+				obstacle_check = 0
+				grasp_base_pose = grasp_base_pose_list[(first + n) % num_poses]
+				return obstacle_check, grasp_base_pose
+	return obstacle_check, grasp_base_pose
+
+
+#calculate R
+def getR(grasp_base_pose, furniture_index):
 	min_dist = 0.40 #set the minimum distance to obstacles
 	hdz_size = 0.05
-	dist_list = list()
-	index = 0
-	while index < len(furniture_geometry_list):
-		th = math.atan((grasp_base_pose.y - furniture_geometry_list[index].pose.y) / (grasp_base_pose.x - furniture_geometry_list[index].pose.x))
-		if grasp_base_pose.x < furniture_geometry_list[index].pose.x and grasp_base_pose.y > furniture_geometry_list[index].pose.y:
-			th = math.pi + th
-		if grasp_base_pose.x < furniture_geometry_list[index].pose.x and grasp_base_pose.y < furniture_geometry_list[index].pose.y:
-			th = -math.pi + th
-		delta_x = math.sqrt((grasp_base_pose.x - furniture_geometry_list[index].pose.x) ** 2 + (grasp_base_pose.y - furniture_geometry_list[index].pose.y) ** 2) * math.cos(th - furniture_geometry_list[index].pose.theta)
-		delta_y = math.sqrt((grasp_base_pose.x - furniture_geometry_list[index].pose.x) ** 2 + (grasp_base_pose.y - furniture_geometry_list[index].pose.y) ** 2) * math.sin(th - furniture_geometry_list[index].pose.theta)
-		delta_x = abs(delta_x)
-		delta_y = abs(delta_y)
-		dist = max((delta_x - furniture_geometry_list[index].w / 2.0), (delta_y - furniture_geometry_list[index].l / 2.0))
-		dist_list.append(dist)
-		index += 1
-	R = min(min(dist_list) - min_dist, hdz_size)
-	
+	#only the furnitures closer than min_dist + hdz_size can make R smaller than hdz_size
+	R = min(furniture_index.clearance([grasp_base_pose.x], [grasp_base_pose.y], min_dist + hdz_size)[0] - min_dist, hdz_size)
+	return R
 
-		
+
+#ground the grasp base region of one target obj for the robot at rb_pose. the furniture index is shared by all the targets of a request.
+def groundGraspBaseRegion(target_obj_pose, parent_obj_geometry, furniture_index, rb_pose):
+	grasp_base_circles = groundGraspBaseCircles(target_obj_pose, parent_obj_geometry, furniture_index)
+	(obstacle_check, grasp_base_pose) = pickGraspBasePose(grasp_base_circles, rb_pose, target_obj_pose)
+	R = getR(grasp_base_pose, furniture_index)
 	#return value
+	return obstacle_check, grasp_base_pose, R
+
+
+#identical requests which arrive while one of them is grounded share the obstacle check. the pose, reach and R are picked for every caller afterwards.
+def handle_symbol_grounding_grasp_base_region(req):
+	rb_pose = getRobotPose()
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+	key = grounding_coalesce.requestKey(req)
+	grasp_base_circles = coalescer.call(key, lambda: groundGraspBaseCircles(req.target_obj_pose, req.parent_obj_geometry, furniture_index))
+	(obstacle_check, grasp_base_pose) = pickGraspBasePose(grasp_base_circles, rb_pose, req.target_obj_pose)
+	R = getR(grasp_base_pose, furniture_index)
+	reach = getReach(rb_pose, req.target_obj_pose)
 	return obstacle_check, reach, grasp_base_pose, R
 
 
+#ground a batch of target objs. the furniture index is built once and the map is shared by all the targets.
+def handle_symbol_grounding_grasp_base_region_batch(req):
+	if len(req.target_obj_pose_list) != len(req.parent_obj_geometry_list):
+		raise rospy.ServiceException("target_obj_pose_list and parent_obj_geometry_list must have the same length")
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+	rb_pose = getRobotPose()
+	obstacle_check_list = list()
+	reach_list = list()
+	grasp_base_pose_list = list()
+	R_list = list()
+	for target_obj_pose, parent_obj_geometry in zip(req.target_obj_pose_list, req.parent_obj_geometry_list):
+		obstacle_check, grasp_base_pose, R = groundGraspBaseRegion(target_obj_pose, parent_obj_geometry, furniture_index, rb_pose)
+		reach = getReach(rb_pose, target_obj_pose)
+		obstacle_check_list.append(obstacle_check)
+		reach_list.append(reach)
+		grasp_base_pose_list.append(grasp_base_pose)
+		R_list.append(R)
+	return obstacle_check_list, reach_list, grasp_base_pose_list, R_list
 
 
+#scored search for the grasp base poses of a target obj. the k poses with the best combination of reach and clearance are returned, best first.
+def handle_symbol_grounding_grasp_base_pose_search(req):
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+	parent_obj_rpy = tf.transformations.euler_from_quaternion([req.parent_obj_geometry.pose.orientation.x, req.parent_obj_geometry.pose.orientation.y, req.parent_obj_geometry.pose.orientation.z, req.parent_obj_geometry.pose.orientation.w])
+	parent_obj = (req.parent_obj_geometry.pose.position.x, req.parent_obj_geometry.pose.position.y, parent_obj_rpy[2], req.parent_obj_geometry.w, req.parent_obj_geometry.l)
+	k = req.k
+	if k <= 0:
+		k = 5
+	scorer = grounding_search.GraspBasePoseScore(req.target_obj_pose.position.x, req.target_obj_pose.position.y, parent_obj, furniture_index, map_cache)
+	pose_x, pose_y, pose_th, score, reach, R = grounding_search.searchGraspBasePoses(scorer, k)
+	grasp_base_pose_list = list()
+	for n in range(len(pose_x)):
+		grasp_base_pose_list.append(Pose2D(pose_x[n], pose_y[n], pose_th[n]))
+	if not grasp_base_pose_list:
+		print "no valid grasp base pose."
+	return grasp_base_pose_list, score.tolist(), reach.tolist(), R.tolist()
+
 
-	
 
 
 
 def symbol_grounding_grasp_base_region_server():
+	global map_cache, coalescer
 	rospy.init_node('symbol_grounding_grasp_base_region_server')
+	map_cache = grounding_map.MapCache()
+	coalescer = grounding_coalesce.RequestCoalescer('grasp_base_region')
+	rospy.on_shutdown(coalescer.logStats)
 	s = rospy.Service('symbol_grounding_grasp_base_region', SymbolGroundingGraspBaseRegion, handle_symbol_grounding_grasp_base_region)
+	s_batch = rospy.Service('symbol_grounding_grasp_base_region_batch', SymbolGroundingGraspBaseRegionBatch, handle_symbol_grounding_grasp_base_region_batch)
+	s_search = rospy.Service('symbol_grounding_grasp_base_pose_search', SymbolGroundingGraspBasePoseSearch, handle_symbol_grounding_grasp_base_pose_search)
 	print "Ready to receive requests."
 	rospy.spin()
 
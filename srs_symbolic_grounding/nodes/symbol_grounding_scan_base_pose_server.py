@@ -57,7 +57,7 @@
 
 import roslib; roslib.load_manifest('srs_symbolic_grounding')
 from srs_symbolic_grounding.srv import *
-#from srs_symbolic_grounding.msg import *
+from srs_symbolic_grounding.msg import *
 from std_msgs.msg import *
 from geometry_msgs.msg import *
 from nav_msgs.msg import *
@@ -67,6 +67,10 @@ import rospy
 import math
 import tf
 from tf.transformations import euler_from_quaternion
+import grounding_geometry
+import grounding_index
+import grounding_cache
+import grounding_map
 import csv
 '''
 def getWorkspaceOnMap():
@@ -79,123 +83,30 @@ def getWorkspaceOnMap():
 		print "Service call failed: %s"%e
 '''
 
-def getMapClient(): #read map from navigation service
 
-	try:
-		reqMap = rospy.ServiceProxy('static_map', GetMap)	
-		res = reqMap()
-		return res
-	except rospy.ServiceException, e:
-		print "Service call failed: %s"%e
 
-
-
-def obstacleCheck(sbpl, fgl, po_x, po_y): 
-	obstacle_checked_scan_base_pose_list = list() #used to save obstacle checked poses
-	wall_checked_scan_base_pose_list = list() #used to save wall checked poses
-	all_checked_scan_base_pose_list = list()
+def obstacleCheck(sbpl, fgi, po_x, po_y): 
 	scan_base_pose_list = sbpl #read inputs
-	furniture_geometry_list = fgl
-	parent_obj_x = po_x
-	parent_obj_y = po_y
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(scan_base_pose_list)
 
 	#obstacle check
 	dist_to_obstacles = 0.5  #set the minimum distance to the household furnitures
-	#rospy.loginfo(math.atan(-0.5))
-	#check all of the poses from the scan pose list with all the household furnitures to find a obstacle free scan pose list. the poses will be stored in obstacle_checked_scan_base_pose_list.
-	index_1 = 0
-	while index_1 < len(scan_base_pose_list):
-		index_2 = 0
-		while index_2 < len(furniture_geometry_list):
-			th = math.atan((scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) / (scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x))
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y > furniture_geometry_list[index_2].pose.y:
-				th = math.pi + th
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y < furniture_geometry_list[index_2].pose.y:
-				th = -math.pi + th
-			delta_x = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(th - furniture_geometry_list[index_2].pose.theta)
-			delta_y = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(th - furniture_geometry_list[index_2].pose.theta)
-			if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + dist_to_obstacles) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + dist_to_obstacles)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + dist_to_obstacles) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + dist_to_obstacles)):
-				index_2 += 1
-			else:
-				break
-		if index_2 == len(furniture_geometry_list):
-			obstacle_checked_scan_base_pose_list.append(scan_base_pose_list[index_1])
-		index_1 += 1
-	#rospy.loginfo(obstacle_checked_scan_base_pose_list)
-
-	if obstacle_checked_scan_base_pose_list: #check if there is a obstacle free pose in the list.
+	#check all of the poses from the scan pose list with all the household furnitures at once to find the obstacle free poses.
+	valid = fgi.clearMask(pose_x, pose_y, dist_to_obstacles)
+
+	if valid.any(): #check if there is a obstacle free pose in the list.
 			
 		#wall check
-		data = getMapClient() #get occupancy grid map from the navigation serves 
-
-		
 		dist_to_walls = 0.5 #set the minimum distance to the walls
 		threshold = 10.0 #set the threshold to decide if a pose is occupaied. >threshold:occupied.
-		step_angle = 5.0 #set the step angle for putting points around the robot for the wall check (360 / step_angle points will be used)
-
-		#check all of the poses from the obstacle_checked_scan_base_pose_list with the occupancy map to find a wall free scan pose list
-		index_3 = 0
-		while index_3 < len(obstacle_checked_scan_base_pose_list):
-			map_index_list = list()
-			n = 0
-			while n < int(360.0 / step_angle):
-				wall_check_point_x = obstacle_checked_scan_base_pose_list[index_3].x + dist_to_walls * math.cos(n * step_angle / 180.0 * math.pi)
-				wall_check_point_y = obstacle_checked_scan_base_pose_list[index_3].y + dist_to_walls * math.sin(n * step_angle / 180.0 * math.pi)
-				
-				#rospy.loginfo([wall_check_point_x, wall_check_point_y])
-
-				map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-				map_index_list.append(map_index)
-				n += 1
-				
-			map_index = int((obstacle_checked_scan_base_pose_list[index_3].y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((obstacle_checked_scan_base_pose_list[index_3].x - data.map.info.origin.position.x) / data.map.info.resolution)
-			map_index_list.append(map_index)
-			#rospy.loginfo(map_index_list)
-
-			index_4 = 0
-			while index_4 < len(map_index_list):
-				#rospy.loginfo(data.map.data[map_index_list[index_4]])
-				if -1 < data.map.data[map_index_list[index_4]] < threshold:
-					index_4 += 1
-				else:
-					break
-			if index_4 == len(map_index_list):
-				wall_checked_scan_base_pose_list.append(obstacle_checked_scan_base_pose_list[index_3])
-			index_3 += 1
-	'''
-	if wall_checked_scan_base_pose_list:
-		step_dist = 0.05
-		map_index_list = list()
-		threshold = 20
-		index_5 = 0
-		while index_5 < len(wall_checked_scan_base_pose_list):
-			dist = math.sqrt((parent_obj_y - wall_checked_scan_base_pose_list[index_5].y) ** 2 + (parent_obj_x - wall_checked_scan_base_pose_list[index_5].x) ** 2)
-			n = 0
-			while n < int((dist - 0.5) / step_dist):
-				wall_check_point_x = wall_checked_scan_base_pose_list[index_5].x - (0.5 + n * step_dist) * math.cos(wall_checked_scan_base_pose_list[index_5].theta)
-				wall_check_point_y = wall_checked_scan_base_pose_list[index_5].y - (0.5 + n * step_dist) * math.sin(wall_checked_scan_base_pose_list[index_5].theta)
-				print([wall_check_point_x, wall_check_point_y, wall_checked_scan_base_pose_list[index_5].theta])
-				map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-				map_index_list.append(map_index)
-				n += 1
-			
-			index_6 = 0
-			while index_6 < len(map_index_list):
-				if -1 < data.map.data[map_index_list[index_6]] < threshold:
-					index_6 += 1
-				else:
-					break
-			if index_6 == len(map_index_list):
-				all_checked_scan_base_pose_list.append(wall_checked_scan_base_pose_list[index_5])
-			index_5 += 1
-	'''
-	return 	wall_checked_scan_base_pose_list			
-	#rospy.loginfo(wall_checked_scan_base_pose_list)
 
+		#check the obstacle free poses with the occupancy map to find a wall free scan pose list
+		valid[valid] = map_cache.wallClearMask(pose_x[valid], pose_y[valid], dist_to_walls, threshold)
 
+	return grounding_geometry.filterPoseList(scan_base_pose_list, valid)
 
-#calculate scan base poses
-def handle_symbol_grounding_scan_base_pose(req):
+#calculate scan base poses of one parent obj. the furniture index is shared by all the parent objs of a request.
+def groundScanBasePose(parent_obj_geometry, furniture_index):
 
 	'''
 	#record the map for checking
@@ -253,37 +164,20 @@ def handle_symbol_grounding_scan_base_pose(req):
 	'''
 
 	#transform from knowledge base data to function useable data  	
-	parent_obj_x = req.parent_obj_geometry.pose.position.x
-	parent_obj_y = req.parent_obj_geometry.pose.position.y
-	parent_obj_rpy = tf.transformations.euler_from_quaternion([req.parent_obj_geometry.pose.orientation.x, req.parent_obj_geometry.pose.orientation.y, req.parent_obj_geometry.pose.orientation.z, req.parent_obj_geometry.pose.orientation.w])
+	parent_obj_x = parent_obj_geometry.pose.position.x
+	parent_obj_y = parent_obj_geometry.pose.position.y
+	parent_obj_rpy = tf.transformations.euler_from_quaternion([parent_obj_geometry.pose.orientation.x, parent_obj_geometry.pose.orientation.y, parent_obj_geometry.pose.orientation.z, parent_obj_geometry.pose.orientation.w])
 	parent_obj_th = parent_obj_rpy[2]
-	parent_obj_l = req.parent_obj_geometry.l
-	parent_obj_w = req.parent_obj_geometry.w
-	parent_obj_h = req.parent_obj_geometry.h
+	parent_obj_l = parent_obj_geometry.l
+	parent_obj_w = parent_obj_geometry.w
+	parent_obj_h = parent_obj_geometry.h
 
 	#rpy = tf.transformations.euler_from_quaternion([0, 0, -0.68, 0.73])
 	#rospy.loginfo(rpy[2])
 
-	#rospy.loginfo(req.parent_obj_geometry)
+	#rospy.loginfo(parent_obj_geometry)
 
 	
-	#transfrom furniture geometry list
-	index = 0
-	furniture_geometry_list = list()
-	while index < len(req.furniture_geometry_list):
-		furniture_geometry = FurnitureGeometry()
-		furniture_geometry.pose.x = req.furniture_geometry_list[index].pose.position.x
-		furniture_geometry.pose.y = req.furniture_geometry_list[index].pose.position.y
-		furniture_pose_rpy = tf.transformations.euler_from_quaternion([req.furniture_geometry_list[index].pose.orientation.x, req.furniture_geometry_list[index].pose.orientation.y, req.furniture_geometry_list[index].pose.orientation.z, req.furniture_geometry_list[index].pose.orientation.w])		
-		furniture_geometry.pose.theta = furniture_pose_rpy[2]
-		furniture_geometry.l = req.furniture_geometry_list[index].l
-		furniture_geometry.w = req.furniture_geometry_list[index].w
-		furniture_geometry.h = req.furniture_geometry_list[index].h
-		furniture_geometry_list.append(furniture_geometry)
-		index += 1
-	
-	
-
 	#calculate the detection width
 	rb_distance = 1.0#0.7 #distance between the robot base and the edge of the parent obj
 	robot_h = 1.4 #set the height of the detector
@@ -442,10 +336,10 @@ def handle_symbol_grounding_scan_base_pose(req):
 	#rospy.loginfo(scan_base_pose_list_4)
 	
 	#obstacle check
-	obstacle_checked_scan_base_pose_list_1 = obstacleCheck(scan_base_pose_list_1, furniture_geometry_list, parent_obj_x, parent_obj_y)
-	obstacle_checked_scan_base_pose_list_2 = obstacleCheck(scan_base_pose_list_2, furniture_geometry_list, parent_obj_x, parent_obj_y)
-	obstacle_checked_scan_base_pose_list_3 = obstacleCheck(scan_base_pose_list_3, furniture_geometry_list, parent_obj_x, parent_obj_y)
-	obstacle_checked_scan_base_pose_list_4 = obstacleCheck(scan_base_pose_list_4, furniture_geometry_list, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_1 = obstacleCheck(scan_base_pose_list_1, furniture_index, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_2 = obstacleCheck(scan_base_pose_list_2, furniture_index, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_3 = obstacleCheck(scan_base_pose_list_3, furniture_index, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_4 = obstacleCheck(scan_base_pose_list_4, furniture_index, parent_obj_x, parent_obj_y)
 
 
 
@@ -454,13 +348,13 @@ def handle_symbol_grounding_scan_base_pose(req):
 
 	#choose the longest scan pose list 
 	if len(obstacle_checked_scan_base_pose_list_1) == max_len:
-		scan_base_pose_list = [obstacle_checked_scan_base_pose_list_1]
+		scan_base_pose_list = obstacle_checked_scan_base_pose_list_1
 	elif len(obstacle_checked_scan_base_pose_list_2) == max_len:
-		scan_base_pose_list = [obstacle_checked_scan_base_pose_list_2]
+		scan_base_pose_list = obstacle_checked_scan_base_pose_list_2
 	elif len(obstacle_checked_scan_base_pose_list_3) == max_len:
-		scan_base_pose_list = [obstacle_checked_scan_base_pose_list_3]
+		scan_base_pose_list = obstacle_checked_scan_base_pose_list_3
 	else:
-		scan_base_pose_list = [obstacle_checked_scan_base_pose_list_4]
+		scan_base_pose_list = obstacle_checked_scan_base_pose_list_4
 	
 
 	if not scan_base_pose_list:
@@ -470,10 +364,43 @@ def handle_symbol_grounding_scan_base_pose(req):
 	return scan_base_pose_list
 
 
+#the answer is taken from the result cache if the same parent obj and furniture list have been grounded on the current map
+def handle_symbol_grounding_scan_base_pose(req):
+	key = result_cache.key(req.parent_obj_geometry, req.furniture_geometry_list)
+	scan_base_pose_list = result_cache.get(key)
+	if scan_base_pose_list is None:
+		furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+		scan_base_pose_list = groundScanBasePose(req.parent_obj_geometry, furniture_index)
+		result_cache.put(key, scan_base_pose_list)
+	return [scan_base_pose_list]
+
+
+#calculate scan base poses for a batch of parent objs. the furniture index is only built if one of the parent objs is not in the result cache, and then shared by all of them.
+def handle_symbol_grounding_scan_base_pose_batch(req):
+	furniture_digest = result_cache.furnitureDigest(req.furniture_geometry_list)
+	furniture_index = None
+	scan_base_pose_lists = list()
+	for parent_obj_geometry in req.parent_obj_geometry_list:
+		key = result_cache.key(parent_obj_geometry, furniture_digest)
+		scan_base_pose_list = result_cache.get(key)
+		if scan_base_pose_list is None:
+			if furniture_index is None:
+				furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+			scan_base_pose_list = groundScanBasePose(parent_obj_geometry, furniture_index)
+			result_cache.put(key, scan_base_pose_list)
+		scan_base_pose_lists.append(ScanBasePoseList(scan_base_pose_list))
+	return [scan_base_pose_lists]
+
+
 
 def symbol_grounding_scan_base_pose_server():
+	global map_cache, result_cache
 	rospy.init_node('symbol_grounding_scan_base_pose_server')
+	map_cache = grounding_map.MapCache()
+	result_cache = grounding_cache.GroundingCache('scan_base_pose')
+	rospy.on_shutdown(result_cache.logStats)
 	s = rospy.Service('symbol_grounding_scan_base_pose', SymbolGroundingScanBasePose, handle_symbol_grounding_scan_base_pose)
+	s_batch = rospy.Service('symbol_grounding_scan_base_pose_batch', SymbolGroundingScanBasePoseBatch, handle_symbol_grounding_scan_base_pose_batch)
 	print "Ready to receive requests."
 	rospy.spin()
 
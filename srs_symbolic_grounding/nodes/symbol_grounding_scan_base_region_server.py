@@ -67,6 +67,11 @@ import rospy
 import math
 import tf
 from tf.transformations import euler_from_quaternion
+import grounding_geometry
+import grounding_index
+import grounding_map
+import grounding_tour
+import numpy
 
 '''
 def getWorkspaceOnMap():
@@ -79,123 +84,31 @@ def getWorkspaceOnMap():
 		print "Service call failed: %s"%e
 '''
 
-def getMapClient(): #read map from navigation service
 
-	try:
-		reqMap = rospy.ServiceProxy('static_map', GetMap)	
-		res = reqMap()
-		return res
-	except rospy.ServiceException, e:
-		print "Service call failed: %s"%e
 
-
-
-def obstacleCheck(sbpl, fgl, po_x, po_y): 
-	obstacle_checked_scan_base_pose_list = list() #used to save obstacle checked poses
-	wall_checked_scan_base_pose_list = list() #used to save wall checked poses
-	all_checked_scan_base_pose_list = list()
+def obstacleCheck(sbpl, fgi, po_x, po_y): 
 	scan_base_pose_list = sbpl #read inputs
-	furniture_geometry_list = fgl
-	parent_obj_x = po_x
-	parent_obj_y = po_y
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(scan_base_pose_list)
 
 	#obstacle check
 	dist_to_obstacles = 0.4  #set the minimum distance to the household furnitures
-	#rospy.loginfo(math.atan(-0.5))
-	#check all of the poses from the scan pose list with all the household furnitures to find a obstacle free scan pose list. the poses will be stored in obstacle_checked_scan_base_pose_list.
-	index_1 = 0
-	while index_1 < len(scan_base_pose_list):
-		index_2 = 0
-		while index_2 < len(furniture_geometry_list):
-			th = math.atan((scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) / (scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x + 0.0001))
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y > furniture_geometry_list[index_2].pose.y:
-				th = math.pi + th
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y < furniture_geometry_list[index_2].pose.y:
-				th = -math.pi + th
-			delta_x = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(th - furniture_geometry_list[index_2].pose.theta)
-			delta_y = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(th - furniture_geometry_list[index_2].pose.theta)
-			if (delta_x <= -(furniture_geometry_list[index_2].w / 2.0 + dist_to_obstacles) or delta_x >= (furniture_geometry_list[index_2].w / 2.0 + dist_to_obstacles)) or (delta_y <= -(furniture_geometry_list[index_2].l / 2.0 + dist_to_obstacles) or delta_y >= (furniture_geometry_list[index_2].l / 2.0 + dist_to_obstacles)):
-				index_2 += 1
-			else:
-				break
-		if index_2 == len(furniture_geometry_list):
-			obstacle_checked_scan_base_pose_list.append(scan_base_pose_list[index_1])
-		index_1 += 1
-	#rospy.loginfo(obstacle_checked_scan_base_pose_list)
-
-	if obstacle_checked_scan_base_pose_list: #check if there is a obstacle free pose in the list.
+	#check all of the poses from the scan pose list with all the household furnitures at once to find the obstacle free poses.
+	valid = fgi.clearMask(pose_x, pose_y, dist_to_obstacles)
+
+	if valid.any(): #check if there is a obstacle free pose in the list.
 			
 		#wall check
-		data = getMapClient() #get occupancy grid map from the navigation serves 
-
-		
 		dist_to_walls = 0.5 #set the minimum distance to the walls
 		threshold = 10.0 #set the threshold to decide if a pose is occupaied. >threshold:occupied.
-		step_angle = 5.0 #set the step angle for putting points around the robot for the wall check (360 / step_angle points will be used)
-
-		#check all of the poses from the obstacle_checked_scan_base_pose_list with the occupancy map to find a wall free scan pose list
-		index_3 = 0
-		while index_3 < len(obstacle_checked_scan_base_pose_list):
-			map_index_list = list()
-			n = 0
-			while n < int(360.0 / step_angle):
-				wall_check_point_x = obstacle_checked_scan_base_pose_list[index_3].x + dist_to_walls * math.cos(n * step_angle / 180.0 * math.pi)
-				wall_check_point_y = obstacle_checked_scan_base_pose_list[index_3].y + dist_to_walls * math.sin(n * step_angle / 180.0 * math.pi)
-				
-				#rospy.loginfo([wall_check_point_x, wall_check_point_y])
-
-				map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-				map_index_list.append(map_index)
-				n += 1
-				
-			map_index = int((obstacle_checked_scan_base_pose_list[index_3].y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((obstacle_checked_scan_base_pose_list[index_3].x - data.map.info.origin.position.x) / data.map.info.resolution)
-			map_index_list.append(map_index)
-			#rospy.loginfo(map_index_list)
-
-			index_4 = 0
-			while index_4 < len(map_index_list):
-				#rospy.loginfo(data.map.data[map_index_list[index_4]])
-				if -1 < data.map.data[map_index_list[index_4]] < threshold:
-					index_4 += 1
-				else:
-					break
-			if index_4 == len(map_index_list):
-				wall_checked_scan_base_pose_list.append(obstacle_checked_scan_base_pose_list[index_3])
-			index_3 += 1
-	'''
-	if wall_checked_scan_base_pose_list:
-		step_dist = 0.05
-		map_index_list = list()
-		threshold = 20
-		index_5 = 0
-		while index_5 < len(wall_checked_scan_base_pose_list):
-			dist = math.sqrt((parent_obj_y - wall_checked_scan_base_pose_list[index_5].y) ** 2 + (parent_obj_x - wall_checked_scan_base_pose_list[index_5].x) ** 2)
-			n = 0
-			while n < int((dist - 0.5) / step_dist):
-				wall_check_point_x = wall_checked_scan_base_pose_list[index_5].x - (0.5 + n * step_dist) * math.cos(wall_checked_scan_base_pose_list[index_5].theta)
-				wall_check_point_y = wall_checked_scan_base_pose_list[index_5].y - (0.5 + n * step_dist) * math.sin(wall_checked_scan_base_pose_list[index_5].theta)
-				print([wall_check_point_x, wall_check_point_y, wall_checked_scan_base_pose_list[index_5].theta])
-				map_index = int((wall_check_point_y - data.map.info.origin.position.y) / data.map.info.resolution) * data.map.info.width + int((wall_check_point_x - data.map.info.origin.position.x) / data.map.info.resolution)
-				map_index_list.append(map_index)
-				n += 1
-			
-			index_6 = 0
-			while index_6 < len(map_index_list):
-				if -1 < data.map.data[map_index_list[index_6]] < threshold:
-					index_6 += 1
-				else:
-					break
-			if index_6 == len(map_index_list):
-				all_checked_scan_base_pose_list.append(wall_checked_scan_base_pose_list[index_5])
-			index_5 += 1
-	'''
-	return 	wall_checked_scan_base_pose_list			
-	#rospy.loginfo(wall_checked_scan_base_pose_list)
 
+		#check the obstacle free poses with the occupancy map to find a wall free scan pose list
+		valid[valid] = map_cache.wallClearMask(pose_x[valid], pose_y[valid], dist_to_walls, threshold)
 
+	return grounding_geometry.filterPoseList(scan_base_pose_list, valid)
 
-#calculate scan base poses
-def handle_symbol_grounding_scan_base_region(req):
+#calculate scan base poses of one parent obj. the furniture index is shared by all the parent objs of a request.
+#returns the detection width as well, it is the width of the parent obj which is seen from one scan pose.
+def groundScanBaseRegion(parent_obj_geometry, furniture_index):
 
 	'''
 	#record the map for checking
@@ -253,36 +166,20 @@ def handle_symbol_grounding_scan_base_region(req):
 	'''
 
 	#transform from knowledge base data to function useable data  	
-	parent_obj_x = req.parent_obj_geometry.pose.position.x
-	parent_obj_y = req.parent_obj_geometry.pose.position.y
-	parent_obj_rpy = tf.transformations.euler_from_quaternion([req.parent_obj_geometry.pose.orientation.x, req.parent_obj_geometry.pose.orientation.y, req.parent_obj_geometry.pose.orientation.z, req.parent_obj_geometry.pose.orientation.w])
+	parent_obj_x = parent_obj_geometry.pose.position.x
+	parent_obj_y = parent_obj_geometry.pose.position.y
+	parent_obj_rpy = tf.transformations.euler_from_quaternion([parent_obj_geometry.pose.orientation.x, parent_obj_geometry.pose.orientation.y, parent_obj_geometry.pose.orientation.z, parent_obj_geometry.pose.orientation.w])
 	parent_obj_th = parent_obj_rpy[2]
-	parent_obj_l = req.parent_obj_geometry.l
-	parent_obj_w = req.parent_obj_geometry.w
-	parent_obj_h = req.parent_obj_geometry.h
+	parent_obj_l = parent_obj_geometry.l
+	parent_obj_w = parent_obj_geometry.w
+	parent_obj_h = parent_obj_geometry.h
 
 	#rpy = tf.transformations.euler_from_quaternion([0, 0, -0.68, 0.73])
 	#rospy.loginfo(rpy[2])
 
-	#rospy.loginfo(req.parent_obj_geometry)
+	#rospy.loginfo(parent_obj_geometry)
 
 	
-	#transfrom furniture geometry list
-	index = 0
-	furniture_geometry_list = list()
-	while index < len(req.furniture_geometry_list):
-		furniture_geometry = FurnitureGeometry()
-		furniture_geometry.pose.x = req.furniture_geometry_list[index].pose.position.x
-		furniture_geometry.pose.y = req.furniture_geometry_list[index].pose.position.y
-		furniture_pose_rpy = tf.transformations.euler_from_quaternion([req.furniture_geometry_list[index].pose.orientation.x, req.furniture_geometry_list[index].pose.orientation.y, req.furniture_geometry_list[index].pose.orientation.z, req.furniture_geometry_list[index].pose.orientation.w])		
-		furniture_geometry.pose.theta = furniture_pose_rpy[2]
-		furniture_geometry.l = req.furniture_geometry_list[index].l
-		furniture_geometry.w = req.furniture_geometry_list[index].w
-		furniture_geometry.h = req.furniture_geometry_list[index].h
-		furniture_geometry_list.append(furniture_geometry)
-		index += 1
-	
-	
 
 	#calculate the detection width
 	max_scan_redundancy = 0.1
@@ -291,6 +188,7 @@ def handle_symbol_grounding_scan_base_region(req):
 	detection_angle = (40.0 / 180.0) * math.pi #set the detection angle (wide) of the detector 
 	camera_distance = math.sqrt((robot_h - parent_obj_h) ** 2 + (rb_distance - 0.2) ** 2) #distance between the detector and the surface of the parent obj
 	detection_w = 2 * (camera_distance * math.tan(0.5 * detection_angle)) - 2.0 * max_scan_redundancy #detection wide
+	scan_w = detection_w #detection_w is fitted to the sides of the parent obj below
 	#rospy.loginfo(detection_w)
 
 
@@ -443,10 +341,10 @@ def handle_symbol_grounding_scan_base_region(req):
 	#rospy.loginfo(scan_base_pose_list_4)
 	
 	#obstacle check
-	obstacle_checked_scan_base_pose_list_1 = obstacleCheck(scan_base_pose_list_1, furniture_geometry_list, parent_obj_x, parent_obj_y)
-	obstacle_checked_scan_base_pose_list_2 = obstacleCheck(scan_base_pose_list_2, furniture_geometry_list, parent_obj_x, parent_obj_y)
-	obstacle_checked_scan_base_pose_list_3 = obstacleCheck(scan_base_pose_list_3, furniture_geometry_list, parent_obj_x, parent_obj_y)
-	obstacle_checked_scan_base_pose_list_4 = obstacleCheck(scan_base_pose_list_4, furniture_geometry_list, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_1 = obstacleCheck(scan_base_pose_list_1, furniture_index, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_2 = obstacleCheck(scan_base_pose_list_2, furniture_index, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_3 = obstacleCheck(scan_base_pose_list_3, furniture_index, parent_obj_x, parent_obj_y)
+	obstacle_checked_scan_base_pose_list_4 = obstacleCheck(scan_base_pose_list_4, furniture_index, parent_obj_x, parent_obj_y)
 
 
 
@@ -467,42 +365,55 @@ def handle_symbol_grounding_scan_base_region(req):
 
 	if not scan_base_pose_list:
 		print "no valid scan pose."
+		#no R without a scan pose, the scan plan skips the parent obj
+		return scan_base_pose_list, 0.0, scan_w
 
 	#rospy.loginfo(scan_base_pose_list[0].x)
 	#calculate R list
 	min_dist = 0.40 #set the minimum distance to obstacles
-	R_list = list()
-	index_1 = 0
-	while index_1 < len(scan_base_pose_list):
-		index_2 = 0
-		dist_list = list()
-		while index_2 < len(furniture_geometry_list):
-			th = math.atan((scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) / (scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x + 0.0001))
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y > furniture_geometry_list[index_2].pose.y:
-				th = math.pi + th
-			if scan_base_pose_list[index_1].x < furniture_geometry_list[index_2].pose.x and scan_base_pose_list[index_1].y < furniture_geometry_list[index_2].pose.y:
-				th = -math.pi + th
-			delta_x = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.cos(th - furniture_geometry_list[index_2].pose.theta)
-			delta_y = math.sqrt((scan_base_pose_list[index_1].x - furniture_geometry_list[index_2].pose.x) ** 2 + (scan_base_pose_list[index_1].y - furniture_geometry_list[index_2].pose.y) ** 2) * math.sin(th - furniture_geometry_list[index_2].pose.theta)
-			delta_x = abs(delta_x)
-			delta_y = abs(delta_y)
-			dist = max((delta_x - furniture_geometry_list[index_2].w / 2.0), (delta_y - furniture_geometry_list[index_2].l / 2.0))
-			dist_list.append(dist)
-			index_2 += 1
-		#print dist_list
-		R = min(dist_list) - min_dist
-		#print R
-		R_list.append(R)
-		index_1 += 1
-	R = min(min(R_list), max_scan_redundancy)
+	#only the furnitures closer than min_dist + max_scan_redundancy can make R smaller than max_scan_redundancy
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(scan_base_pose_list)
+	R = min(furniture_index.clearance(pose_x, pose_y, min_dist + max_scan_redundancy).min() - min_dist, max_scan_redundancy)
 
+	return scan_base_pose_list, R, scan_w
+
+
+def handle_symbol_grounding_scan_base_region(req):
+	#transfrom furniture geometry data from database, the index is shared with the other grounding services
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+	(scan_base_pose_list, R, scan_w) = groundScanBaseRegion(req.parent_obj_geometry, furniture_index)
 	return scan_base_pose_list, R
 
 
+#plan the scan poses of all the workspaces in a room. every workspace gets the scan poses of its best side, the poses which see the same part
+#of a workspace as a pose before them are dropped and the rest is put in the order which keeps the base travel from start_pose short.
+def handle_symbol_grounding_scan_plan(req):
+	furniture_index = grounding_index.furnitureIndex(req.furniture_geometry_list)
+	rb_distance = 0.7 #distance between the robot base and the edge of the workspace, same as in groundScanBaseRegion
+	scan_base_pose_list = list()
+	workspace_index_list = list()
+	scan_w_list = list()
+	for index, workspace_geometry in enumerate(req.workspace_geometry_list):
+		(workspace_scan_base_pose_list, R, scan_w) = groundScanBaseRegion(workspace_geometry, furniture_index)
+		scan_base_pose_list.extend(workspace_scan_base_pose_list)
+		workspace_index_list.extend([index] * len(workspace_scan_base_pose_list))
+		scan_w_list.extend([scan_w] * len(workspace_scan_base_pose_list))
+
+	pose_x, pose_y, pose_th = grounding_geometry.poseArrays(scan_base_pose_list)
+	keep = grounding_tour.dedupeScanPoses(pose_x, pose_y, pose_th, numpy.array(scan_w_list), rb_distance)
+	(order, tour_length) = grounding_tour.planTour(req.start_pose.x, req.start_pose.y, pose_x[keep], pose_y[keep])
+	tour = keep[order]
+	rospy.loginfo("scan plan: %d workspaces, %d scan poses, %d after removing overlapping views, tour length %.2fm"%(len(req.workspace_geometry_list), len(scan_base_pose_list), len(keep), tour_length))
+	return [scan_base_pose_list[n] for n in tour], [workspace_index_list[n] for n in tour], tour_length
+
+
 
 def symbol_grounding_scan_base_region_server():
+	global map_cache
 	rospy.init_node('symbol_grounding_scan_base_region_server')
+	map_cache = grounding_map.MapCache()
 	s = rospy.Service('symbol_grounding_scan_base_region', SymbolGroundingScanBaseRegion, handle_symbol_grounding_scan_base_region)
+	s_plan = rospy.Service('symbol_grounding_scan_plan', SymbolGroundingScanPlan, handle_symbol_grounding_scan_plan)
 	print "Ready to receive requests."
 	rospy.spin()
 
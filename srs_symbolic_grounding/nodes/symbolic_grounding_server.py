@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#################################################################
+##\file
+#
+# \note
+# Copyright (c) 2012 \n
+# University of Bedfordshire \n\n
+#
+#################################################################
+#
+# \note
+# Project name: care-o-bot
+# \note
+# ROS stack name: srs_public
+# \note
+# ROS package name: srs_symbolic_grounding
+#
+# \brief
+# Runs all the symbol grounding services in one process. The services share one
+# map cache and the furniture indices, and are served by a bounded set of threads.
+#
+#################################################################
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# - Redistributions of source code must retain the above copyright
+# notice, this list of conditions and the following disclaimer. \n
+# - Redistributions in binary form must reproduce the above copyright
+# notice, this list of conditions and the following disclaimer in the
+# documentation and/or other materials provided with the distribution. \n
+# - Neither the name of the University of Bedfordshire nor the names of its
+# contributors may be used to endorse or promote products derived from
+# this software without specific prior written permission. \n
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License LGPL as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License LGPL for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License LGPL along with this program.
+# If not, see <http://www.gnu.org/licenses/>.
+#
+#################################################################
+
+import roslib; roslib.load_manifest('srs_symbolic_grounding')
+from srs_symbolic_grounding.srv import *
+import rospy
+import threading
+import grounding_map
+import grounding_cache
+import grounding_coalesce
+import symbol_grounding_scan_base_pose_server
+import symbol_grounding_scan_base_region_server
+import symbol_grounding_grasp_base_region_server
+import symbol_grounding_grasp_base_pose_experimental_server
+import symbol_grounding_deliver_base_region_server
+import symbol_grounding_explore_base_pose_server
+import scan_base_pose_server
+
+
+
+#limits the number of requests which are grounded at the same time. rospy serves every service connection in its own thread,
+#the pool lets at most max_workers of them run a grounding handler, the others wait for a free worker.
+class GroundingPool(object):
+
+	def __init__(self, max_workers):
+		self.max_workers = max_workers
+		self.workers = threading.BoundedSemaphore(max_workers)
+
+
+	def wrap(self, handler):
+		def groundingHandler(req):
+			self.workers.acquire()
+			try:
+				return handler(req)
+			finally:
+				self.workers.release()
+		return groundingHandler
+
+
+
+def symbolic_grounding_server():
+	rospy.init_node('symbolic_grounding_server')
+	pool = GroundingPool(rospy.get_param('~max_workers', 4))
+
+	#one map and one result cache for all the services
+	map_cache = grounding_map.MapCache()
+	symbol_grounding_scan_base_pose_server.map_cache = map_cache
+	symbol_grounding_scan_base_region_server.map_cache = map_cache
+	symbol_grounding_grasp_base_region_server.map_cache = map_cache
+	symbol_grounding_grasp_base_pose_experimental_server.map_cache = map_cache
+	symbol_grounding_deliver_base_region_server.map_cache = map_cache
+	scan_base_pose_server.map_cache = map_cache
+	symbol_grounding_scan_base_pose_server.result_cache = grounding_cache.GroundingCache('scan_base_pose')
+	symbol_grounding_explore_base_pose_server.result_cache = grounding_cache.GroundingCache('explore_base_pose')
+	rospy.on_shutdown(symbol_grounding_scan_base_pose_server.result_cache.logStats)
+	rospy.on_shutdown(symbol_grounding_explore_base_pose_server.result_cache.logStats)
+	symbol_grounding_grasp_base_region_server.coalescer = grounding_coalesce.RequestCoalescer('grasp_base_region')
+	rospy.on_shutdown(symbol_grounding_grasp_base_region_server.coalescer.logStats)
+
+	services = list()
+	services.append(rospy.Service('symbol_grounding_scan_base_pose', SymbolGroundingScanBasePose, pool.wrap(symbol_grounding_scan_base_pose_server.handle_symbol_grounding_scan_base_pose)))
+	services.append(rospy.Service('symbol_grounding_scan_base_pose_batch', SymbolGroundingScanBasePoseBatch, pool.wrap(symbol_grounding_scan_base_pose_server.handle_symbol_grounding_scan_base_pose_batch)))
+	services.append(rospy.Service('symbol_grounding_scan_base_region', SymbolGroundingScanBaseRegion, pool.wrap(symbol_grounding_scan_base_region_server.handle_symbol_grounding_scan_base_region)))
+	services.append(rospy.Service('symbol_grounding_scan_plan', SymbolGroundingScanPlan, pool.wrap(symbol_grounding_scan_base_region_server.handle_symbol_grounding_scan_plan)))
+	services.append(rospy.Service('symbol_grounding_grasp_base_region', SymbolGroundingGraspBaseRegion, pool.wrap(symbol_grounding_grasp_base_region_server.handle_symbol_grounding_grasp_base_region)))
+	services.append(rospy.Service('symbol_grounding_grasp_base_region_batch', SymbolGroundingGraspBaseRegionBatch, pool.wrap(symbol_grounding_grasp_base_region_server.handle_symbol_grounding_grasp_base_region_batch)))
+	services.append(rospy.Service('symbol_grounding_grasp_base_pose_search', SymbolGroundingGraspBasePoseSearch, pool.wrap(symbol_grounding_grasp_base_region_server.handle_symbol_grounding_grasp_base_pose_search)))
+	services.append(rospy.Service('symbol_grounding_grasp_base_pose_experimental', SymbolGroundingGraspBasePoseExperimental, pool.wrap(symbol_grounding_grasp_base_pose_experimental_server.handle_symbol_grounding_grasp_base_pose_experimental)))
+	services.append(rospy.Service('symbol_grounding_deliver_base_region', SymbolGroundingDeliverBaseRegion, pool.wrap(symbol_grounding_deliver_base_region_server.handle_symbol_grounding_deliver_base_region)))
+	services.append(rospy.Service('symbol_grounding_deliver_base_region_batch', SymbolGroundingDeliverBaseRegionBatch, pool.wrap(symbol_grounding_deliver_base_region_server.handle_symbol_grounding_deliver_base_region_batch)))
+	services.append(rospy.Service('symbol_grounding_explore_base_pose', SymbolGroundingExploreBasePose, pool.wrap(symbol_grounding_explore_base_pose_server.handle_symbol_grounding_explore_base_pose)))
+	services.append(rospy.Service('scan_base_pose', ScanBasePose, pool.wrap(scan_base_pose_server.handle_scan_base_pose)))
+	print "Ready to receive requests."
+	rospy.spin()
+
+
+
+if __name__ == "__main__":
+	symbolic_grounding_server()